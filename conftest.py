@@ -0,0 +1 @@
+# Lets pytest import the modules package from the root of the repository.
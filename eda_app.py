@@ -1,6 +1,14 @@
+import time
+
 import pandas as pd
 import streamlit as st
 
+from modules.backend import available_backends
+from modules.cache import FrameCache, content_hash
+from modules.ingest import FORMATS, ColumnarSource, file_format, read_upload
+from modules.stats import tag_frame
+from modules.streaming import STREAM_BYTES, profile_file
+
 navigation_pages = [
     st.Page("toppage.py", title="Home"),
     st.Page("profile.py", title="Profile Data"),
@@ -9,6 +17,24 @@ navigation_pages = [
     st.Page("hypothesis.py", title="Test Hypothesis"),
 ]
 
+# Session state of an upload, cleared when another file is uploaded.
+UPLOAD_STATE = [
+    "df",
+    "source",
+    "stream",
+    "df_name",
+    "df_key",
+    "load_report",
+    "conversion_request",
+    "conversion_report",
+]
+
+
+@st.cache_resource
+def frame_cache() -> FrameCache:
+    """Parsed uploads shared by all sessions of the server."""
+    return FrameCache()
+
 
 def run():
     global navigation_pages
@@ -23,13 +49,95 @@ def run():
     # Sidebar of app.
     pages = st.navigation(navigation_pages)
     pages.run()
-    uploaded_file = st.sidebar.file_uploader("Upload file", accept_multiple_files=False)
+    uploaded_file = st.sidebar.file_uploader(
+        "Upload file",
+        type=sorted({suffix.rsplit(".", 1)[-1] for suffix in FORMATS}),
+        accept_multiple_files=False,
+    )
     st.sidebar.text("Warning! Don't upload any confidential data on this app.")
-    st.sidebar.text("Currently only accept a csv file.")
+    st.sidebar.text(
+        "Accepts csv (also gzip/zstd compressed), parquet and feather/arrow files."
+    )
+
+    st.sidebar.selectbox(
+        "Compute backend",
+        available_backends(),
+        key="backend",
+        help="Engine for exact profiles, missing and duplicate rows, and outlier statistics. "
+        "Polars is used when installed.",
+    )
+    st.sidebar.toggle(
+        "Exact rendering",
+        key="exact_render",
+        help="Draw every row in charts of large data instead of samples and binned data; this can be slow.",
+    )
+
+    if "load_report" in st.session_state:
+        st.sidebar.text(st.session_state.load_report)
+
+    if uploaded_file is not None and uploaded_file.file_id != st.session_state.get(
+        "upload_id"
+    ):
+        # A new upload replaces the data of the last one, e.g. each day's file
+        # added to a sequential experiment.
+        for name in UPLOAD_STATE:
+            st.session_state.pop(name, None)
+        status = st.sidebar.empty()
+
+        def report(stats):
+            st.session_state.load_report = (
+                f"Loaded {stats['rows']:,} rows "
+                f"({stats['rows_per_sec']:,.0f} rows/s, "
+                f"peak RSS {stats['peak_rss'] / 2**20:,.0f} MB)"
+            )
+            status.text(st.session_state.load_report)
+
+        try:
+            fmt, compression = file_format(uploaded_file.name)
+        except ValueError as e:
+            st.sidebar.error(e)
+            return
+        key = f"{fmt}-{compression}-{content_hash(uploaded_file)}"
+
+        start = time.perf_counter()
+        data = frame_cache().get(key)
+        if data is None and uploaded_file.size > STREAM_BYTES:
+            # Too large to load: profile every row chunk by chunk and keep a sample.
+            stream = profile_file(
+                uploaded_file,
+                fmt,
+                compression,
+                progress=lambda rows: status.text(f"Profiled {rows:,} rows"),
+            )
+            st.session_state.stream = stream
+            st.session_state.load_report = (
+                f"Profiled {stream.rows:,} rows in {time.perf_counter() - start:,.0f} s; "
+                f"pages show a sample of {len(stream.sample):,} rows"
+            )
+            data = stream.sample
+            key = f"{key}-sample"
+        elif data is not None:
+            st.session_state.load_report = (
+                f"Loaded {len(data):,} rows from cache "
+                f"in {(time.perf_counter() - start) * 1000:,.0f} ms"
+            )
+        else:
+            data = read_upload(uploaded_file, progress=report)
+            if isinstance(data, pd.DataFrame):
+                frame_cache().put(key, data)
+                data = data.copy(deep=False)
 
-    if uploaded_file is not None and "df" not in st.session_state:
-        df = pd.read_csv(uploaded_file)
+        if isinstance(data, ColumnarSource):
+            # Columns are read when a page asks for them; see utils.session_df.
+            st.session_state.source = data
+            df = pd.DataFrame(index=pd.RangeIndex(data.num_rows))
+        else:
+            df = data
+        st.session_state.upload_id = uploaded_file.file_id
         st.session_state.df_name = uploaded_file.name
+        st.session_state.df_key = key
+        # Lets modules.stats fingerprint the frame without hashing its rows.
+        tag_frame(df, key)
         st.session_state.df = df
         st.rerun()
 
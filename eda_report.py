@@ -0,0 +1,57 @@
+import argparse
+import sys
+
+import matplotlib
+
+from modules.charts import WORKERS
+from modules.report import load_config, report_files, run_reports
+
+
+def progress(entry) -> None:
+    if entry["error"] is not None:
+        print(f"{entry['file']}: failed, {entry['error']}", flush=True)
+    else:
+        print(
+            f"{entry['file']}: {entry['rows']:,} rows, {entry['columns']:,} columns "
+            f"in {entry['seconds']:,.1f} s",
+            flush=True,
+        )
+
+
+def main(argv=None) -> int:
+    """Write the EDA reports of every data file of a directory without the app."""
+    parser = argparse.ArgumentParser(
+        description="Profile, outlier, correlation and hypothesis test reports "
+        "of the csv, parquet and feather/arrow files of a directory, as HTML and JSON."
+    )
+    parser.add_argument("directory", help="Directory of the data files")
+    parser.add_argument(
+        "--config", help="JSON file of report settings, see modules.report"
+    )
+    parser.add_argument("--output", default="reports", help="Directory of the reports")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=WORKERS,
+        help="Files processed at once, each in its own process",
+    )
+    args = parser.parse_args(argv)
+    # Charts are only written to files, also when reports are built in this process.
+    matplotlib.use("Agg")
+
+    paths = report_files(args.directory)
+    if not paths:
+        print(f"No data files in {args.directory}", file=sys.stderr)
+        return 1
+    entries = run_reports(
+        paths, load_config(args.config), args.output, args.workers, progress
+    )
+    failed = sum(entry["error"] is not None for entry in entries)
+    print(
+        f"Wrote {len(entries) - failed:,} of {len(entries):,} reports to {args.output}"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,6 +9,8 @@ from modules.utils import (
     line_plot,
     pair_plot,
     scatter_plot,
+    session_columns,
+    session_df,
 )
 
 visuals = [
@@ -20,6 +22,13 @@ visuals = [
     "Correlation",
     "Geospatial",
 ]
+# Summaries of the lines of large data: the mean per bucket of x with a band
+# of the minimum and maximum or of the quartiles, or LTTB downsampling.
+line_modes = {
+    "Mean with min-max band": "min-max",
+    "Mean with interquartile band": "quartiles",
+    "LTTB downsampling": "lttb",
+}
 
 
 # Description of app.
@@ -51,8 +60,7 @@ with st.expander("Concepts"):
     )
 
 if "df" in st.session_state:
-    df = st.session_state.df
-    cols = list(df.columns)
+    cols = session_columns()
     cols.insert(0, None)
     cols.append("All")
 
@@ -61,6 +69,7 @@ if "df" in st.session_state:
     if visual == "Distribution":
         column = st.selectbox("Select a column", cols)
         if column is not None:
+            df = session_df(None if column == "All" else [column])
             dist_plot(df, column)
             with st.expander("Intention & How to fix"):
                 st.text(
@@ -77,6 +86,7 @@ if "df" in st.session_state:
         column = st.selectbox("Select a column", cols)
         hue = st.selectbox("Select a grouping column", cols)
         if column is not None:
+            df = session_df(None if column == "All" else [column, hue])
             count_plot(df, column, hue)
             with st.expander("Intention & How to fix"):
                 st.text(
@@ -101,6 +111,7 @@ if "df" in st.session_state:
                 """
             )
         elif x_col is not None and y_col is not None:
+            df = session_df([x_col, y_col, hue])
             scatter_plot(df, x_col, y_col, hue)
             with st.expander("Intention & How to fix"):
                 st.text(
@@ -119,6 +130,11 @@ if "df" in st.session_state:
         x_col = st.selectbox("Select a 1st column", cols)
         y_col = st.selectbox("Select a 2nd column", cols)
         hue = st.selectbox("Select grouping column", cols)
+        line_mode = st.selectbox(
+            "Summary of large data",
+            list(line_modes),
+            help="Lines of large data are drawn from buckets of the 1st column, or downsampled.",
+        )
         if x_col == "All" or y_col == "All" or hue == "All":
             st.error(
                 """
@@ -127,7 +143,8 @@ if "df" in st.session_state:
                 """
             )
         elif x_col is not None and y_col is not None:
-            line_plot(df, x_col, y_col, hue)
+            df = session_df([x_col, y_col, hue])
+            line_plot(df, x_col, y_col, hue, mode=line_modes[line_mode])
         with st.expander("Intention & How to fix"):
             st.text(
                 """
@@ -149,6 +166,7 @@ if "df" in st.session_state:
                 """
             )
         else:
+            df = session_df()
             pair_plot(df, hue)
             with st.expander("Intention & How to fix"):
                 st.text(
@@ -162,14 +180,18 @@ if "df" in st.session_state:
                     """
                 )
     elif visual == "Correlation":
+        method = st.selectbox("Select a method", ["pearson", "spearman"])
         threshold = st.slider("Select a threshold", 0.0, 1.0, 0.5, 0.1)
-        corr_plot(df, threshold)
+        top = st.number_input("Number of pairs to list", 1, 1000, 50)
+        df = session_df()
+        corr_plot(df, threshold, method, top)
         with st.expander("Intention & How to fix"):
             st.text(
                 """
                 1) Intention
                 - This plot is for more insights on your data for whole columns.
                 - Review the relationship among columns with quantitative values.
+                - Spearman correlation (of ranks) also captures monotonic, non-linear relationships.
                 2) How to fix
                 - Correlated columns: Drop one of them as per your needs.
                 """
@@ -178,11 +200,12 @@ if "df" in st.session_state:
         latitude = st.selectbox("Select a column of latitude", cols)
         longitude = st.selectbox("Select a column of longitude", cols)
         type = st.selectbox("Select a plot type", ["Marker", "HeatMap"])
+        df = session_df([latitude, longitude])
         geo_plot(df, latitude, longitude, type)
     else:
         st.text("Not implemented yet")
 
-    dfprofiler(df)
+    dfprofiler(st.session_state.df)
 
 else:
     st.error("Upload a file on the side bar")
@@ -1,8 +1,39 @@
 import streamlit as st
 
-from modules.utils import dfprofiler, hypo_ttest, hypo_ztest
+from modules.resampling import STATISTICS
+from modules.utils import (
+    dfprofiler,
+    hypo_anova,
+    hypo_bootstrap,
+    hypo_chi_square,
+    hypo_permutation,
+    hypo_screen,
+    hypo_sequential,
+    hypo_ttest,
+    hypo_welch,
+    hypo_ztest,
+    session_columns,
+    session_df,
+)
 
-tests = ["Z-test", "T-test"]
+tests = [
+    "Z-test",
+    "T-test",
+    "Welch's t-test",
+    "ANOVA",
+    "Chi-square",
+    "Screen numerical columns",
+    "Permutation test",
+    "Bootstrap confidence interval",
+    "Sequential A/B test",
+]
+# Tests run by the screen of numerical columns.
+screen_tests = {
+    "Welch's t-test": "welch",
+    "T-test": "t",
+    "Z-test": "z",
+    "ANOVA": "anova",
+}
 
 
 # Description of app.
@@ -13,24 +44,25 @@ with st.expander("Concepts"):
         """
         The main purpose is to conduct null hypothesis testing with given dataset.
         Hypothesis testing is a statistical method that is used in making statistical decisions using experimental data.
-        Test could be done with 2 data samples.
+        Test could be done with 2 data samples, or with groups of a grouping column.
         Hypothesis testing is important for
         1) Avoid misleading conclusions from misreading data
         2) Make evidence-based decisions led by data
 
         Null hypothesis testing on this tool.
         1) Z-test
-        2) T-test
-
-        * To be updated:
-        Chi-Square test, ANOVA, Other tests
+        2) T-test, and Welch's t-test for groups with unequal variances
+        3) ANOVA: means of more than 2 groups
+        4) Chi-square: independence of 2 categorical columns
+        5) Screen: one test of every numerical column against a grouping column
+        6) Permutation test and bootstrap confidence interval: resampling the data instead of assuming a distribution
+        7) Sequential A/B test: an experiment updated with each new upload, with p values valid at every look
         """
     )
 
 # target, cat/num
 if "df" in st.session_state:
-    df = st.session_state.df
-    cols = list(df.columns)
+    cols = session_columns()
     cols.insert(0, None)
 
     column1 = st.selectbox("1st column: Select a column1", cols)
@@ -46,31 +78,118 @@ if "df" in st.session_state:
     conf = st.slider("Confidence interval (%)", 0, 100, 95)
 
     test = st.selectbox("Select a visulazation", tests)
+    df = session_df(
+        None if test == "Screen numerical columns" else [column1, column2, hue]
+    )
 
-    if test == "Z-test":
+    if test in ["Z-test", "T-test", "Welch's t-test"]:
+        hypo_test = {
+            "Z-test": hypo_ztest,
+            "T-test": hypo_ttest,
+            "Welch's t-test": hypo_welch,
+        }[test]
         if column2 is not None and hue is not None:
             st.error("Please either of 2nd column or Grouping column")
         elif column1 is not None and hue is not None:
-            hypo_ztest(df, col1=column1, col2=None, hue=hue, conf=conf, tail=tail)
+            hypo_test(df, col1=column1, col2=None, hue=hue, conf=conf, tail=tail)
         elif column1 is not None and column2 is not None:
-            hypo_ztest(df, col1=column1, col2=column2, hue=None, conf=conf, tail=tail)
+            hypo_test(df, col1=column1, col2=column2, hue=None, conf=conf, tail=tail)
         else:
             st.error("Please select columns")
 
         with st.expander("Reference"):
             st.link_button("Z-test", "https://en.wikipedia.org/wiki/Z-test")
-    elif test == "T-test":
+            st.link_button("T-test", "https://en.wikipedia.org/wiki/Student%27s_t-test")
+            st.link_button(
+                "Welch's t-test", "https://en.wikipedia.org/wiki/Welch%27s_t-test"
+            )
+    elif test == "ANOVA":
+        if column1 is not None and hue is not None:
+            hypo_anova(df, col1=column1, hue=hue, conf=conf)
+        else:
+            st.error("Please select the 1st column and Grouping column")
+
+        with st.expander("Reference"):
+            st.link_button(
+                "ANOVA", "https://en.wikipedia.org/wiki/One-way_analysis_of_variance"
+            )
+    elif test == "Chi-square":
+        if column1 is not None and column2 is not None:
+            hypo_chi_square(df, col1=column1, col2=column2, conf=conf)
+        else:
+            st.error("Please select the 1st and 2nd columns")
+
+        with st.expander("Reference"):
+            st.link_button(
+                "Chi-square", "https://en.wikipedia.org/wiki/Chi-squared_test"
+            )
+    elif test == "Screen numerical columns":
+        screen_test = st.selectbox("Test of each column", list(screen_tests))
+        if hue is not None:
+            hypo_screen(df, hue=hue, test=screen_tests[screen_test], conf=conf)
+        else:
+            st.error("Please select Grouping column")
+
+        with st.expander("Reference"):
+            st.link_button(
+                "False discovery rate",
+                "https://en.wikipedia.org/wiki/False_discovery_rate#Benjamini%E2%80%93Hochberg_procedure",
+            )
+    elif test in ["Permutation test", "Bootstrap confidence interval"]:
+        resamples = st.number_input(
+            "Resamples", min_value=1_000, max_value=100_000, value=10_000, step=1_000
+        )
+        seed = st.number_input("Random seed", min_value=0, value=0)
+        if test == "Bootstrap confidence interval":
+            statistic = st.selectbox("Statistic", STATISTICS)
         if column2 is not None and hue is not None:
             st.error("Please either of 2nd column or Grouping column")
-        elif column1 is not None and hue is not None:
-            hypo_ttest(df, col1=column1, col2=None, hue=hue, conf=conf, tail=tail)
-        elif column1 is not None and column2 is not None:
-            hypo_ttest(df, col1=column1, col2=column2, hue=None, conf=conf, tail=tail)
-        else:
+        elif column1 is None:
             st.error("Please select columns")
+        elif test == "Permutation test":
+            if column2 is None and hue is None:
+                st.error("Please select the 2nd column or Grouping column")
+            else:
+                hypo_permutation(
+                    df,
+                    col1=column1,
+                    col2=column2,
+                    hue=hue,
+                    conf=conf,
+                    resamples=int(resamples),
+                    seed=int(seed),
+                )
+        else:
+            hypo_bootstrap(
+                df,
+                col1=column1,
+                col2=column2,
+                hue=hue,
+                conf=conf,
+                statistic=statistic,
+                resamples=int(resamples),
+                seed=int(seed),
+            )
 
         with st.expander("Reference"):
-            st.link_button("T-test", "https://en.wikipedia.org/wiki/Student%27s_t-test")
+            st.link_button(
+                "Permutation test",
+                "https://en.wikipedia.org/wiki/Permutation_test",
+            )
+            st.link_button(
+                "Bootstrapping",
+                "https://en.wikipedia.org/wiki/Bootstrapping_(statistics)",
+            )
+    elif test == "Sequential A/B test":
+        if column1 is not None and hue is not None:
+            hypo_sequential(df, col1=column1, hue=hue, conf=conf)
+        else:
+            st.error("Please select the 1st column and Grouping column")
+
+        with st.expander("Reference"):
+            st.link_button(
+                "Always valid inference (mSPRT)", "https://arxiv.org/abs/1512.04922"
+            )
     else:
         st.error("Not implemented yet")
 
@@ -0,0 +1,204 @@
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from modules import stats
+from modules.detection import column_stats as numpy_column_stats
+from modules.detection import frame_column_stats
+
+try:
+    import polars as pl
+except ImportError:  # polars is optional
+    pl = None
+
+# Engines which can compute statistics of the session data; results are always
+# small pandas or NumPy objects, so charts do not depend on the backend.
+BACKENDS = ["pandas", "pyarrow", "polars"]
+
+
+def available_backends() -> list:
+    """Backends which can be used in this environment."""
+    return [name for name in BACKENDS if name != "polars" or pl is not None]
+
+
+def _to_arrow(df):
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        # e.g. object columns mixing numbers and text.
+        return None
+
+
+def arrow_table(df):
+    """df as an Arrow table, or None if Arrow cannot hold it.
+
+    Converted once per frame fingerprint. NaN becomes null, as pandas counts it.
+    """
+    return stats.memoize(df, "arrow_table", _to_arrow)
+
+
+def _to_polars(df):
+    table = arrow_table(df)
+    return None if table is None else pl.from_arrow(table, rechunk=True)
+
+
+def polars_frame(df):
+    """df as a Polars DataFrame, or None if it cannot be converted."""
+    return stats.memoize(df, "polars_frame", _to_polars)
+
+
+def _frame(df, backend):
+    """Frame of df for backend, or None when pandas should be used."""
+    if backend == "pyarrow":
+        return arrow_table(df)
+    if backend == "polars" and pl is not None:
+        return polars_frame(df)
+    return None
+
+
+def _null_stats(df, backend) -> tuple:
+    frame = _frame(df, backend)
+    if backend == "polars":
+        counts = frame.null_count().row(0)
+        any_null = (
+            frame.select(pl.any_horizontal(pl.all().is_null())).to_series().to_numpy()
+        )
+    else:
+        counts = [column.null_count for column in frame.columns]
+        masks = [pc.is_null(column) for column in frame.columns]
+        any_null = reduce(pc.or_, masks, pa.array(np.zeros(len(df), dtype=bool)))
+        any_null = any_null.to_numpy(zero_copy_only=False)
+    return pd.Series(counts, index=df.columns, dtype="int64"), np.asarray(any_null)
+
+
+def null_stats(df, backend="pandas") -> tuple:
+    """stats.null_stats computed by backend."""
+    if _frame(df, backend) is None:
+        return stats.null_stats(df)
+    return stats.memoize(df, "null_stats", _null_stats, backend)
+
+
+def _column_stats(df, column, backend) -> dict:
+    frame = _frame(df, backend)
+    position = df.columns.get_loc(column)
+    if backend == "polars":
+        values = pl.col(frame.columns[position]).cast(pl.Float64)
+        median = values.median()
+        row = frame.select(
+            values.mean().alias("mean"),
+            values.std(ddof=0).alias("std"),
+            values.quantile(0.25, "linear").alias("q1"),
+            values.quantile(0.75, "linear").alias("q3"),
+            median.alias("median"),
+            (values - median).abs().median().alias("mad"),
+        ).row(0, named=True)
+        return {key: np.nan if value is None else value for key, value in row.items()}
+    values = frame.column(position).cast(pa.float64())
+    if values.null_count == len(values):
+        return numpy_column_stats([])
+    q1, median, q3 = pc.quantile(values, q=[0.25, 0.5, 0.75]).to_pylist()
+    return {
+        "mean": pc.mean(values).as_py(),
+        "std": pc.stddev(values, ddof=0).as_py(),
+        "q1": q1,
+        "q3": q3,
+        "median": median,
+        "mad": pc.quantile(pc.abs(pc.subtract(values, median)), q=0.5)[0].as_py(),
+    }
+
+
+def column_stats(df, column, backend="pandas") -> dict:
+    """detection.frame_column_stats computed by backend."""
+    if _frame(df, backend) is None:
+        return frame_column_stats(df, column)
+    return stats.memoize(df, "column_stats", _column_stats, column, backend)
+
+
+def _describe(frame, position, backend) -> dict:
+    """stats._describe_column of a numerical or categorical column of frame."""
+    if backend == "polars":
+        values = frame.to_series(position).drop_nulls()
+        if values.dtype.is_numeric():
+            values = values.cast(pl.Float64)
+            if len(values) == 0:
+                return {"count": 0}
+            return {
+                "count": len(values),
+                "mean": values.mean(),
+                "std": values.std() if len(values) > 1 else np.nan,
+                "min": values.min(),
+                "max": values.max(),
+            }
+        counts = values.value_counts(sort=True)
+        return {
+            "count": len(values),
+            "unique": len(counts),
+            "top": counts[0, 0] if len(counts) else np.nan,
+            "freq": counts[0, 1] if len(counts) else np.nan,
+        }
+    values = frame.column(position)
+    count = len(values) - values.null_count
+    if pa.types.is_integer(values.type) or pa.types.is_floating(values.type):
+        if count == 0:
+            return {"count": 0}
+        values = values.cast(pa.float64())
+        extremes = pc.min_max(values)
+        return {
+            "count": count,
+            "mean": pc.mean(values).as_py(),
+            "std": pc.stddev(values, ddof=1).as_py() if count > 1 else np.nan,
+            "min": extremes["min"].as_py(),
+            "max": extremes["max"].as_py(),
+        }
+    counts = pc.value_counts(pc.drop_null(values))
+    if len(counts) == 0:
+        return {"count": 0, "unique": 0, "top": np.nan, "freq": np.nan}
+    top = pc.index(counts.field("counts"), pc.max(counts.field("counts"))).as_py()
+    return {
+        "count": count,
+        "unique": len(counts),
+        "top": counts.field("values")[top].as_py(),
+        "freq": counts.field("counts")[top].as_py(),
+    }
+
+
+def _summary(df, backend) -> pd.DataFrame:
+    frame = _frame(df, backend)
+    null_counts, _ = null_stats(df, backend)
+    described = {}
+    for position, col in enumerate(df.columns):
+        if df[col].dtype.kind in "mM":
+            described[col] = stats._describe_column(df[col])
+        else:
+            described[col] = _describe(frame, position, backend)
+    return stats.summary_frame(df, described, null_counts)
+
+
+def summary(df, backend="pandas") -> pd.DataFrame:
+    """Exact stats.summary computed by backend."""
+    if _frame(df, backend) is None:
+        return stats.summary(df)
+    return stats.memoize(df, "summary", _summary, backend)
+
+
+def _row_hashes(df, backend) -> np.ndarray:
+    return _frame(df, backend).hash_rows().to_numpy()
+
+
+def row_hashes(df, backend="pandas") -> np.ndarray:
+    """stats.row_hashes computed by backend; hashes differ between backends."""
+    if backend != "polars" or _frame(df, backend) is None:
+        return stats.row_hashes(df)
+    return stats.memoize(df, "row_hashes", _row_hashes, backend)
+
+
+def _duplicate_groups(df, backend) -> tuple:
+    return stats.duplicate_groups(row_hashes(df, backend))
+
+
+def duplicate_groups(df, backend="pandas") -> tuple:
+    """stats.duplicate_groups of the rows of df, from its row hash index."""
+    return stats.memoize(df, "duplicate_groups", _duplicate_groups, backend)
@@ -0,0 +1,284 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+# Directory of cache files spilled to disk.
+CACHE_DIR = os.environ.get("EDA_CACHE_DIR", ".eda_cache")
+# Size bounds of the in-memory and on-disk tiers of the frame cache.
+MEMORY_BYTES = 2 << 30
+DISK_BYTES = 20 << 30
+# Size bounds of the in-memory and on-disk tiers of the figure cache.
+FIGURE_MEMORY_BYTES = 256 << 20
+FIGURE_DISK_BYTES = 2 << 30
+# First bytes of every PNG file.
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def content_hash(file, chunk_size=1 << 20) -> str:
+    """Hash the content of a file-like object without keeping a second copy of it."""
+    digest = hashlib.blake2b(digest_size=16)
+    file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b""):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def frame_size(df) -> int:
+    """Memory used by a DataFrame in bytes."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def sizeof(value) -> int:
+    """Approximate memory used by a cached value in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=False).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=False))
+    if isinstance(value, (np.ndarray, pa.Table)):
+        return value.nbytes
+    if hasattr(value, "estimated_size"):
+        # Polars DataFrame, which is only an optional dependency.
+        return int(value.estimated_size())
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(sizeof(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(item) for item in value.values())
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by the total size of its values.
+
+    Evicted entries are passed to on_evict(key, value), e.g. to spill them to disk.
+    """
+
+    def __init__(self, max_bytes, sizeof=sizeof, on_evict=None):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.on_evict = on_evict
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.lock = threading.RLock()
+
+    def __contains__(self, key) -> bool:
+        with self.lock:
+            return key in self.entries
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.entries)
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.entries:
+                return default
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+
+    def items(self) -> list:
+        """(key, value) pairs, least recently used first."""
+        with self.lock:
+            return [(key, value) for key, (value, _) in self.entries.items()]
+
+    def put(self, key, value) -> None:
+        size = self.sizeof(value)
+        evicted = []
+        with self.lock:
+            if key in self.entries:
+                self.nbytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes and len(self.entries) > 1:
+                old_key, (old_value, old_size) = self.entries.popitem(last=False)
+                self.nbytes -= old_size
+                evicted.append((old_key, old_value))
+        if self.on_evict is not None:
+            for old_key, old_value in evicted:
+                self.on_evict(old_key, old_value)
+
+
+class FrameCache:
+    """Parsed DataFrames keyed by content hash.
+
+    Recently used frames stay in memory; frames evicted from memory are spilled to
+    uncompressed Feather files which are memory mapped back on the next hit.
+    """
+
+    def __init__(
+        self, max_bytes=MEMORY_BYTES, disk_bytes=DISK_BYTES, directory=CACHE_DIR
+    ):
+        self.memory = LRUCache(max_bytes, sizeof=frame_size, on_evict=self._spill)
+        self.disk_bytes = disk_bytes
+        self.directory = os.path.join(directory, "frames")
+
+    def _path(self, key) -> str:
+        return os.path.join(self.directory, f"{key}.feather")
+
+    def get(self, key):
+        """Cached frame for key or None.
+
+        A shallow copy is returned so that sessions replacing columns, e.g. when
+        changing data types, do not affect each other.
+        """
+        df = self.memory.get(key)
+        if df is None:
+            path = self._path(key)
+            if not os.path.exists(path):
+                return None
+            try:
+                df = feather.read_table(path, memory_map=True).to_pandas()
+            except (OSError, pa.ArrowException):
+                return None
+            touch(path)
+            self.memory.put(key, df)
+        return df.copy(deep=False)
+
+    def put(self, key, df) -> None:
+        self.memory.put(key, df)
+
+    def flush(self) -> None:
+        """Spill the frames kept in memory to disk, e.g. before the process exits."""
+        for key, df in self.memory.items():
+            self._spill(key, df)
+
+    def _spill(self, key, df) -> None:
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            df.to_feather(tmp_path, compression="uncompressed")
+            os.replace(tmp_path, path)
+        except (OSError, ValueError, TypeError, pa.ArrowException):
+            # Frames Arrow cannot store, e.g. object columns of mixed types, stay uncached.
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        prune(self.directory, ".feather", self.disk_bytes)
+
+
+class FigureCache:
+    """Rendered charts, as PNG bytes and a caption, keyed by a digest of their data and arguments.
+
+    Like FrameCache, recently used charts stay in memory and charts evicted from
+    memory are spilled to files, read back on the next hit. A file holds a line
+    of JSON with the caption and image sizes followed by the PNG bytes, so
+    files of a shared directory are parsed as data rather than unpickled.
+    """
+
+    def __init__(
+        self,
+        max_bytes=FIGURE_MEMORY_BYTES,
+        disk_bytes=FIGURE_DISK_BYTES,
+        directory=CACHE_DIR,
+    ):
+        self.memory = LRUCache(max_bytes, on_evict=self._spill)
+        self.disk_bytes = disk_bytes
+        self.directory = os.path.join(directory, "figures")
+
+    def _path(self, key) -> str:
+        return os.path.join(self.directory, f"{key}.chart")
+
+    def get(self, key):
+        """Cached (images, caption) for key or None."""
+        chart = self.memory.get(key)
+        if chart is None:
+            path = self._path(key)
+            if not os.path.exists(path):
+                return None
+            try:
+                chart = read_chart(path)
+            except (OSError, ValueError, KeyError, TypeError):
+                return None
+            touch(path)
+            self.memory.put(key, chart)
+        return chart
+
+    def put(self, key, chart) -> None:
+        self.memory.put(key, chart)
+
+    def flush(self) -> None:
+        """Spill the charts kept in memory to disk, e.g. before the process exits."""
+        for key, chart in self.memory.items():
+            self._spill(key, chart)
+
+    def _spill(self, key, chart) -> None:
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        images, caption = chart
+        header = {"caption": caption, "sizes": [len(image) for image in images]}
+        try:
+            with open(tmp_path, "wb") as file:
+                file.write(json.dumps(header).encode() + b"\n")
+                for image in images:
+                    file.write(image)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        prune(self.directory, ".chart", self.disk_bytes)
+
+
+def read_chart(path) -> tuple:
+    """(images, caption) of a chart file written by FigureCache; ValueError if malformed."""
+    with open(path, "rb") as file:
+        header = json.loads(file.readline())
+        sizes, caption = header["sizes"], header["caption"]
+        images = [file.read(size) for size in sizes]
+        trailing = file.read(1)
+    if (
+        trailing
+        or [len(image) for image in images] != sizes
+        or not all(image.startswith(PNG_SIGNATURE) for image in images)
+        or not (caption is None or isinstance(caption, str))
+    ):
+        raise ValueError(f"Not a chart file: {path}")
+    return images, caption
+
+
+def touch(path) -> None:
+    """Mark a cache file as recently used, unless another process removed it meanwhile."""
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def prune(directory, suffix, max_bytes) -> None:
+    """Delete least recently used files ending with suffix until they fit max_bytes.
+
+    Files removed meanwhile by another process are skipped.
+    """
+    files = []
+    for name in os.listdir(directory):
+        if not name.endswith(suffix):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            files.append((os.path.getmtime(path), os.path.getsize(path), path))
+        except FileNotFoundError:
+            continue
+    files.sort()
+    total = sum(size for _, size, _ in files)
+    for _, size, path in files:
+        if total <= max_bytes:
+            break
+        total -= size
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
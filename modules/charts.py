@@ -0,0 +1,414 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import seaborn as sns
+
+from modules.correlation import ANNOTATE_COLUMNS
+from modules.render import (
+    RASTER_ROWS,
+    RENDER_ROWS,
+    binned_histogram,
+    box_stats,
+    draw_raster,
+    figure_png,
+    kde_curve,
+    raster,
+    reservoir_sample,
+    sampling_note,
+    stratified_sample,
+    value_strata,
+)
+from modules.stats import frame_fingerprint
+from modules.viewer import selection_key
+
+# Worker processes rendering the charts of multi-chart views; with one,
+# charts are drawn one by one in the calling process.
+WORKERS = int(os.environ.get("EDA_WORKERS", os.cpu_count() or 1))
+# Values of a count plot drawn as bars and wedges; the rest are counted as "other".
+TOP_CATEGORIES = 20
+# Distinct values above which a column is listed in a table of its most
+# frequent TABLE_ROWS values instead of drawn.
+TABLE_CATEGORIES = 1_000
+TABLE_ROWS = 100
+# Size of a pair plot panel and margins of a pair plot row in inches.
+PANEL_INCHES = 2.5
+MARGIN_INCHES = (0.8, 0.15, 0.6, 0.15)
+
+# Pool of chart workers, started on first use and kept for later reruns.
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+# Shared memory block of the frame a pool worker draws from, see _attach.
+_worker_block = None
+
+
+def hue_codes(df, hue) -> tuple:
+    """Integer codes of a grouping column (-1 for nulls) and their colors and labels."""
+    if hue is None:
+        return None, np.array([sns.color_palette()[0]]), [None]
+    codes, labels = pd.factorize(df[hue], sort=True)
+    return codes, np.array(sns.color_palette(n_colors=len(labels))), list(labels)
+
+
+def hue_legend(ax, hue, colors, labels) -> None:
+    if hue is not None:
+        handles = [plt.Rectangle((0, 0), 1, 1, color=color) for color in colors]
+        ax.legend(handles, labels, title=hue)
+
+
+def draw_dist(df, column, legend=False, exact=False) -> tuple:
+    """Histogram, box plot and violin plot of a numerical column.
+
+    Columns of more than RENDER_ROWS values are drawn from binned counts and a
+    stratified sample unless exact.
+    """
+    values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+    values = values[np.isfinite(values)]
+    f, ax = plt.subplots(1, 3, figsize=(12, 4))
+    if exact or len(values) <= RENDER_ROWS:
+        sns.histplot(df, x=column, ax=ax[0], kde=True, bins=20, stat="percent")
+        sns.boxplot(df, x=column, ax=ax[1])
+        sns.violinplot(
+            df, x=column, ax=ax[2], alpha=0.3, label=column if legend else None
+        )
+        caption = None
+    else:
+        index, weights = stratified_sample(value_strata(values), RENDER_ROWS)
+        sample = values[index]
+        counts, edges = binned_histogram(values)
+        sns.histplot(
+            x=(edges[:-1] + edges[1:]) / 2,
+            weights=counts,
+            bins=list(edges),
+            stat="percent",
+            ax=ax[0],
+        )
+        curve = kde_curve(sample, weights)
+        if curve is not None:
+            # Density scaled to the percentage of rows per bin, as histplot(kde=True) does.
+            ax[0].plot(curve[0], curve[1] * (edges[1] - edges[0]) * 100)
+        ax[0].set_xlabel(column)
+        ax[1].bxp(
+            [box_stats(values, sample)], orientation="horizontal", patch_artist=True
+        )
+        ax[1].set_xlabel(column)
+        ax[1].set_yticks([])
+        sns.violinplot(x=sample, ax=ax[2], alpha=0.3, label=column if legend else None)
+        ax[2].set_xlabel(column)
+        caption = (
+            f"{sampling_note(len(sample), len(values))} "
+            "Histogram and box plot use every row; KDE, violin and box plot fliers use a stratified sample."
+        )
+    if legend:
+        ax[2].legend()
+    f.tight_layout()
+    return [f], caption
+
+
+def category_counts(df, column, hue=None, top=TOP_CATEGORIES) -> tuple:
+    """Rows of the top most frequent values of column per group of hue, the rest as "other".
+
+    Values and groups are factorized once and counted with one bincount over
+    their pairs. Returns a DataFrame of counts indexed by value, most frequent
+    first, with a column per group of hue in order of appearance (or "count"),
+    the Series of rows per value over all groups, and the number of distinct
+    values.
+    """
+    hue = None if hue == column else hue
+    codes, uniques = pd.factorize(df[column])
+    distinct = len(uniques)
+    totals = np.bincount(codes[codes >= 0], minlength=distinct)
+    order = np.argsort(-totals, kind="stable")
+    kept = min(top, distinct)
+    # Rank of each value by frequency; values past the top share the last slot.
+    rank = np.empty(distinct, dtype=np.intp)
+    rank[order] = np.minimum(np.arange(distinct), kept)
+    slots = kept + (distinct > kept)
+    labels = [str(value) for value in uniques[order[:kept]]]
+    if distinct > kept:
+        labels.append(f"other ({distinct - kept:,} values)")
+    if hue is None:
+        groups, group_codes = ["count"], np.zeros(len(codes), dtype=np.intp)
+    else:
+        group_codes, groups = pd.factorize(df[hue])
+    valid = (codes >= 0) & (group_codes >= 0)
+    counts = np.bincount(
+        rank[codes[valid]] * len(groups) + group_codes[valid],
+        minlength=slots * len(groups),
+    ).reshape(slots, len(groups))
+    folded = np.bincount(rank, weights=totals, minlength=slots).astype(np.int64)
+    table = pd.DataFrame(
+        counts, index=pd.Index(labels, name=column), columns=pd.Index(groups, name=hue)
+    )
+    return table, pd.Series(folded, index=table.index, name="count"), distinct
+
+
+def draw_count(df, column, hue) -> tuple:
+    """Count plot and pie chart of the most frequent values of a column."""
+    counts, totals, distinct = category_counts(df, column, hue)
+    hue = counts.columns.name
+    long = counts.stack().rename("count").reset_index()
+    f, ax = plt.subplots(1, 2, figsize=(12, 4))
+    sns.barplot(long, x=column, y="count", hue=hue, ax=ax[0])
+    ax[0].tick_params(axis="x", labelrotation=90)
+    ax[1].pie(
+        totals,
+        labels=totals.index,
+        autopct="%1.1f%%",
+        colors=sns.color_palette("Set2"),
+    )
+    f.tight_layout()
+    caption = None
+    if distinct > TOP_CATEGORIES:
+        caption = f"The {TOP_CATEGORIES} most frequent of {distinct:,} values; the rest are counted as other."
+    return [f], caption
+
+
+def pair_columns(df, hue) -> list:
+    """Columns of a pair plot: the numerical columns other than hue."""
+    return [col for col in df.select_dtypes(include="number").columns if col != hue]
+
+
+def _limits(values) -> tuple:
+    low, high = np.nanmin(values), np.nanmax(values)
+    if not np.isfinite(low):
+        return 0.0, 1.0
+    pad = (high - low) * 0.05 or 0.5
+    return low - pad, high + pad
+
+
+def draw_pair_row(df, row, hue=None, exact=False) -> tuple:
+    """Row row of a pair plot of the numerical columns, as one PNG.
+
+    Frames of more than RASTER_ROWS rows are drawn as rasters and of more than
+    RENDER_ROWS from a sample of rows, the same for every row, unless exact.
+    Rows are rendered with fixed margins and x limits per column, without
+    cropping, so that they line up when shown one under another.
+    """
+    columns = pair_columns(df, hue)
+    size, rows = len(columns), len(df)
+    rasters = rows > RASTER_ROWS and not exact
+    caption = f"Aggregated {rows:,} rows into a raster per panel." if rasters else None
+    if not rasters and not exact and rows > RENDER_ROWS:
+        index = reservoir_sample(rows, RENDER_ROWS)
+        caption = sampling_note(len(index), rows)
+        df = df.iloc[index]
+    values = [df[col].to_numpy(dtype=np.float64, na_value=np.nan) for col in columns]
+    left, right, bottom, top = MARGIN_INCHES
+    width = PANEL_INCHES * size + left + right
+    height = PANEL_INCHES + bottom + top
+    f, axes = plt.subplots(1, size, figsize=(width, height), squeeze=False)
+    axes = axes[0]
+    codes, colors, labels = hue_codes(df, hue) if rasters else (None, None, None)
+    for j, col in enumerate(columns):
+        ax = axes[j]
+        if rasters and j == row:
+            # A one pixel high raster is a histogram per group.
+            counts, extent = raster(
+                values[j],
+                values[j],
+                width=20,
+                height=1,
+                codes=codes,
+                layers=len(colors),
+            )
+            edges = np.linspace(extent[0], extent[1], 21)
+            for layer, color in enumerate(colors):
+                ax.stairs(counts[layer, 0], edges, color=color, fill=True, alpha=0.5)
+        elif rasters:
+            grid, extent = raster(
+                values[j],
+                values[row],
+                width=100,
+                height=100,
+                codes=codes,
+                layers=len(colors),
+            )
+            draw_raster(ax, grid, extent, colors)
+        elif j == row and hue is None:
+            sns.histplot(df, x=col, ax=ax)
+        elif j == row:
+            sns.kdeplot(
+                df, x=col, hue=hue, fill=True, legend=False, warn_singular=False, ax=ax
+            )
+        else:
+            # The first row carries the legend, in its last panel.
+            legend = "auto" if row == 0 and j == size - 1 else False
+            sns.scatterplot(df, x=col, y=columns[row], hue=hue, legend=legend, ax=ax)
+        if j == row:
+            # Densities and counts of the diagonal do not share the row's y axis.
+            ax.set_yticks([])
+        ax.set_xlim(_limits(values[j]))
+        ax.set_xlabel(col if row == size - 1 else "")
+        ax.set_ylabel(columns[row] if j == 0 else "")
+    if rasters and row == 0:
+        hue_legend(axes[-1], hue, colors, labels)
+    f.subplots_adjust(
+        left=left / width,
+        right=1 - right / width,
+        bottom=bottom / height,
+        top=1 - top / height,
+        wspace=0.3,
+    )
+    return [figure_png(f, tight=False)], caption if row == size - 1 else None
+
+
+def draw_corr(df_corr, threshold) -> tuple:
+    """Heatmaps of a correlation matrix, and of the pairs above threshold."""
+    mask = np.tril(np.ones(df_corr.shape), k=-1).astype(bool)
+    df_corr_fil = df_corr.where(mask)
+    annot = len(df_corr) <= ANNOTATE_COLUMNS
+    f, ax = plt.subplots(1, 2, figsize=(12, 6))
+    sns.heatmap(
+        df_corr_fil, annot=annot, cmap="crest", fmt=".2f", linewidths=0.01, ax=ax[0]
+    )
+    mask = df_corr_fil.where(abs(df_corr_fil) > threshold).isna()
+    sns.heatmap(
+        df_corr_fil,
+        annot=annot,
+        cmap="crest",
+        fmt=".2f",
+        linewidths=0.01,
+        mask=mask,
+        ax=ax[1],
+    )
+    f.tight_layout()
+    return [f], None
+
+
+def figure_key(df, draw, args, exact=False) -> str:
+    """Figure cache key of the chart draw(df, *args) with the given render settings."""
+    return selection_key(
+        frame_fingerprint(df), draw.__name__, RENDER_ROWS, RASTER_ROWS, exact, *args
+    )
+
+
+def render(draw, df, args) -> tuple:
+    """PNG images and caption of the chart draw(df, *args); figures are closed."""
+    images, caption = draw(df, *args)
+    return [
+        image if isinstance(image, bytes) else figure_png(image) for image in images
+    ], caption
+
+
+def share_frame(df, columns) -> tuple:
+    """Columns of df copied into one shared memory block, and the layout to read them back.
+
+    Numerical columns keep their dtype, nullable ones becoming float64 with nan;
+    other columns are stored as categorical codes, their categories going in
+    the layout.
+    """
+    arrays, layout, offset = [], [], 0
+    for column in columns:
+        values = df[column]
+        categories, ordered = None, False
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            array = values.cat.codes.to_numpy()
+            categories, ordered = values.cat.categories, values.cat.ordered
+        elif pd.api.types.is_numeric_dtype(values.dtype) and not isinstance(
+            values.dtype, pd.api.extensions.ExtensionDtype
+        ):
+            array = values.to_numpy()
+        elif pd.api.types.is_numeric_dtype(values.dtype):
+            array = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            array, categories = pd.factorize(values)
+        array = np.ascontiguousarray(array)
+        arrays.append(array)
+        layout.append((column, array.dtype.str, offset, categories, ordered))
+        # Columns start on 8 byte boundaries.
+        offset += -(-array.nbytes // 8) * 8
+    block = SharedMemory(create=True, size=max(offset, 1))
+    for array, (_, _, start, _, _) in zip(arrays, layout):
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf, offset=start)[
+            :
+        ] = array
+    return block, layout
+
+
+def shared_frame(block, layout, rows) -> pd.DataFrame:
+    """DataFrame of the columns of a share_frame block, without copying numerical columns."""
+    data = {}
+    for column, dtype, offset, categories, ordered in layout:
+        values = np.ndarray(rows, dtype=dtype, buffer=block.buf, offset=offset)
+        if categories is not None:
+            values = pd.Categorical.from_codes(values, categories, ordered=ordered)
+        data[column] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def _init_worker() -> None:
+    matplotlib.use("Agg")
+
+
+def _attach(name) -> SharedMemory:
+    """Block name, attached once per frame by a worker; the parent unlinks it."""
+    global _worker_block
+    if _worker_block is None or _worker_block.name != name:
+        if _worker_block is not None:
+            try:
+                _worker_block.close()
+            except BufferError:
+                # Still referenced by an earlier frame; released with the process.
+                pass
+        _worker_block = SharedMemory(name=name)
+    return _worker_block
+
+
+def _render_task(name, layout, rows, draw, args) -> tuple:
+    return render(draw, shared_frame(_attach(name), layout, rows), args)
+
+
+def render_pool(workers=WORKERS) -> ProcessPoolExecutor:
+    """Pool of chart workers, shared by every session of the server."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = ProcessPoolExecutor(
+                workers, mp_context=get_context("spawn"), initializer=_init_worker
+            )
+            _pool_workers = workers
+        return _pool
+
+
+def render_charts(df, columns, draw, arg_list, workers=WORKERS):
+    """Render draw(df, *args) for each args of arg_list, yielding (index, chart) as each finishes.
+
+    With more than one worker and chart, charts are drawn in the worker pool
+    from a copy of columns of df in shared memory; otherwise one after another
+    in this process.
+    """
+    if workers <= 1 or len(arg_list) <= 1:
+        for i, args in enumerate(arg_list):
+            yield i, render(draw, df, args)
+        return
+    global _pool
+    block, layout = share_frame(df, columns)
+    futures = {}
+    try:
+        pool = render_pool(workers)
+        for i, args in enumerate(arg_list):
+            futures[
+                pool.submit(_render_task, block.name, layout, len(df), draw, args)
+            ] = i
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    except BrokenProcessPool:
+        with _pool_lock:
+            _pool = None
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+        block.close()
+        block.unlink()
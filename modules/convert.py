@@ -0,0 +1,167 @@
+import hashlib
+import time
+import warnings
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+from modules.stats import frame_tag, memoize, tag_frame
+
+# Data types offered by the data type editor.
+DTYPES = [
+    "int8",
+    "int16",
+    "int32",
+    "int64",
+    "float32",
+    "float64",
+    "object",
+    "category",
+    "bool",
+    "string",
+    "datetime",
+    "date",
+]
+# Dates are stored as datetimes at midnight with a resolution of seconds, the
+# coarsest unit pandas holds; their columns are listed in df.attrs[DATE_COLUMNS].
+DATE_DTYPE = "datetime64[s]"
+DATE_COLUMNS = "date_columns"
+# Distinct values whose format is guessed to infer the format of a text column.
+FORMAT_SAMPLE = 100
+
+
+def dtype_name(df, column) -> str:
+    """Name in DTYPES of the data type of a column, or its dtype if none matches."""
+    dtype = df[column].dtype
+    if column in df.attrs.get(DATE_COLUMNS, ()):
+        return "date"
+    if dtype.kind == "M":
+        return "datetime"
+    if isinstance(dtype, pd.StringDtype):
+        return "string"
+    return str(dtype)
+
+
+def conversion_plan(df, requested) -> dict:
+    """Columns of requested ({column: name in DTYPES}) whose data type differs from df."""
+    return {
+        column: name
+        for column, name in requested.items()
+        if column in df.columns and name != dtype_name(df, column)
+    }
+
+
+def _datetime_format(df, column):
+    values = df[column].dropna()
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.cat.categories.to_series()
+    if values.dtype.kind not in "OSU":
+        return None
+    with warnings.catch_warnings():
+        # Day-first guesses warn that dayfirst was not set.
+        warnings.simplefilter("ignore", UserWarning)
+        guesses = Counter(
+            guess_datetime_format(str(value))
+            for value in values.drop_duplicates().head(FORMAT_SAMPLE)
+        )
+    guesses.pop(None, None)
+    return guesses.most_common(1)[0][0] if guesses else None
+
+
+def datetime_format(df, column):
+    """strftime format of most sampled distinct values of a text column, or None."""
+    return memoize(df, "datetime_format", _datetime_format, column)
+
+
+def _parse_datetimes(values, format) -> pd.Series:
+    """Text parsed into datetimes, each distinct value once."""
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(pd.Series(uniques), format=format, errors="coerce")
+    result = parsed.to_numpy().take(codes)
+    result[codes < 0] = np.datetime64("NaT")
+    return pd.Series(result, index=values.index, name=values.name)
+
+
+def convert_column(values, name, format=None) -> pd.Series:
+    """values converted to the data type name of DTYPES.
+
+    Text is parsed into datetimes with format, unparsable values becoming NaT.
+    """
+    if name not in ("datetime", "date"):
+        return values.astype(name)
+    if values.dtype.kind != "M":
+        if values.dtype.kind in "OSU" or isinstance(values.dtype, pd.StringDtype):
+            values = _parse_datetimes(values, format)
+        else:
+            values = pd.to_datetime(values, errors="coerce")
+    if name == "date":
+        if getattr(values.dtype, "tz", None) is not None:
+            values = values.dt.tz_localize(None)
+        days = values.to_numpy().astype("datetime64[D]").astype(DATE_DTYPE)
+        values = pd.Series(days, index=values.index, name=values.name)
+    return values
+
+
+def convert(df, plan, formats=None) -> tuple:
+    """Apply a conversion_plan to df in one step, returning a new frame and a report.
+
+    Columns are converted one by one, then the frame is rebuilt once without
+    copying the columns left unchanged. Datetime formats come from formats
+    ({column: format}) or are inferred with datetime_format. The report has the
+    time taken and memory change of each column, and the error of columns which
+    could not be converted and were left as they were.
+    """
+    formats = formats or {}
+    converted, used, report = {}, {}, []
+    dates = list(df.attrs.get(DATE_COLUMNS, []))
+    for column, name in plan.items():
+        values = df[column]
+        before = values.memory_usage(index=False, deep=True)
+        format = None
+        if name in ("datetime", "date"):
+            format = formats.get(column) or datetime_format(df, column)
+        used[column] = (name, format)
+        start = time.perf_counter()
+        try:
+            converted[column] = convert_column(values, name, format)
+            error = None
+        except (ValueError, TypeError) as e:
+            error = str(e)
+        seconds = time.perf_counter() - start
+        after = before
+        if error is None:
+            after = converted[column].memory_usage(index=False, deep=True)
+            dates = [col for col in dates if col != column]
+            dates += [column] if name == "date" else []
+        report.append(
+            {
+                "Column": column,
+                "From": dtype_name(df, column),
+                "To": name,
+                "Format": format,
+                "Time (s)": seconds,
+                "Memory before (MB)": before / 2**20,
+                "Memory after (MB)": after / 2**20,
+                "Memory change (MB)": (after - before) / 2**20,
+                "Error": error,
+            }
+        )
+    result = pd.DataFrame(
+        {col: converted.get(col, df[col]) for col in df.columns},
+        index=df.index,
+        copy=False,
+    )
+    result.attrs = dict(df.attrs)
+    result.attrs[DATE_COLUMNS] = dates
+    if frame_tag(df) is not None:
+        # The fingerprint of the frame only hashes content of untagged frames.
+        tag_frame(
+            result,
+            hashlib.blake2b(
+                repr((frame_tag(df), sorted(used.items(), key=str))).encode(),
+                digest_size=16,
+            ).hexdigest(),
+        )
+    return result, pd.DataFrame(report)
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+from modules.stats import memoize
+from modules.streaming import CrossProducts
+
+# Correlation methods; spearman is pearson over ranks.
+METHODS = ["pearson", "spearman"]
+# Rows multiplied at once; blocks are read as float64 and multiplied as
+# float32, so 500 columns take 192 MB.
+BLOCK_ROWS = 1 << 15
+# Columns up to which heatmaps are drawn, with the values written in each cell.
+HEATMAP_COLUMNS = 100
+ANNOTATE_COLUMNS = 20
+
+
+def _pairwise_corr(df) -> np.ndarray:
+    """Pearson correlation of every pair of columns over rows where both are present.
+
+    Cross products are accumulated block by block with float32 matrix products
+    of shifted values, as in DataFrame.corr but without a loop over pairs.
+    """
+    cross = CrossProducts(df.shape[1])
+    for start in range(0, len(df), BLOCK_ROWS):
+        cross.update(
+            df.iloc[start:][:BLOCK_ROWS].to_numpy(dtype=np.float64, na_value=np.nan)
+        )
+    return cross.correlation()
+
+
+def average_ranks(values) -> np.ndarray:
+    """1-based float64 ranks of values with ties given their mean rank, nan for nulls.
+
+    Matches Series.rank(method="average") from a single unstable sort of the
+    values in their own dtype, so that distinct values are never tied.
+    """
+    values = np.asarray(values)
+    order = np.argsort(values)
+    present = len(values)
+    if values.dtype.kind == "f":
+        present = np.count_nonzero(~np.isnan(values))
+    valid = order[:present]
+    ordered = values[valid]
+    first = np.flatnonzero(np.concatenate([[True], ordered[1:] != ordered[:-1]]))
+    counts = np.diff(np.append(first, len(ordered)))
+    ranks = np.full(len(values), np.nan)
+    ranks[valid] = np.repeat(first + (counts + 1) / 2, counts)
+    return ranks
+
+
+def _column_values(values) -> np.ndarray:
+    """Values of a numerical column in their own dtype, nullable ones as float64 with nan."""
+    if isinstance(values.dtype, pd.api.extensions.ExtensionDtype):
+        return values.to_numpy(dtype=np.float64, na_value=np.nan)
+    return values.to_numpy()
+
+
+def _correlation_matrix(df, method) -> pd.DataFrame:
+    numeric = df.select_dtypes(include="number")
+    if method == "spearman":
+        ranks = np.empty(numeric.shape)
+        for i, col in enumerate(numeric.columns):
+            ranks[:, i] = average_ranks(_column_values(numeric[col]))
+        numeric = pd.DataFrame(ranks, columns=numeric.columns)
+    elif method != "pearson":
+        raise ValueError(f"Unknown correlation method: {method}")
+    return pd.DataFrame(
+        _pairwise_corr(numeric), index=numeric.columns, columns=numeric.columns
+    )
+
+
+def correlation_matrix(df, method="pearson") -> pd.DataFrame:
+    """Correlation matrix of the numerical columns, computed once per frame fingerprint.
+
+    Spearman ranks each column over all of its present values.
+    """
+    return memoize(df, "correlation_matrix", _correlation_matrix, method)
+
+
+def sorted_pairs(corr) -> pd.DataFrame:
+    """Pairs of columns of a correlation matrix, strongest |correlation| first."""
+    first, second = np.triu_indices(len(corr), k=1)
+    values = corr.to_numpy()[first, second]
+    order = np.argsort(-np.abs(values), kind="stable")
+    order = order[~np.isnan(values[order])]
+    return pd.DataFrame(
+        {
+            "Column 1": corr.columns[first[order]],
+            "Column 2": corr.columns[second[order]],
+            "Correlation": values[order],
+        }
+    )
+
+
+def strongest_pairs(pairs, threshold, k=None) -> pd.DataFrame:
+    """Prefix of sorted_pairs with |correlation| >= threshold, at most k pairs."""
+    strength = pairs["Correlation"].abs().to_numpy()
+    # strength is descending, so the pairs above threshold are a prefix.
+    count = len(strength) - np.searchsorted(strength[::-1], threshold, side="left")
+    return pairs.iloc[: count if k is None else min(count, k)]
+
+
+def _sorted_pairs(df, method) -> pd.DataFrame:
+    return sorted_pairs(correlation_matrix(df, method))
+
+
+def top_pairs(df, threshold, k=None, method="pearson") -> pd.DataFrame:
+    """Pairs of columns with |correlation| >= threshold, strongest first, at most k.
+
+    Pairs are sorted once per frame, so a new threshold only slices the result.
+    """
+    pairs = memoize(df, "correlation_pairs", _sorted_pairs, method)
+    return strongest_pairs(pairs, threshold, k)
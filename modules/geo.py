@@ -0,0 +1,78 @@
+import numpy as np
+
+# Points sent to the browser at most; larger data is aggregated into grid cells.
+GEO_POINTS = 20_000
+
+# Markers carry the number of rows they stand for; clusters show the sum.
+MARKER_CALLBACK = """
+var callback = function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.options.rows = row[2];
+    marker.bindTooltip(row[2].toLocaleString() + " rows");
+    return marker;
+};
+"""
+CLUSTER_ICON = """
+function (cluster) {
+    var rows = 0;
+    cluster.getAllChildMarkers().forEach(function (marker) {
+        rows += marker.options.rows;
+    });
+    var size = rows < 100 ? "small" : rows < 1000 ? "medium" : "large";
+    return L.divIcon({
+        html: "<div><span>" + rows.toLocaleString() + "</span></div>",
+        className: "marker-cluster marker-cluster-" + size,
+        iconSize: new L.Point(40, 40),
+    });
+}
+"""
+
+
+def coordinates(df, lat, lon) -> tuple:
+    """Latitude and longitude arrays of the rows where both are present."""
+    lats = df[lat].to_numpy(dtype=np.float64, na_value=np.nan)
+    lons = df[lon].to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = np.isfinite(lats) & np.isfinite(lons)
+    return lats[valid], lons[valid]
+
+
+def range_errors(lats, lons) -> list:
+    """Messages for latitudes outside -90~+90 and longitudes outside -180~+180."""
+    errors = []
+    if np.any(np.abs(lats) > 90):
+        errors.append("Latitude is not in a range of -90~+90")
+    if np.any(np.abs(lons) > 180):
+        errors.append("Longitude is not in a range of -180~+180")
+    return errors
+
+
+def grid_points(lats, lons, max_points=GEO_POINTS) -> np.ndarray:
+    """(lat, lon, rows) of the points, aggregated when there are more than max_points.
+
+    Points are binned into at most max_points cells of an equal-angle grid over
+    their bounding box; each cell is placed at the centroid of its points.
+    """
+    if len(lats) <= max_points:
+        return np.column_stack([lats, lons, np.ones(len(lats))])
+    side = int(np.sqrt(max_points))
+    cells = np.zeros(len(lats), dtype=np.intp)
+    for values in (lats, lons):
+        low, high = values.min(), values.max()
+        scale = side / (high - low) if high > low else 0.0
+        cells = cells * side + np.minimum(
+            ((values - low) * scale).astype(np.intp), side - 1
+        )
+    counts = np.bincount(cells, minlength=side * side)
+    filled = counts > 0
+    centroids = [
+        np.bincount(cells, weights=values, minlength=side * side)[filled]
+        / counts[filled]
+        for values in (lats, lons)
+    ]
+    return np.column_stack([*centroids, counts[filled]])
+
+
+def heatmap_points(points) -> list:
+    """HeatMap data of grid_points, weighted by the share of rows of the densest cell."""
+    weights = points[:, 2] / points[:, 2].max()
+    return np.column_stack([points[:, :2], weights]).tolist()
@@ -0,0 +1,264 @@
+import time
+
+import pandas as pd
+import psutil
+import pyarrow as pa
+from pandas.api.types import union_categoricals
+from pyarrow import csv as pa_csv
+from pyarrow import feather
+from pyarrow import parquet as pq
+
+# Bytes of CSV parsed per chunk.
+BLOCK_SIZE = 16 << 20
+# Rows per chunk when falling back to the pandas parser.
+CHUNK_ROWS = 200_000
+# Rows at the head of the file used to infer compact dtypes.
+SAMPLE_ROWS = 10_000
+# File name suffixes of supported uploads mapped to (format, compression).
+FORMATS = {
+    ".csv": ("csv", None),
+    ".csv.gz": ("csv", "gzip"),
+    ".csv.zst": ("csv", "zstd"),
+    ".csv.zstd": ("csv", "zstd"),
+    ".parquet": ("parquet", None),
+    ".pq": ("parquet", None),
+    ".feather": ("arrow", None),
+    ".arrow": ("arrow", None),
+    ".ipc": ("arrow", None),
+}
+# Max ratio of unique to non-null values for a text column to become a category.
+CATEGORY_RATIO = 0.5
+
+
+def infer_dtypes(sample, category_ratio=CATEGORY_RATIO) -> dict:
+    """Infer compact dtypes ("integer", "float32" or "category") from sampled rows."""
+    dtypes = {}
+    for col in sample.columns:
+        values = sample[col]
+        if pd.api.types.is_bool_dtype(values):
+            continue
+        elif pd.api.types.is_integer_dtype(values):
+            dtypes[col] = "integer"
+        elif pd.api.types.is_float_dtype(values):
+            dtypes[col] = "float32"
+        elif values.dtype == "object":
+            non_null = values.count()
+            if non_null > 0 and values.nunique() <= non_null * category_ratio:
+                dtypes[col] = "category"
+    return dtypes
+
+
+def downcast(chunk, dtypes) -> pd.DataFrame:
+    """Downcast columns of a chunk to the dtypes inferred by infer_dtypes."""
+    for col, dtype in dtypes.items():
+        values = chunk[col]
+        if dtype == "integer" and pd.api.types.is_integer_dtype(values):
+            chunk[col] = pd.to_numeric(values, downcast="integer")
+        elif dtype == "float32" and pd.api.types.is_float_dtype(values):
+            chunk[col] = values.astype("float32")
+        elif dtype == "category" and values.dtype == "object":
+            chunk[col] = values.astype("category")
+    return chunk
+
+
+def _batch_to_pandas(batch, dtypes) -> pd.DataFrame:
+    """Convert an Arrow record batch to pandas, dictionary encoding category columns first."""
+    arrays = []
+    for name, array in zip(batch.schema.names, batch.columns):
+        if dtypes.get(name) == "category" and pa.types.is_string(array.type):
+            # Dictionary encoding in Arrow avoids creating a Python string per row.
+            array = array.dictionary_encode()
+        arrays.append(array)
+    return pa.RecordBatch.from_arrays(arrays, names=batch.schema.names).to_pandas()
+
+
+def concat_chunks(chunks) -> pd.DataFrame:
+    """Concatenate chunks, merging categories which differ between chunks."""
+    columns = chunks[0].columns
+    cat_cols = [
+        col
+        for col in columns
+        if all(isinstance(chunk[col].dtype, pd.CategoricalDtype) for chunk in chunks)
+    ]
+    df = pd.concat(
+        [chunk.drop(columns=cat_cols) for chunk in chunks], ignore_index=True
+    )
+    for col in cat_cols:
+        df[col] = union_categoricals(
+            [chunk[col] for chunk in chunks], ignore_order=True
+        )
+    return df[columns]
+
+
+def _open_stream(file, compression=None):
+    """Rewind an uploaded file and wrap it in a (decompressing) Arrow input stream."""
+    file.seek(0)
+    stream = pa.PythonFile(file, mode="r")
+    if compression is not None:
+        stream = pa.CompressedInputStream(stream, compression)
+    return stream
+
+
+def _open_csv(file, compression=None):
+    """Open a streaming CSV reader which keeps date-like text as strings like pandas."""
+    read_options = pa_csv.ReadOptions(block_size=BLOCK_SIZE)
+    convert_options = pa_csv.ConvertOptions(strings_can_be_null=True)
+    reader = pa_csv.open_csv(
+        _open_stream(file, compression),
+        read_options=read_options,
+        convert_options=convert_options,
+    )
+    temporal = [
+        field.name for field in reader.schema if pa.types.is_temporal(field.type)
+    ]
+    if temporal:
+        convert_options.column_types = {name: pa.string() for name in temporal}
+        reader = pa_csv.open_csv(
+            _open_stream(file, compression),
+            read_options=read_options,
+            convert_options=convert_options,
+        )
+    return reader
+
+
+def _arrow_chunks(file, compression=None):
+    """Yield compact pandas chunks parsed by the pyarrow streaming CSV reader."""
+    dtypes = None
+    for batch in _open_csv(file, compression):
+        if dtypes is None:
+            dtypes = infer_dtypes(batch.slice(0, SAMPLE_ROWS).to_pandas())
+        yield downcast(_batch_to_pandas(batch, dtypes), dtypes)
+
+
+def _pandas_chunks(file, compression=None):
+    """Yield compact pandas chunks parsed by the pandas CSV reader."""
+    dtypes = None
+    stream = _open_stream(file, compression)
+    for chunk in pd.read_csv(stream, chunksize=CHUNK_ROWS):
+        if dtypes is None:
+            dtypes = infer_dtypes(chunk.head(SAMPLE_ROWS))
+        yield downcast(chunk, dtypes)
+
+
+def read_csv(file, compression=None, progress=None) -> pd.DataFrame:
+    """Read a CSV in chunks with the pyarrow parser and downcast dtypes on the fly.
+
+    compression is None, "gzip" or "zstd".
+    progress is called after each chunk with a dict of rows, rows_per_sec and peak_rss (bytes).
+    """
+    process = psutil.Process()
+    start = time.perf_counter()
+    stats = {"rows": 0, "rows_per_sec": 0.0, "peak_rss": process.memory_info().rss}
+    chunks = []
+
+    def collect(chunk_iter):
+        for chunk in chunk_iter:
+            chunks.append(chunk)
+            stats["rows"] += len(chunk)
+            stats["rows_per_sec"] = stats["rows"] / max(
+                time.perf_counter() - start, 1e-9
+            )
+            stats["peak_rss"] = max(stats["peak_rss"], process.memory_info().rss)
+            if progress is not None:
+                progress(stats)
+
+    try:
+        collect(_arrow_chunks(file, compression))
+    except pa.ArrowInvalid:
+        # Types inferred from the first block do not hold for the whole file,
+        # e.g. text in a numeric column; pandas' parser handles mixed columns.
+        chunks.clear()
+        stats["rows"] = 0
+        collect(_pandas_chunks(file, compression))
+
+    if not chunks:
+        return pd.read_csv(_open_stream(file, compression))
+    return concat_chunks(chunks)
+
+
+class ColumnarSource:
+    """Parquet or Arrow IPC/Feather upload whose columns are only read when asked for."""
+
+    def __init__(self, file, format):
+        self.format = format
+        self.buffer = pa.py_buffer(file.getbuffer())
+        if format == "parquet":
+            self.parquet = pq.ParquetFile(pa.BufferReader(self.buffer))
+            self.schema = self.parquet.schema_arrow
+            self.num_rows = self.parquet.metadata.num_rows
+        else:
+            reader = pa.ipc.open_file(pa.BufferReader(self.buffer))
+            self.schema = reader.schema
+            self.num_rows = sum(
+                reader.get_batch(i).num_rows for i in range(reader.num_record_batches)
+            )
+
+    @property
+    def columns(self) -> list:
+        return self.schema.names
+
+    def read(self, columns) -> pd.DataFrame:
+        """Read only the given columns into a DataFrame."""
+        if self.format == "parquet":
+            table = self.parquet.read(columns=columns)
+        else:
+            table = feather.read_table(pa.BufferReader(self.buffer), columns=columns)
+        return table.to_pandas(ignore_metadata=True)
+
+
+def iter_chunks(file, format, compression=None, parser="arrow"):
+    """Yield DataFrame chunks of a file without reading all of it into memory.
+
+    CSVs are parsed with the pyarrow reader, or with pandas' when parser is
+    "pandas", and downcast as in read_csv; Parquet files yield one chunk per
+    record batch, Arrow files one per IPC batch.
+    """
+    if format == "csv":
+        chunks = _pandas_chunks if parser == "pandas" else _arrow_chunks
+        yield from chunks(file, compression)
+    elif format == "parquet":
+        file.seek(0)
+        for batch in pq.ParquetFile(file).iter_batches():
+            yield batch.to_pandas(ignore_metadata=True)
+    else:
+        reader = pa.ipc.open_file(_open_stream(file))
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i).to_pandas(ignore_metadata=True)
+
+
+def file_format(name) -> tuple:
+    """Return (format, compression) of an uploaded file from its name."""
+    name = name.lower()
+    for suffix, fmt in sorted(FORMATS.items(), key=lambda x: -len(x[0])):
+        if name.endswith(suffix):
+            return fmt
+    raise ValueError(f"Unsupported file type: {name}")
+
+
+def read_upload(file, progress=None):
+    """Read an uploaded file.
+
+    CSVs are parsed into a DataFrame; Parquet and Arrow files are returned as a
+    ColumnarSource so that pages only read the columns they need.
+    """
+    fmt, compression = file_format(file.name)
+    if fmt == "csv":
+        return read_csv(file, compression=compression, progress=progress)
+    return ColumnarSource(file, fmt)
+
+
+def read_file(path, progress=None) -> pd.DataFrame:
+    """Read a file on disk into a DataFrame, e.g. for batch reports.
+
+    CSVs are parsed as uploads are; Parquet and Arrow files are memory mapped
+    and read whole.
+    """
+    fmt, compression = file_format(path)
+    if fmt == "csv":
+        with open(path, "rb") as file:
+            return read_csv(file, compression=compression, progress=progress)
+    if fmt == "parquet":
+        table = pq.read_table(path, memory_map=True)
+    else:
+        table = feather.read_table(path, memory_map=True)
+    return table.to_pandas(ignore_metadata=True)
@@ -0,0 +1,402 @@
+import io
+import os
+
+import matplotlib.dates as mdates
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from matplotlib.ticker import FuncFormatter, MaxNLocator
+from scipy.stats import gaussian_kde
+
+# Rows drawn point by point; larger frames are plotted from samples and binned data.
+RENDER_ROWS = int(os.environ.get("EDA_RENDER_ROWS", 50_000))
+# Points above which scatter, line and pair plots are drawn as aggregated rasters.
+RASTER_ROWS = int(os.environ.get("EDA_RASTER_ROWS", 1_000_000))
+# Pixels of a raster.
+RASTER_WIDTH = 400
+RASTER_HEIGHT = 300
+# Labels of datetime axes, see axis_positions.
+DATES = "dates"
+# Resolution of rendered charts, as st.pyplot renders them.
+FIGURE_DPI = 200
+# Buckets of x of a line chart of large data, a few pixels wide each, and
+# points per line kept by LTTB downsampling.
+LINE_BUCKETS = 500
+LTTB_POINTS = 2 * LINE_BUCKETS
+# Bucket widths of datetime axes in days, from a second to a year.
+TIME_STEPS = (
+    np.array(
+        [1, 5, 15, 30, 60, 300, 900, 1800, 3600, 10800, 21600, 43200]
+        + [86400 * days for days in (1, 7, 30, 91, 365)]
+    )
+    / 86400
+)
+# Rows given sampling priorities, or binned into a raster, at once.
+CHUNK_ROWS = 1 << 20
+# Most bins of a histogram whose bin count is estimated from the data.
+MAX_BINS = 200
+
+
+def reservoir_sample(n, size, keep=None, seed=0) -> np.ndarray:
+    """Sorted indices of a uniform sample of size rows out of n, including rows flagged in keep.
+
+    Rows get random priorities chunk by chunk and the size lowest are kept (a
+    bottom-k reservoir). If more than size rows are flagged, a uniform sample of
+    the flagged rows is returned.
+    """
+    rng = np.random.default_rng(seed)
+    flagged = np.empty(0, dtype=np.intp)
+    if keep is not None:
+        flagged = np.flatnonzero(keep)
+        if len(flagged) >= size:
+            return np.sort(rng.choice(flagged, size, replace=False))
+        size -= len(flagged)
+    priorities = np.empty(0)
+    index = np.empty(0, dtype=np.intp)
+    for start in range(0, n, CHUNK_ROWS):
+        stop = min(n, start + CHUNK_ROWS)
+        chunk = np.arange(start, stop)
+        if keep is not None:
+            chunk = chunk[~keep[start:stop]]
+        priorities = np.concatenate([priorities, rng.random(len(chunk))])
+        index = np.concatenate([index, chunk])
+        if len(index) > size:
+            lowest = np.argpartition(priorities, size)[:size]
+            priorities, index = priorities[lowest], index[lowest]
+    return np.sort(np.concatenate([index, flagged]))
+
+
+def stratified_sample(strata, size, seed=0) -> tuple:
+    """Sorted indices of about size rows sampled within each stratum, and their weights.
+
+    strata holds a non-negative integer code per row. Each stratum gets a share of
+    size proportional to its rows and at least one row; the weight of a sampled
+    row is the number of rows it stands for.
+    """
+    strata = np.asarray(strata)
+    rng = np.random.default_rng(seed)
+    counts = np.bincount(strata)
+    quota = np.minimum(counts, np.maximum(1, np.round(size * counts / len(strata))))
+    quota = np.where(counts > 0, quota, 0).astype(np.intp)
+    # Rows in random order within each stratum; the first quota of each are taken.
+    order = np.lexsort((rng.random(len(strata)), strata))
+    first = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    rank = np.arange(len(strata)) - first[strata[order]]
+    index = np.sort(order[rank < quota[strata[order]]])
+    weights = counts[strata[index]] / quota[strata[index]]
+    return index, weights
+
+
+def value_strata(values, bins=20) -> np.ndarray:
+    """Equal-width bin of each finite value, as strata for stratified_sample."""
+    low, high = values.min(), values.max()
+    if high == low:
+        return np.zeros(len(values), dtype=np.intp)
+    codes = ((values - low) / (high - low) * bins).astype(np.intp)
+    return np.minimum(codes, bins - 1)
+
+
+def auto_bins(values) -> int:
+    """Bin count of numpy's "auto" rule for finite values, at most MAX_BINS.
+
+    Far outliers make Freedman-Diaconis bins narrow relative to the range; the
+    count is worked out from the bin width rather than by building the edges.
+    """
+    n = len(values)
+    if n == 0:
+        return 1
+    span = values.max() - values.min()
+    if span == 0:
+        return 1
+    width = span / (np.log2(n) + 1)
+    q1, q3 = np.percentile(values, [25, 75])
+    if q3 > q1:
+        width = min(width, 2 * (q3 - q1) / np.cbrt(n))
+    return int(min(np.ceil(span / width), MAX_BINS))
+
+
+def binned_histogram(values, bins=20) -> tuple:
+    """Counts and edges of the histogram of the finite values, from one pass.
+
+    bins="auto" is estimated by auto_bins.
+    """
+    values = values[np.isfinite(values)]
+    if bins == "auto":
+        bins = auto_bins(values)
+    if len(values) == 0:
+        return np.zeros(bins, dtype=np.int64), np.linspace(0, 1, bins + 1)
+    return np.histogram(values, bins=bins)
+
+
+def kde_curve(values, weights=None, grid=200) -> tuple:
+    """(x, density) of a Gaussian KDE of values, or None when it cannot be estimated."""
+    if len(values) < 2 or values.min() == values.max():
+        return None
+    kde = gaussian_kde(values, weights=weights)
+    x = np.linspace(values.min(), values.max(), grid)
+    return x, kde(x)
+
+
+def box_stats(values, sample) -> dict:
+    """Box plot statistics of values for Axes.bxp, with fliers taken from sample.
+
+    Quartiles and whiskers (1.5 IQR) are exact; only the fliers drawn are sampled.
+    """
+    values = values[np.isfinite(values)]
+    q1, median, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    whislo, whishi = inside.min(), inside.max()
+    sample = sample[np.isfinite(sample)]
+    return {
+        "med": median,
+        "q1": q1,
+        "q3": q3,
+        "whislo": whislo,
+        "whishi": whishi,
+        "mean": values.mean(),
+        "fliers": sample[(sample < whislo) | (sample > whishi)],
+    }
+
+
+def sampling_note(sampled, total) -> str:
+    """Caption of a chart drawn from a sample."""
+    return f"Sampled {sampled:,} of {total:,} rows ({sampled / max(total, 1):.2%})."
+
+
+def axis_positions(values) -> tuple:
+    """Float positions of a column on a chart axis, and how to label them.
+
+    Labels are None for numbers, DATES for datetimes (as matplotlib date numbers)
+    and the sorted distinct values for any other column, placed at their codes.
+    """
+    kind = values.dtype.kind
+    if kind in "iufb":
+        return values.to_numpy(dtype=np.float64, na_value=np.nan), None
+    if kind == "M":
+        if getattr(values.dtype, "tz", None) is not None:
+            values = values.dt.tz_convert(None)
+        return mdates.date2num(values.to_numpy()), DATES
+    codes, labels = pd.factorize(values, sort=True)
+    positions = codes.astype(np.float64)
+    positions[codes < 0] = np.nan
+    return positions, labels
+
+
+def format_axis(axis, labels) -> None:
+    """Tick labels of an axis drawn from axis_positions."""
+    if labels is None:
+        return
+    if labels is DATES:
+        axis.axis_date()
+        return
+    axis.set_major_locator(MaxNLocator(nbins=10, integer=True))
+    axis.set_major_formatter(
+        FuncFormatter(
+            lambda value, _: (
+                str(labels[int(value)]) if 0 <= value < len(labels) else ""
+            )
+        )
+    )
+
+
+def raster(x, y, width=RASTER_WIDTH, height=RASTER_HEIGHT, codes=None, layers=1):
+    """Counts of points per pixel of a width x height grid spanning x and y.
+
+    With codes (integer category codes, -1 for none) there is one grid per
+    category. Points are binned chunk by chunk with bincount, so the cost is
+    linear in rows and the result has a fixed size. Returns the (layers,
+    height, width) grid and its (xmin, xmax, ymin, ymax) extent.
+    """
+    extent = _extent(x, y)
+    grid = np.zeros(layers * height * width, dtype=np.int64)
+    for start in range(0, len(x), CHUNK_ROWS):
+        stop = start + CHUNK_ROWS
+        cells, valid = _cells(x[start:stop], y[start:stop], extent, width, height)
+        if codes is not None:
+            chunk_codes = codes[start:stop]
+            valid &= chunk_codes >= 0
+            cells = cells + chunk_codes * (width * height)
+        grid += np.bincount(cells[valid], minlength=len(grid))
+    return grid.reshape(layers, height, width), extent
+
+
+def _extent(x, y) -> tuple:
+    extent = []
+    for values in (x, y):
+        low, high = np.nanmin(values), np.nanmax(values)
+        if not np.isfinite(low) or high == low:
+            low, high = (0.0, 1.0) if not np.isfinite(low) else (low - 0.5, high + 0.5)
+        extent += [low, high]
+    return tuple(extent)
+
+
+def _cells(x, y, extent, width, height) -> tuple:
+    """Flat pixel index of each point and a mask of points with both coordinates."""
+    xmin, xmax, ymin, ymax = extent
+    valid = np.isfinite(x) & np.isfinite(y)
+    with np.errstate(invalid="ignore"):
+        col = np.clip(
+            ((x - xmin) / (xmax - xmin) * width).astype(np.intp), 0, width - 1
+        )
+        row = np.clip(
+            ((y - ymin) / (ymax - ymin) * height).astype(np.intp), 0, height - 1
+        )
+    return row * width + col, valid
+
+
+def shade(grid, colors) -> np.ndarray:
+    """RGBA image of a raster; each pixel blends the colors of its layers by count.
+
+    Opacity grows with the log of the total count so sparse points stay visible.
+    """
+    total = grid.sum(axis=0)
+    image = np.zeros(total.shape + (4,))
+    filled = total > 0
+    if not filled.any():
+        return image
+    rgb = np.tensordot(np.asarray(colors, dtype=np.float64)[:, :3], grid, axes=(0, 0))
+    image[..., :3] = np.moveaxis(rgb, 0, -1) / np.maximum(total, 1)[..., None]
+    alpha = np.log1p(total) / np.log1p(total.max())
+    image[..., 3] = np.where(filled, 0.25 + 0.75 * alpha, 0)
+    return image
+
+
+def draw_raster(ax, grid, extent, colors) -> None:
+    """Draw a raster as an image over its data extent."""
+    ax.imshow(
+        shade(grid, colors),
+        extent=extent,
+        origin="lower",
+        aspect="auto",
+        interpolation="nearest",
+    )
+
+
+def raster_note(total) -> str:
+    """Caption of a chart drawn as a raster."""
+    return f"Aggregated {total:,} rows into {RASTER_WIDTH} x {RASTER_HEIGHT} pixels."
+
+
+def figure_png(figure, tight=True) -> bytes:
+    """PNG of a matplotlib figure or seaborn grid, closing the figure.
+
+    Unless tight, the figure is saved at its size instead of cropped to its content.
+    """
+    figure = figure.figure
+    buffer = io.BytesIO()
+    try:
+        figure.savefig(
+            buffer,
+            format="png",
+            dpi=FIGURE_DPI,
+            bbox_inches="tight" if tight else None,
+        )
+    finally:
+        plt.close(figure)
+    return buffer.getvalue()
+
+
+def bucket_edges(x, buckets=LINE_BUCKETS, dates=False) -> np.ndarray:
+    """Edges of at most about buckets equal-width buckets spanning the finite values of x.
+
+    Datetimes (matplotlib date numbers) get the narrowest of TIME_STEPS that
+    fits, aligned to multiples of it, as pandas resample would.
+    """
+    finite = x[np.isfinite(x)]
+    if len(finite) == 0:
+        return np.array([0.0, 1.0])
+    low, high = finite.min(), finite.max()
+    if high == low:
+        return np.array([low - 0.5, high + 0.5])
+    if not dates:
+        return np.linspace(low, high, buckets + 1)
+    fits = TIME_STEPS >= (high - low) / buckets
+    step = TIME_STEPS[fits][0] if fits.any() else (high - low) / buckets
+    start = np.floor(low / step) * step
+    return start + step * np.arange(int(np.floor((high - start) / step)) + 2)
+
+
+def bucket_index(x, edges) -> np.ndarray:
+    """Bucket of each value of x between edges, -1 for values which are not finite."""
+    index = np.clip(np.searchsorted(edges, x, side="right") - 1, 0, len(edges) - 2)
+    index[~np.isfinite(x)] = -1
+    return index
+
+
+def bucket_stats(index, buckets, x, y, codes=None, layers=1, band="min-max") -> dict:
+    """Mean x, mean y and a band of y per bucket of index and layer of codes.
+
+    band is "min-max" or "quartiles". Counts and means come from bincounts, the
+    minimum and maximum from ufunc.at and quartiles from one sort of the rows by
+    (cell, y). Returns (layers, buckets) arrays, nan in empty cells, under the
+    keys count, x, mean, low and high.
+    """
+    valid = (index >= 0) & np.isfinite(y)
+    cells = index
+    if codes is not None:
+        valid &= codes >= 0
+        cells = codes * buckets + index
+    cells, xs, ys = cells[valid], x[valid], y[valid]
+    size = layers * buckets
+    count = np.bincount(cells, minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        stats = {
+            "count": count,
+            "x": np.bincount(cells, weights=xs, minlength=size) / count,
+            "mean": np.bincount(cells, weights=ys, minlength=size) / count,
+        }
+    if band == "quartiles":
+        order = np.lexsort((ys, cells))
+        sorted_y = ys[order]
+        starts = np.concatenate([[0], np.cumsum(count)[:-1]])
+        for key, q in (("low", 0.25), ("high", 0.75)):
+            # Linear interpolation between the order statistics, as np.quantile.
+            position = starts + q * np.maximum(count - 1, 0)
+            lower = np.minimum(np.floor(position).astype(np.intp), len(ys) - 1)
+            upper = np.minimum(lower + 1, starts + np.maximum(count - 1, 0))
+            upper = np.minimum(upper, len(ys) - 1)
+            fraction = position - np.floor(position)
+            values = np.full(size, np.nan)
+            filled = count > 0
+            values[filled] = sorted_y[lower[filled]] + fraction[filled] * (
+                sorted_y[upper[filled]] - sorted_y[lower[filled]]
+            )
+            stats[key] = values
+    else:
+        low, high = np.full(size, np.inf), np.full(size, -np.inf)
+        np.minimum.at(low, cells, ys)
+        np.maximum.at(high, cells, ys)
+        stats["low"] = np.where(count > 0, low, np.nan)
+        stats["high"] = np.where(count > 0, high, np.nan)
+    return {key: value.reshape(layers, buckets) for key, value in stats.items()}
+
+
+def lttb(x, y, points=LTTB_POINTS) -> np.ndarray:
+    """Indices of the points of a series sorted by x kept by Largest-Triangle-Three-Buckets.
+
+    The first and last points are kept; from each of points - 2 buckets
+    between them, the point forming the largest triangle with the point kept
+    from the previous bucket and the mean of the next bucket.
+    """
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.intp)
+    widths = np.diff(edges)
+    mean_x = np.add.reduceat(x[:-1], edges[:-1]) / widths
+    mean_y = np.add.reduceat(y[:-1], edges[:-1]) / widths
+    # The third point of the triangles of the last bucket is the last point.
+    mean_x = np.append(mean_x[1:], x[-1])
+    mean_y = np.append(mean_y[1:], y[-1])
+    selected = np.empty(points, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    for i in range(points - 2):
+        start, stop = edges[i], edges[i + 1]
+        a = selected[i]
+        area = np.abs(
+            (x[a] - mean_x[i]) * (y[start:stop] - y[a])
+            - (x[a] - x[start:stop]) * (mean_y[i] - y[a])
+        )
+        selected[i + 1] = start + np.argmax(area)
+    return selected
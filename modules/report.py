@@ -0,0 +1,442 @@
+import copy
+import html
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+import matplotlib
+import pandas as pd
+
+from modules import backend
+from modules.cache import FigureCache, FrameCache, content_hash
+from modules.charts import (
+    TABLE_CATEGORIES,
+    TABLE_ROWS,
+    WORKERS,
+    category_counts,
+    draw_corr,
+    draw_count,
+    draw_dist,
+    figure_key,
+    render,
+)
+from modules.correlation import (
+    HEATMAP_COLUMNS,
+    correlation_matrix,
+    sorted_pairs,
+    strongest_pairs,
+    top_pairs,
+)
+from modules.detection import scan_outliers
+from modules.ingest import file_format, read_file
+from modules.stats import memoize, summary, summary_bounds, tag_frame, use_approx
+from modules.streaming import STREAM_BYTES, profile_file, stream_note
+from modules.testing import screen
+
+# Settings of a report; a JSON config file overrides any of them, see load_config.
+DEFAULT_CONFIG = {
+    # Engine of exact profiles, missing and duplicate rows, see modules.backend.
+    "backend": "pandas",
+    # Threshold of each outlier method of modules.detection.
+    "outliers": {"zscore": 3.0, "iqr": 1.5, "hampel": 3.0},
+    "correlation": {"method": "pearson", "threshold": 0.5, "top": 50},
+    # Grouping column every numerical column is tested against; no tests without one.
+    "tests": {"by": None, "test": "welch", "conf": 95},
+    # Columns drawn per kind of chart, distributions and counts.
+    "charts": {"columns": 20},
+}
+
+
+def load_config(path=None) -> dict:
+    """DEFAULT_CONFIG updated with the settings of a JSON file."""
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    if path is None:
+        return config
+    with open(path) as file:
+        overrides = json.load(file)
+    for name, value in overrides.items():
+        if name not in config:
+            raise ValueError(f"Unknown report setting: {name}")
+        if isinstance(config[name], dict):
+            config[name].update(value)
+        else:
+            config[name] = value
+    return config
+
+
+def report_files(directory) -> list:
+    """Paths of the files of directory in a format the app reads, by name."""
+    paths = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        try:
+            file_format(name)
+        except ValueError:
+            continue
+        if os.path.isfile(path):
+            paths.append(path)
+    return paths
+
+
+def report_name(path) -> str:
+    """Directory name of the report of a file."""
+    return re.sub(r"[^\w.-]", "_", os.path.basename(path))
+
+
+def report_names(paths) -> list:
+    """report_name of each path, numbered where names clash, ignoring case.
+
+    Files such as "a b.csv" and "a_b.csv" would otherwise share a directory.
+    """
+    used, names = set(), []
+    for path in paths:
+        name = unique = report_name(path)
+        suffix = 1
+        while unique.lower() in used:
+            unique, suffix = f"{name}-{suffix}", suffix + 1
+        used.add(unique.lower())
+        names.append(unique)
+    return names
+
+
+def load_data(path, frames) -> tuple:
+    """Frame of a file, and the StreamProfile of a file too large to load or None.
+
+    As with uploads, files are keyed by content, so unchanged files are read back
+    from the frame cache instead of parsed again; files larger than STREAM_BYTES
+    are profiled chunk by chunk and represented by a sample of rows.
+    """
+    fmt, compression = file_format(path)
+    with open(path, "rb") as file:
+        key = f"{fmt}-{compression}-{content_hash(file)}"
+        df = frames.get(key)
+        stream = None
+        if df is None and os.path.getsize(path) > STREAM_BYTES:
+            stream = profile_file(file, fmt, compression)
+            df = stream.sample
+            key = f"{key}-sample"
+        elif df is None:
+            df = read_file(path)
+            frames.put(key, df)
+            df = df.copy(deep=False)
+    tag_frame(df, key)
+    return df, stream
+
+
+def profile_sections(df, stream, config) -> list:
+    """Overview, description and missing values of a frame, as (title, note, table).
+
+    Files too large to load are described by the statistics of their stream.
+    """
+    overview = {"Rows": len(df), "Columns": df.shape[1]}
+    note, bounds, missing = None, None, None
+    if stream is not None:
+        overview["Rows"] = stream.rows
+        note = stream_note(stream)
+        table, bounds = stream.summary()
+    else:
+        if use_approx(df):
+            table, bounds = summary(df, approx=True), summary_bounds(df)
+        else:
+            table = backend.summary(df, config["backend"])
+        null_counts, any_null = backend.null_stats(df, config["backend"])
+        dup_rows, _, group_rows = backend.duplicate_groups(df, config["backend"])
+        overview["Rows with missing values"] = int(any_null.sum())
+        overview["Duplicated rows"] = len(dup_rows)
+        overview["Groups of equal rows"] = len(group_rows)
+        missing = pd.DataFrame(
+            {
+                "Missing": null_counts,
+                "Missing (%)": null_counts / max(len(df), 1) * 100,
+            }
+        )[null_counts > 0]
+    sections = [
+        ("Overview", note, pd.Series(overview, name="Value").to_frame()),
+        ("Description", None, table),
+    ]
+    if bounds is not None:
+        note = "Approximate statistics from sketches. Error bound of each figure:"
+        sections.append(("Error bounds", note, bounds))
+    if missing is not None:
+        sections.append(("Missing values", None, missing))
+    return sections
+
+
+def outlier_sections(df, config) -> list:
+    """Outlier counts and bounds of every numerical column for every method."""
+    thresholds = config["outliers"]
+    table = scan_outliers(df, thresholds)
+    if table.empty:
+        return [("Outliers", "There is no numerical column in the dataset.", None)]
+    counts = table.pivot(index="Column", columns="Method", values="Outliers")
+    counts = counts[list(thresholds)].sort_values(list(thresholds), ascending=False)
+    return [
+        ("Outliers per column", None, counts),
+        ("Bounds per column and method", None, table),
+    ]
+
+
+def correlation_section(df, stream, config) -> tuple:
+    """Section of the most correlated pairs, and the correlation matrix."""
+    method = config["correlation"]["method"]
+    threshold = config["correlation"]["threshold"]
+    top = config["correlation"]["top"]
+    if stream is not None and method == "pearson":
+        corr = stream.correlation()
+        pairs = strongest_pairs(sorted_pairs(corr), threshold, k=top)
+    else:
+        corr = correlation_matrix(df, method)
+        pairs = top_pairs(df, threshold, k=top, method=method)
+    title = f"Top {len(pairs)} pairs with |{method} correlation| >= {threshold}"
+    return (title, None, pairs), corr
+
+
+def test_section(df, config) -> tuple:
+    """Test of every numerical column against the groups of the by column, or None."""
+    by = config["tests"]["by"]
+    if by is None:
+        return None
+    title = f"Tests of numerical columns between groups of {by}"
+    if by not in df.columns:
+        return title, f"There is no column {by} in the dataset.", None
+    columns = [col for col in df.columns if col != by and df[col].dtype.kind in "iufb"]
+    try:
+        table = screen(df, columns, by, config["tests"]["test"])
+    except ValueError as e:
+        return title, str(e), None
+    threshold = 1 - (config["tests"]["conf"] / 100)
+    table["Reject"] = table["P value"] < threshold
+    table["Reject (FDR)"] = table["Adjusted P value"] < threshold
+    note = (
+        f"{table['Reject'].sum():,} of {len(table):,} columns differ between groups of {by}; "
+        f"{table['Reject (FDR)'].sum():,} after controlling the false discovery rate."
+    )
+    return title, note, table
+
+
+def chart_list(df, corr, config) -> tuple:
+    """Charts of a report as (title, draw, frame, args), and tables of columns of many values."""
+    limit = config["charts"]["columns"]
+    numeric = list(df.select_dtypes(include="number").columns)[:limit]
+    charts = [
+        (f"Distribution of {col}", draw_dist, df, (col, True, False)) for col in numeric
+    ]
+    tables = []
+    categorical = list(df.select_dtypes(include=["object", "category"]).columns)
+    for col in categorical[:limit]:
+        counts, _, distinct = memoize(
+            df, "category_counts", category_counts, col, None, TABLE_ROWS
+        )
+        if distinct <= TABLE_CATEGORIES:
+            charts.append((f"Counts of {col}", draw_count, df, (col, None)))
+        else:
+            note = f"{col} has {distinct:,} distinct values; the {min(TABLE_ROWS, distinct)} most frequent:"
+            tables.append((f"Most frequent values of {col}", note, counts))
+    if 1 < len(corr) <= HEATMAP_COLUMNS:
+        threshold = config["correlation"]["threshold"]
+        charts.append(("Correlation", draw_corr, corr, (threshold,)))
+    return charts, tables
+
+
+def draw_charts(charts, figures, directory) -> list:
+    """Write the PNG images of charts to directory, drawn or read from the figure cache.
+
+    Keys are those of the app with exact rendering off, so the app and reports
+    share charts of the same data.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        # Images of an earlier report of the file.
+        if name.endswith(".png"):
+            os.remove(os.path.join(directory, name))
+    drawn = []
+    for i, (title, draw, df, args) in enumerate(charts):
+        key = figure_key(df, draw, args)
+        chart = figures.get(key)
+        if chart is None:
+            chart = render(draw, df, args)
+            figures.put(key, chart)
+        images, caption = chart
+        paths = []
+        for j, image in enumerate(images):
+            paths.append(f"{os.path.basename(directory)}/{i:03d}-{j}.png")
+            with open(os.path.join(directory, f"{i:03d}-{j}.png"), "wb") as file:
+                file.write(image)
+        drawn.append({"title": title, "images": paths, "caption": caption})
+    return drawn
+
+
+def table_json(table):
+    if table is None:
+        return None
+    return json.loads(
+        table.to_json(orient="split", date_format="iso", default_handler=str)
+    )
+
+
+def report_html(name, sections, charts) -> str:
+    """Standalone HTML page of the sections and charts of a report."""
+    parts = [
+        "<!DOCTYPE html>",
+        f"<html><head><meta charset='utf-8'><title>{html.escape(name)}</title></head><body>",
+        f"<h1>{html.escape(name)}</h1>",
+    ]
+    for title, note, table in sections:
+        parts.append(f"<h2>{html.escape(title)}</h2>")
+        if note:
+            parts.append(f"<p>{html.escape(note)}</p>")
+        if table is not None:
+            parts.append(table.to_html(border=0, na_rep=""))
+    for chart in charts:
+        parts.append(f"<h2>{html.escape(chart['title'])}</h2>")
+        for path in chart["images"]:
+            parts.append(f"<img src='{html.escape(path)}' style='max-width: 100%'>")
+        if chart["caption"]:
+            parts.append(f"<p>{html.escape(chart['caption'])}</p>")
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+def build_report(path, config, output, name=None) -> dict:
+    """Profile, outliers, correlation and tests of a file, written to directory name of output.
+
+    name defaults to report_name(path).
+
+    The directory gets report.html, report.json and the chart images. Parsed
+    frames and rendered charts are kept in the caches on disk, so files which
+    did not change since the last run are neither parsed nor drawn again.
+    Returns the entry of the file in the index of the reports.
+    """
+    start = time.perf_counter()
+    frames, figures = FrameCache(), FigureCache()
+    df, stream = load_data(path, frames)
+    sections = profile_sections(df, stream, config)
+    sections += outlier_sections(df, config)
+    corr_section, corr = correlation_section(df, stream, config)
+    sections.append(corr_section)
+    tests = test_section(df, config)
+    if tests is not None:
+        sections.append(tests)
+    charts, tables = chart_list(df, corr, config)
+    sections += tables
+
+    name = name or report_name(path)
+    directory = os.path.join(output, name)
+    drawn = draw_charts(charts, figures, os.path.join(directory, "charts"))
+    frames.flush()
+    figures.flush()
+    with open(os.path.join(directory, "report.html"), "w") as file:
+        file.write(report_html(os.path.basename(path), sections, drawn))
+    report = {
+        "file": os.path.basename(path),
+        "sections": [
+            {"title": title, "note": note, "table": table_json(table)}
+            for title, note, table in sections
+        ],
+        "charts": drawn,
+    }
+    with open(os.path.join(directory, "report.json"), "w") as file:
+        json.dump(report, file, indent=1)
+    return {
+        "file": os.path.basename(path),
+        "report": f"{name}/report.html",
+        "rows": stream.rows if stream is not None else len(df),
+        "columns": df.shape[1],
+        "seconds": time.perf_counter() - start,
+        "error": None,
+    }
+
+
+def index_html(entries) -> str:
+    """Page linking the reports of a run."""
+    table = pd.DataFrame(entries)
+    # Links are written as HTML, so every other cell is escaped here.
+    for name, pattern in [
+        ("rows", "{:,}"),
+        ("columns", "{:,}"),
+        ("seconds", "{:,.1f}"),
+    ]:
+        table[name] = [
+            "" if entry[name] is None else pattern.format(entry[name])
+            for entry in entries
+        ]
+    table["error"] = [html.escape(entry["error"] or "") for entry in entries]
+    table["file"] = [
+        (
+            f"<a href='{html.escape(entry['report'])}'>{html.escape(entry['file'])}</a>"
+            if entry["report"]
+            else html.escape(entry["file"])
+        )
+        for entry in entries
+    ]
+    return "\n".join(
+        [
+            "<!DOCTYPE html>",
+            "<html><head><meta charset='utf-8'><title>EDA reports</title></head><body>",
+            "<h1>EDA reports</h1>",
+            table.drop(columns="report").to_html(
+                border=0,
+                escape=False,
+                index=False,
+            ),
+            "</body></html>",
+        ]
+    )
+
+
+def run_reports(paths, config, output, workers=WORKERS, progress=None) -> list:
+    """Reports of files, built concurrently in a pool of worker processes.
+
+    progress(entry) is called as each file is done. A file which fails gets an
+    entry with the error, so that one bad file does not stop the others.
+    Writes index.html and index.json of the entries, in the order of paths.
+    """
+    os.makedirs(output, exist_ok=True)
+    entries = [None] * len(paths)
+    names = report_names(paths)
+
+    def done(i, result=None, error=None):
+        if error is not None:
+            name = os.path.basename(paths[i])
+            result = {
+                "file": name,
+                "report": None,
+                "rows": None,
+                "columns": None,
+                "seconds": None,
+                "error": f"{type(error).__name__}: {error}",
+            }
+        entries[i] = result
+        if progress is not None:
+            progress(result)
+
+    if workers <= 1 or len(paths) <= 1:
+        for i, path in enumerate(paths):
+            try:
+                done(i, build_report(path, config, output, names[i]))
+            except Exception as e:
+                done(i, error=e)
+    else:
+        with ProcessPoolExecutor(
+            min(workers, len(paths)),
+            mp_context=get_context("spawn"),
+            initializer=matplotlib.use,
+            initargs=("Agg",),
+        ) as pool:
+            futures = {
+                pool.submit(build_report, path, config, output, names[i]): i
+                for i, path in enumerate(paths)
+            }
+            for future in as_completed(futures):
+                try:
+                    done(futures[future], future.result())
+                except Exception as e:
+                    done(futures[future], error=e)
+    with open(os.path.join(output, "index.json"), "w") as file:
+        json.dump(entries, file, indent=1)
+    with open(os.path.join(output, "index.html"), "w") as file:
+        file.write(index_html(entries))
+    return entries
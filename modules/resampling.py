@@ -0,0 +1,350 @@
+import os
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+# Statistics which can be bootstrapped.
+STATISTICS = ["mean", "median"]
+# Resamples drawn by one task of the process pool.
+BATCH_RESAMPLES = 1_000
+# Random keys or indices drawn at once when resampling rows (32 MB of float32).
+BATCH_VALUES = 1 << 23
+# Values or bins whose counts are drawn per resample: distinct values are used
+# up to this many, and larger columns are binned into quantile bins when
+# resampling rows would be too slow. Their number is LEVEL_DRAWS / resamples
+# within these bounds, about 3 seconds of draws.
+MIN_LEVELS = 64
+MAX_LEVELS = 1 << 12
+LEVEL_DRAWS = 1 << 24
+# Resamples x rows up to which rows themselves are resampled.
+EXACT_DRAWS = 1 << 28
+# Worker processes of the pool; with one, batches run in the calling process.
+WORKERS = int(os.environ.get("EDA_WORKERS", os.cpu_count() or 1))
+
+# Pool of resampling workers, started on first use and kept for later jobs.
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+# Name of the shared memory block of the job a pool worker runs, and its data.
+_worker_data = None
+
+
+def value_levels(values, max_levels=MAX_LEVELS) -> tuple:
+    """Distinct values of values with their counts and variances, and whether they are exact.
+
+    With more than max_levels distinct values, values are binned into
+    max_levels quantile bins, each represented by the mean and variance of its
+    values; otherwise variances are zero.
+    """
+    levels, counts = np.unique(values, return_counts=True)
+    if len(levels) <= max_levels:
+        return levels, counts, np.zeros(len(levels)), True
+    edges = np.quantile(values, np.linspace(0, 1, max_levels + 1))
+    bins = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, max_levels - 1)
+    counts = np.bincount(bins, minlength=max_levels)
+    filled = counts > 0
+    means = np.bincount(bins, weights=values, minlength=max_levels)[filled]
+    means /= counts[filled]
+    squares = np.bincount(bins, weights=values**2, minlength=max_levels)[filled]
+    variances = np.maximum(squares / counts[filled] - means**2, 0)
+    return means, counts[filled], variances, False
+
+
+def _within_sums(rng, drawn, counts, variances, replace) -> np.ndarray:
+    """Deviation of the sums of values drawn from bins from drawn @ means.
+
+    Drawing many values of a bin, their sum is close to normal with the
+    variance of the bin times the values drawn (with a finite population
+    correction without replacement); the deviations of all bins add up to one
+    normal draw per resample.
+    """
+    if not variances.any():
+        return 0
+    if replace:
+        variance = drawn @ variances
+    else:
+        correction = counts / np.maximum(counts - 1, 1)
+        variance = (drawn * (counts - drawn)) @ (variances * correction / counts)
+    return rng.normal(0, np.sqrt(variance))
+
+
+def _sample_statistic(samples, statistic) -> np.ndarray:
+    if statistic == "mean":
+        return samples.mean(axis=1)
+    return np.median(samples, axis=1)
+
+
+def _permute_rows(rng, data, size) -> np.ndarray:
+    """Differences in means after reassigning the pooled rows to groups at random."""
+    pooled, first = data
+    total, rows = pooled.sum(), len(pooled)
+    # Only the sum of the smaller group has to be drawn.
+    small = min(first, rows - first)
+    step = max(1, BATCH_VALUES // rows)
+    sums = []
+    for start in range(0, size, step):
+        keys = rng.random((min(step, size - start), rows), dtype=np.float32)
+        index = np.argpartition(keys, small - 1, axis=1)[:, :small]
+        sums.append(pooled[index].sum(axis=1))
+    sums = np.concatenate(sums)
+    if small != first:
+        sums = total - sums
+    return sums / first - (total - sums) / (rows - first)
+
+
+def _permute_levels(rng, data, size) -> np.ndarray:
+    """_permute_rows drawing the values of the first group from value counts."""
+    (levels, counts, variances), first = data
+    rows = counts.sum()
+    total = counts @ levels
+    drawn = rng.multivariate_hypergeometric(
+        counts, first, size=size, method="marginals"
+    )
+    sums = drawn @ levels + _within_sums(rng, drawn, counts, variances, False)
+    return sums / first - (total - sums) / (rows - first)
+
+
+def _bootstrap_rows(rng, data, size) -> np.ndarray:
+    """Statistic of samples of rows drawn with replacement, or its difference for two samples."""
+    samples, statistic = data
+    result = np.zeros(size)
+    for sign, values in zip((1, -1), samples):
+        step = max(1, BATCH_VALUES // len(values))
+        for start in range(0, size, step):
+            stop = min(size, start + step)
+            index = rng.integers(0, len(values), size=(stop - start, len(values)))
+            result[start:stop] += sign * _sample_statistic(values[index], statistic)
+    return result
+
+
+def _bootstrap_levels(rng, data, size) -> np.ndarray:
+    """_bootstrap_rows of the mean drawing counts of each value from a multinomial distribution."""
+    samples, statistic = data
+    result = np.zeros(size)
+    for sign, (levels, counts, variances) in zip((1, -1), samples):
+        rows = counts.sum()
+        drawn = rng.multinomial(rows, counts / rows, size=size)
+        value = drawn @ levels / rows
+        value += _within_sums(rng, drawn, counts, variances, True) / rows
+        result += sign * value
+    return result
+
+
+def _bootstrap_median(rng, data, size) -> np.ndarray:
+    """Median of samples drawn with replacement, or its difference for two samples.
+
+    Drawing n values with replacement from sorted values is taking the values
+    at n uniform quantiles, so the middle order statistics of a resample are
+    the values at the middle order statistics of n uniforms: the lower one is
+    Beta(k, n - k + 1) distributed and, given it, the next one is the minimum
+    of the n - k uniforms above it. This draws the exact bootstrap distribution
+    of the median in a time independent of the number of rows.
+    """
+    result = np.zeros(size)
+    for sign, values in zip((1, -1), data):
+        n = len(values)
+        lower, upper = (n - 1) // 2 + 1, n // 2 + 1
+        low = rng.beta(lower, n - lower + 1, size=size)
+        high = low
+        if upper > lower:
+            high = low + (1 - low) * rng.beta(1, n - lower, size=size)
+        index = np.minimum((np.stack([low, high]) * n).astype(np.int64), n - 1)
+        result += sign * values[index].mean(axis=0)
+    return result
+
+
+_TASKS = {
+    "permute_rows": _permute_rows,
+    "permute_levels": _permute_levels,
+    "bootstrap_rows": _bootstrap_rows,
+    "bootstrap_levels": _bootstrap_levels,
+    "bootstrap_median": _bootstrap_median,
+}
+
+
+def _job_data(name, size):
+    """Data of the job in block name, unpickled once per job by a worker; the parent unlinks it."""
+    global _worker_data
+    if _worker_data is None or _worker_data[0] != name:
+        block = SharedMemory(name=name)
+        try:
+            data = pickle.loads(bytes(block.buf[:size]))
+        finally:
+            block.close()
+        _worker_data = (name, data)
+    return _worker_data[1]
+
+
+def _pool_batch(task, name, data_size, seed, size) -> np.ndarray:
+    return _TASKS[task](np.random.default_rng(seed), _job_data(name, data_size), size)
+
+
+def resample_pool(workers=WORKERS) -> ProcessPoolExecutor:
+    """Pool of resampling workers, shared by every session of the server.
+
+    Workers are spawned rather than forked, as forking the threaded server is unsafe.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = ProcessPoolExecutor(workers, mp_context=get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def resample(task, data, resamples, seed=0, progress=None, workers=WORKERS):
+    """Run a resampling task in batches, in the worker pool when workers > 1.
+
+    Each batch draws from its own stream spawned from SeedSequence(seed), so
+    results depend on the seed but not on the number of workers. Workers read
+    the data from one shared memory block, once per job. progress(done, total)
+    is called as batches finish.
+    """
+    global _pool
+    sizes = [BATCH_RESAMPLES] * (resamples // BATCH_RESAMPLES)
+    if resamples % BATCH_RESAMPLES:
+        sizes.append(resamples % BATCH_RESAMPLES)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    results = [None] * len(sizes)
+    done = 0
+    if workers <= 1 or len(sizes) == 1:
+        for i, (child, size) in enumerate(zip(seeds, sizes)):
+            results[i] = _TASKS[task](np.random.default_rng(child), data, size)
+            done += size
+            if progress is not None:
+                progress(done, resamples)
+        return np.concatenate(results) if results else np.empty(0)
+    payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+    block = SharedMemory(create=True, size=max(len(payload), 1))
+    block.buf[: len(payload)] = payload
+    futures = {}
+    try:
+        pool = resample_pool(workers)
+        for i, (child, size) in enumerate(zip(seeds, sizes)):
+            future = pool.submit(
+                _pool_batch, task, block.name, len(payload), child, size
+            )
+            futures[future] = i
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i] = future.result()
+            done += sizes[i]
+            if progress is not None:
+                progress(done, resamples)
+    except BrokenProcessPool:
+        with _pool_lock:
+            _pool = None
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+        block.close()
+        block.unlink()
+    return np.concatenate(results)
+
+
+def _max_levels(resamples) -> int:
+    return int(np.clip(LEVEL_DRAWS // max(resamples, 1), MIN_LEVELS, MAX_LEVELS))
+
+
+def _use_rows(rows, resamples, exact_levels, exact) -> bool:
+    """Whether to resample rows rather than value counts."""
+    if exact is not None:
+        return exact and not exact_levels
+    return not exact_levels and rows * resamples <= EXACT_DRAWS
+
+
+def _clean(values) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    return values[~np.isnan(values)]
+
+
+def permutation_test(x, y, resamples=10_000, seed=0, progress=None, exact=None):
+    """Two-sided permutation test of the difference in means of two samples.
+
+    Rows are reassigned to the two samples at random. Columns with few distinct
+    values are permuted through their value counts, which is exact and takes a
+    time independent of the number of rows. Otherwise rows are permuted when
+    resamples x rows is at most EXACT_DRAWS (or exact is True), and quantile
+    bins of values when not, approximating the sum drawn within each bin as
+    normal. Returns a dict with the observed statistic, the p value, the
+    permutation distribution and whether it is exact.
+    """
+    x, y = _clean(x), _clean(y)
+    if len(x) == 0 or len(y) == 0:
+        raise ValueError("Both samples need values to be permuted.")
+    pooled = np.concatenate([x, y])
+    observed = x.mean() - y.mean()
+    *levels, exact_levels = value_levels(pooled, _max_levels(resamples))
+    if _use_rows(len(pooled), resamples, exact_levels, exact):
+        task, data = "permute_rows", (pooled, len(x))
+    else:
+        task, data = "permute_levels", (tuple(levels), len(x))
+    distribution = resample(task, data, resamples, seed, progress)
+    extreme = np.count_nonzero(np.abs(distribution) >= np.abs(observed) - 1e-12)
+    return {
+        "statistic": observed,
+        "p_value": (1 + extreme) / (1 + len(distribution)),
+        "distribution": distribution,
+        "exact": task == "permute_rows" or exact_levels,
+    }
+
+
+def bootstrap_ci(
+    x,
+    y=None,
+    statistic="mean",
+    confidence=0.95,
+    resamples=10_000,
+    seed=0,
+    progress=None,
+    exact=None,
+):
+    """Percentile bootstrap confidence interval of a statistic of x, or of its difference between x and y.
+
+    Samples are resampled with replacement; for the mean, as in
+    permutation_test, through their value counts when that is exact or rows
+    would be too slow. The median is drawn exactly from the distribution of
+    the order statistics of a resample, see _bootstrap_median. Returns a
+    dict with the statistic, the bounds of the interval, the bootstrap
+    distribution and whether it is exact.
+    """
+    if statistic not in STATISTICS:
+        raise ValueError(f"Unknown statistic: {statistic}")
+    samples = [_clean(x)] if y is None else [_clean(x), _clean(y)]
+    if any(len(values) == 0 for values in samples):
+        raise ValueError("Samples need values to be resampled.")
+    observed = sum(
+        sign * _sample_statistic(values[None, :], statistic)[0]
+        for sign, values in zip((1, -1), samples)
+    )
+    if statistic == "median":
+        # Order statistics are not kept by quantile bins; they are drawn exactly.
+        task, data = "bootstrap_median", [np.sort(values) for values in samples]
+        exact_levels = True
+    else:
+        levels = [value_levels(values, _max_levels(resamples)) for values in samples]
+        exact_levels = all(level[3] for level in levels)
+        rows = max(len(values) for values in samples)
+        if _use_rows(rows, resamples, exact_levels, exact):
+            task, data = "bootstrap_rows", (samples, statistic)
+        else:
+            task = "bootstrap_levels"
+            data = ([level[:3] for level in levels], statistic)
+    distribution = resample(task, data, resamples, seed, progress)
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(distribution, [tail, 100 - tail])
+    return {
+        "statistic": observed,
+        "low": low,
+        "high": high,
+        "distribution": distribution,
+        "exact": task == "bootstrap_rows" or exact_levels,
+    }
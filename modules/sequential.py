@@ -0,0 +1,145 @@
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+from modules.cache import CACHE_DIR
+from modules.testing import group_codes, group_summary
+
+# Directory of the JSON state of sequential experiments.
+SEQUENTIAL_DIR = os.path.join(CACHE_DIR, "sequential")
+# Effect on the mean, in standard deviations of the metric, the mixture of the
+# mSPRT is centred on; it sets the mixing variance tau^2 = (effect * sd)^2.
+EFFECT_SIZE = 0.1
+
+
+def experiment_path(name, directory=SEQUENTIAL_DIR) -> str:
+    file_name = re.sub(r"[^\w.-]", "_", name)
+    return os.path.join(directory, f"{file_name}.json")
+
+
+def new_experiment(
+    name, metric, by, control, treatment, alpha=0.05, effect=EFFECT_SIZE
+) -> dict:
+    """State of a sequential test of the mean of metric between two groups of by."""
+    return {
+        "name": name,
+        "metric": metric,
+        "by": by,
+        "control": str(control),
+        "treatment": str(treatment),
+        "alpha": alpha,
+        "effect": effect,
+        "tau": None,
+        "groups": {str(control): [0.0, 0.0, 0.0], str(treatment): [0.0, 0.0, 0.0]},
+        "chunks": [],
+        "looks": [],
+        "stopped": None,
+    }
+
+
+def load_experiment(name, directory=SEQUENTIAL_DIR):
+    """Stored state of an experiment, or None."""
+    path = experiment_path(name, directory)
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_experiment(state, directory=SEQUENTIAL_DIR) -> None:
+    path = experiment_path(state["name"], directory)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(state, file, indent=1)
+    os.replace(tmp_path, path)
+
+
+def delete_experiment(name, directory=SEQUENTIAL_DIR) -> None:
+    path = experiment_path(name, directory)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def merge_stats(first, second) -> list:
+    """Count, mean and sum of squared deviations of two sets of values combined (Chan et al.)."""
+    (n1, mean1, m21), (n2, mean2, m22) = first, second
+    n = n1 + n2
+    if n == 0:
+        return [0.0, 0.0, 0.0]
+    delta = mean2 - mean1
+    return [n, mean1 + delta * n2 / n, m21 + m22 + delta**2 * n1 * n2 / n]
+
+
+def chunk_stats(df, metric, by) -> dict:
+    """Count, mean and sum of squared deviations of metric per group of by, keyed by label text."""
+    n, mean, m2 = group_summary(df, metric, by)
+    _, labels = group_codes(df, by)
+    return {
+        str(label): [float(a), float(b) if a > 0 else 0.0, float(c) if a > 0 else 0.0]
+        for label, a, b, c in zip(labels, n, mean, m2)
+    }
+
+
+def msprt_ratio(control, treatment, tau) -> float:
+    """Mixture likelihood ratio of a difference in means against none.
+
+    Normal mixture of Johari et al. ("Always valid inference"), with the
+    variance of the difference estimated from the pooled variance of the groups.
+    """
+    (n1, mean1, m21), (n2, mean2, m22) = control, treatment
+    if n1 < 1 or n2 < 1 or n1 + n2 < 3:
+        return 1.0
+    variance = (m21 + m22) / (n1 + n2 - 2) * (1 / n1 + 1 / n2)
+    if variance <= 0:
+        return 1.0
+    diff = mean2 - mean1
+    tau2 = tau**2
+    log_ratio = 0.5 * np.log(variance / (variance + tau2)) + tau2 * diff**2 / (
+        2 * variance * (variance + tau2)
+    )
+    return float(np.exp(min(log_ratio, 700.0)))
+
+
+def add_chunk(state, df, chunk_id) -> bool:
+    """Add the rows of a new chunk to an experiment and record a look at the data.
+
+    Only the sufficient statistics of earlier chunks are kept, so no data is
+    scanned again. The always-valid p value is the running minimum of 1 / the
+    mixture likelihood ratio; it stays valid however often the data is looked
+    at, and the experiment is marked stopped at the first look where it falls
+    below alpha. tau is fixed at the first look with data in both groups.
+    Returns False, leaving state unchanged, for a chunk which was already added.
+    """
+    if chunk_id in state["chunks"]:
+        return False
+    stats = chunk_stats(df, state["metric"], state["by"])
+    groups = state["groups"]
+    for label in groups:
+        groups[label] = merge_stats(groups[label], stats.get(label, [0.0, 0.0, 0.0]))
+    control, treatment = groups[state["control"]], groups[state["treatment"]]
+    if state["tau"] is None and control[0] > 1 and treatment[0] > 1:
+        sd = np.sqrt((control[2] + treatment[2]) / (control[0] + treatment[0] - 2))
+        state["tau"] = float(state["effect"] * sd) or None
+    ratio = (
+        1.0 if state["tau"] is None else msprt_ratio(control, treatment, state["tau"])
+    )
+    previous = state["looks"][-1]["p_value"] if state["looks"] else 1.0
+    p_value = min(previous, 1 / ratio)
+    state["chunks"].append(chunk_id)
+    state["looks"].append(
+        {
+            "chunk": chunk_id,
+            "rows": int(sum(stats.get(label, [0])[0] for label in groups)),
+            "control_rows": int(control[0]),
+            "treatment_rows": int(treatment[0]),
+            "difference": treatment[1] - control[1],
+            "p_value": p_value,
+        }
+    )
+    if state["stopped"] is None and p_value < state["alpha"]:
+        state["stopped"] = len(state["looks"])
+    return True
@@ -0,0 +1,216 @@
+import numpy as np
+import pandas as pd
+
+# Values hashed or sorted at once when a sketch is updated with a long column.
+CHUNK_ROWS = 1 << 20
+
+
+def hash_values(values) -> tuple:
+    """64-bit hashes of the non-null values of a Series and the values themselves.
+
+    Categorical columns only hash their categories.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        codes = codes[codes >= 0]
+        categories = values.cat.categories
+        hashes = pd.util.hash_array(categories.to_numpy(), categorize=False)
+        return hashes[codes], categories[codes]
+    values = values.dropna().to_numpy()
+    return pd.util.hash_array(values, categorize=False), values
+
+
+def _bit_length(x) -> np.ndarray:
+    """Number of bits needed to represent each uint64."""
+    x = x.copy()
+    for shift in (1, 2, 4, 8, 16, 32):
+        x |= x >> np.uint64(shift)
+    return np.bitwise_count(x)
+
+
+class HyperLogLog:
+    """Distinct count estimate with a relative standard error of 1.04 / sqrt(2**p)."""
+
+    def __init__(self, p=14):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def update_hashes(self, hashes) -> None:
+        p = np.uint64(self.p)
+        index = (hashes >> (np.uint64(64) - p)).astype(np.intp)
+        # The guard bit bounds the rank when the remaining bits are all zero.
+        rest = (hashes << p) | (np.uint64(1) << (p - np.uint64(1)))
+        rank = (65 - _bit_length(rest)).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other) -> None:
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def estimate(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(2.0 ** -self.registers.astype(np.float64))
+        zeros = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and zeros > 0:
+            # Linear counting is more accurate for small cardinalities.
+            estimate = m * np.log(m / zeros)
+        return float(estimate)
+
+
+class KLLSketch:
+    """Quantile sketch (Karnin, Lang & Liberty) with exact min and max.
+
+    Items at level h of the compactor stack stand for 2**h items of the input.
+    """
+
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.rng = np.random.default_rng(seed)
+
+    def _capacity(self, level) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self) -> None:
+        level = 0
+        while level < len(self.levels):
+            if len(self.levels[level]) <= self._capacity(level):
+                level += 1
+                continue
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(self.levels[level])
+            # An odd item out stays at this level; every other item of the rest,
+            # starting at a random offset, moves up with twice the weight.
+            even = len(items) - len(items) % 2
+            offset = self.rng.integers(2)
+            promoted = items[offset:even:2]
+            self.levels[level] = items[even:]
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            # Adding a level lowers the capacity of the levels below it.
+            level = 0
+
+    def update(self, values) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.n += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        for chunk in np.array_split(values, -(-len(values) // CHUNK_ROWS)):
+            self.levels[0] = np.concatenate([self.levels[0], chunk])
+            self._compress()
+
+    def merge(self, other) -> None:
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    @property
+    def rank_error(self) -> float:
+        """Normalised rank error at 99% confidence (empirical fit used by DataSketches)."""
+        return 2.296 / self.k**0.9723
+
+    def quantile(self, q) -> np.ndarray:
+        if self.n == 0:
+            return np.full(np.shape(q), np.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate(
+            [np.full(len(items), 2**level) for level, items in enumerate(self.levels)]
+        )
+        order = np.argsort(items, kind="stable")
+        items, cumulative = items[order], np.cumsum(weights[order])
+        index = np.searchsorted(cumulative, np.asarray(q) * cumulative[-1])
+        result = items[np.clip(index, 0, len(items) - 1)]
+        result = np.where(np.asarray(q) <= 0, self.min, result)
+        return np.where(np.asarray(q) >= 1, self.max, result)
+
+
+class TopK:
+    """Most frequent values with Misra-Gries counters over value hashes.
+
+    Counts are lower bounds which underestimate the true frequency by at most
+    error <= n / (k + 1).
+    """
+
+    def __init__(self, k=100):
+        self.k = k
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0, dtype=object)
+        self.n = 0
+        self.error = 0
+
+    def _reduce(self, hashes, counts, values) -> tuple:
+        """Keep the k largest counters less the (k+1)-th largest count, as Misra-Gries does."""
+        if len(counts) <= self.k:
+            return hashes, counts, values
+        order = np.argsort(-counts, kind="stable")
+        threshold = counts[order[self.k]]
+        keep = order[: self.k]
+        keep = keep[counts[keep] > threshold]
+        self.error += int(threshold)
+        return hashes[keep], counts[keep] - threshold, values[keep]
+
+    def _merge(self, hashes, counts, values) -> None:
+        hashes = np.concatenate([self.hashes, hashes])
+        counts = np.concatenate([self.counts, counts])
+        values = np.concatenate([self.values, values])
+        hashes, first, inverse = np.unique(
+            hashes, return_index=True, return_inverse=True
+        )
+        counts = np.bincount(inverse, weights=counts).astype(np.int64)
+        self.hashes, self.counts, self.values = self._reduce(
+            hashes, counts, values[first]
+        )
+
+    def update(self, hashes, values) -> None:
+        self.n += len(hashes)
+        for start in range(0, len(hashes), CHUNK_ROWS):
+            stop = start + CHUNK_ROWS
+            unique, first, counts = np.unique(
+                hashes[start:stop], return_index=True, return_counts=True
+            )
+            chunk_values = np.asarray(values[start:stop], dtype=object)
+            # Summarising the chunk before merging keeps the merge small; errors of
+            # Misra-Gries summaries add up to at most n / (k + 1) when merged.
+            self._merge(
+                *self._reduce(unique, counts.astype(np.int64), chunk_values[first])
+            )
+
+    def merge(self, other) -> None:
+        self.n += other.n
+        self.error += other.error
+        self._merge(other.hashes, other.counts, other.values)
+
+    def count(self, hashes) -> np.ndarray:
+        """Exact occurrences of each tracked value in hashes, in one vectorised pass."""
+        if len(self.hashes) == 0:
+            return np.empty(0, dtype=np.int64)
+        order = np.argsort(self.hashes)
+        tracked = self.hashes[order]
+        position = np.clip(np.searchsorted(tracked, hashes), 0, len(tracked) - 1)
+        found = tracked[position] == hashes
+        counts = np.bincount(position[found], minlength=len(tracked))
+        result = np.empty_like(counts)
+        result[order] = counts
+        return result
+
+    def top(self, n=1) -> list:
+        """(value, count) pairs of the n most frequent values."""
+        order = np.argsort(-self.counts, kind="stable")[:n]
+        return [(self.values[i], int(self.counts[i])) for i in order]
@@ -0,0 +1,317 @@
+import hashlib
+import os
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from modules.cache import LRUCache
+from modules.sketches import HyperLogLog, KLLSketch, TopK, hash_values
+
+# Memory bound of cached statistics shared by all sessions.
+STATS_BYTES = 1 << 30
+# Rows of the description tables, in display order.
+SUMMARY_ROWS = [
+    "count",
+    "unique",
+    "top",
+    "freq",
+    "mean",
+    "std",
+    "min",
+    "max",
+    "null (%)",
+    "Datatype",
+]
+
+# Frames with more rows than this are profiled with sketches by default.
+APPROX_ROWS = int(os.environ.get("EDA_APPROX_ROWS", 5_000_000))
+# Quantiles shown by the approximate profile.
+QUANTILES = {"25%": 0.25, "50%": 0.5, "75%": 0.75}
+APPROX_SUMMARY_ROWS = SUMMARY_ROWS[:7] + list(QUANTILES) + SUMMARY_ROWS[7:]
+
+_cache = LRUCache(STATS_BYTES)
+_missing = object()
+# Content hash of frames holding the data of a file, by id, see tag_frame.
+_tags = {}
+
+
+def tag_frame(df, content_hash) -> None:
+    """Record that df holds the data of a file with content_hash.
+
+    frame_fingerprint then hashes only the shape and dtypes of df. The tag is
+    kept for this object alone: frames derived from it, which pandas gives a
+    copy of df.attrs, are hashed row by row.
+    """
+    key = id(df)
+    _tags[key] = (weakref.ref(df, lambda _: _tags.pop(key, None)), content_hash)
+
+
+def frame_tag(df):
+    """Content hash given to df by tag_frame, or None."""
+    ref, content_hash = _tags.get(id(df), (None, None))
+    return content_hash if ref is not None and ref() is df else None
+
+
+def frame_fingerprint(df) -> str:
+    """Fingerprint of the data and dtypes of a DataFrame.
+
+    Only the shape and dtypes of uploaded frames are hashed, along with the
+    content hash of the file given by tag_frame; other frames are hashed row by row.
+    """
+    base = frame_tag(df)
+    if base is None:
+        base = hashlib.blake2b(
+            pd.util.hash_pandas_object(df, index=True, categorize=False)
+            .to_numpy()
+            .tobytes(),
+            digest_size=16,
+        ).hexdigest()
+    schema = [(str(col), str(dtype)) for col, dtype in df.dtypes.items()]
+    return hashlib.blake2b(
+        repr((base, df.shape, schema)).encode(), digest_size=16
+    ).hexdigest()
+
+
+def memoize(df, name, func, *args):
+    """Return func(df, *args), computed once per fingerprint of df.
+
+    Results are shared between sessions and must not be modified by callers.
+    """
+    key = (frame_fingerprint(df), name, args)
+    result = _cache.get(key, _missing)
+    if result is _missing:
+        result = func(df, *args)
+        _cache.put(key, result)
+    return result
+
+
+def _null_bitmaps(df) -> np.ndarray:
+    bitmaps = np.empty((df.shape[1], (len(df) + 7) // 8), dtype=np.uint8)
+    for i, col in enumerate(df.columns):
+        bitmaps[i] = np.packbits(df[col].isna().to_numpy())
+    return bitmaps
+
+
+def null_bitmaps(df) -> np.ndarray:
+    """Packed null mask of each column, a (columns, ceil(rows / 8)) uint8 array.
+
+    An eighth of the size of boolean masks, so it is kept across reruns.
+    """
+    return memoize(df, "null_bitmaps", _null_bitmaps)
+
+
+def _null_stats(df) -> tuple:
+    bitmaps = null_bitmaps(df)
+    counts = np.bitwise_count(bitmaps).sum(axis=1, dtype=np.int64)
+    any_null = np.unpackbits(
+        np.bitwise_or.reduce(bitmaps, axis=0), count=len(df)
+    ).astype(bool)
+    return pd.Series(counts, index=df.columns, dtype="int64"), any_null
+
+
+def null_stats(df) -> tuple:
+    """Null count per column and a mask of rows with any null, from null_bitmaps."""
+    return memoize(df, "null_stats", _null_stats)
+
+
+def _describe_column(values) -> dict:
+    """describe(include="all") statistics of a column, in one pass where possible."""
+    kind = values.dtype.kind
+    if kind in "iuf":
+        array = values.to_numpy(dtype="float64", na_value=np.nan)
+        array = array[~np.isnan(array)]
+        if len(array) == 0:
+            return {"count": 0}
+        return {
+            "count": len(array),
+            "mean": array.mean(),
+            "std": array.std(ddof=1) if len(array) > 1 else np.nan,
+            "min": array.min(),
+            "max": array.max(),
+        }
+    if kind in "mM":
+        valid = values.dropna()
+        if len(valid) == 0:
+            return {"count": 0}
+        return {
+            "count": len(valid),
+            "mean": valid.mean(),
+            "min": valid.min(),
+            "max": valid.max(),
+        }
+    counts = values.value_counts()
+    counts = counts[counts > 0]
+    return {
+        "count": int(counts.sum()),
+        "unique": len(counts),
+        "top": counts.index[0] if len(counts) else np.nan,
+        "freq": counts.iloc[0] if len(counts) else np.nan,
+    }
+
+
+def summary_frame(df, stats, null_counts) -> pd.DataFrame:
+    """Summary table of df from per-column statistics and null counts."""
+    summary = pd.DataFrame(
+        stats, index=SUMMARY_ROWS, columns=df.columns, dtype="object"
+    )
+    summary.loc["null (%)"] = null_counts / max(len(df), 1) * 100
+    summary.loc["Datatype"] = df.dtypes
+    return summary
+
+
+def _summary(df) -> pd.DataFrame:
+    null_counts, _ = null_stats(df)
+    stats = {col: _describe_column(df[col]) for col in df.columns}
+    return summary_frame(df, stats, null_counts)
+
+
+def _sketch_column(values) -> tuple:
+    """Statistics of a column from sketches, and the error bound of each figure."""
+    kind = values.dtype.kind
+    if kind in "iuf":
+        array = values.to_numpy(dtype="float64", na_value=np.nan)
+        array = array[~np.isnan(array)]
+        if len(array) == 0:
+            return {"count": 0}, {"count": "exact"}
+        sketch = KLLSketch()
+        sketch.update(array)
+        stats = {
+            "count": len(array),
+            "mean": array.mean(),
+            "std": array.std(ddof=1) if len(array) > 1 else np.nan,
+            "min": sketch.min,
+            "max": sketch.max,
+        }
+        stats.update(zip(QUANTILES, sketch.quantile(list(QUANTILES.values()))))
+        bounds = {row: "exact" for row in stats}
+        bounds.update(
+            {row: f"±{sketch.rank_error:.2%} in rank (KLL)" for row in QUANTILES}
+        )
+        return stats, bounds
+    if kind in "mM":
+        stats = _describe_column(values)
+        return stats, {row: "exact" for row in stats}
+
+    hashes, distinct = hash_values(values)
+    if len(hashes) == 0:
+        return {"count": 0}, {"count": "exact"}
+    hll = HyperLogLog()
+    hll.update_hashes(hashes)
+    top_k = TopK()
+    top_k.update(hashes, distinct)
+    # A second pass counts the candidates exactly; any value more frequent than
+    # the Misra-Gries error is guaranteed to be among them.
+    counts = top_k.count(hashes)
+    if len(counts) > 0:
+        best = np.argmax(counts)
+        top, freq = top_k.values[best], counts[best]
+    else:
+        top, freq = distinct[0], np.count_nonzero(hashes == hashes[0])
+    stats = {
+        "count": len(hashes),
+        "unique": round(hll.estimate()),
+        "top": top,
+        "freq": freq,
+    }
+    bounds = {
+        "count": "exact",
+        "unique": f"±{hll.relative_error:.2%} (HyperLogLog, 1 s.e.)",
+        "top": (
+            "exact"
+            if freq > top_k.error
+            else f"values seen at most {top_k.error:,} times may be missed"
+        ),
+        "freq": "exact",
+    }
+    return stats, bounds
+
+
+def _approx_summary(df) -> tuple:
+    null_counts, _ = null_stats(df)
+    stats, bounds = {}, {}
+    for col in df.columns:
+        stats[col], bounds[col] = _sketch_column(df[col])
+    table = pd.DataFrame(
+        stats, index=APPROX_SUMMARY_ROWS, columns=df.columns, dtype="object"
+    )
+    table.loc["null (%)"] = null_counts / max(len(df), 1) * 100
+    table.loc["Datatype"] = df.dtypes
+    bounds = pd.DataFrame(
+        bounds, index=APPROX_SUMMARY_ROWS, columns=df.columns, dtype="object"
+    )
+    bounds.loc[["null (%)", "Datatype"]] = "exact"
+    return table, bounds
+
+
+def use_approx(df) -> bool:
+    """Whether df is large enough to be profiled with sketches by default."""
+    return len(df) > APPROX_ROWS
+
+
+def summary(df, approx=False) -> pd.DataFrame:
+    """Statistics of every column as in describe(include="all"), with null (%) and Datatype.
+
+    With approx, unique/top/freq and quartiles come from streaming sketches
+    instead of exact scans; see summary_bounds for their error bounds.
+    """
+    if approx:
+        return memoize(df, "approx_summary", _approx_summary)[0]
+    return memoize(df, "summary", _summary)
+
+
+def summary_bounds(df) -> pd.DataFrame:
+    """Error bound of each figure of summary(df, approx=True)."""
+    return memoize(df, "approx_summary", _approx_summary)[1]
+
+
+def summary_table(df, include=None, rows=None, approx=False, bounds=False):
+    """Subset of summary (or its bounds) for the dtypes in include and the given rows."""
+    table = summary_bounds(df) if bounds else summary(df, approx=approx)
+    if include is not None:
+        table = table[df.select_dtypes(include=include).columns]
+    if rows is not None:
+        table = table.loc[rows]
+    return table
+
+
+def _row_hashes(df) -> np.ndarray:
+    return pd.util.hash_pandas_object(df, index=False, categorize=False).to_numpy()
+
+
+def row_hashes(df) -> np.ndarray:
+    """64-bit hash of each row over all columns; equal rows hash equal."""
+    return memoize(df, "row_hashes", _row_hashes)
+
+
+def duplicate_groups(hashes) -> tuple:
+    """Rows whose hash occurs more than once, grouped, from an array of row hashes.
+
+    Returns the positions of those rows ordered by group and then by position,
+    the group id of each, and the number of rows of each group. Groups are
+    numbered by their first row. With 64-bit hashes, rows are merged by a
+    collision with probability about rows**2 / 2**65.
+    """
+    order = np.argsort(hashes, kind="stable")
+    ordered = hashes[order]
+    starts = np.flatnonzero(np.concatenate([[True], ordered[1:] != ordered[:-1]]))
+    counts = np.diff(np.append(starts, len(hashes)))
+    duplicated = counts > 1
+    # Rows of each group in hash order, then moved to the slot of their group.
+    rows = order[np.repeat(duplicated, counts)]
+    starts, counts = starts[duplicated], counts[duplicated]
+    by_first = np.argsort(order[starts])
+    rank = np.empty(len(counts), dtype=np.intp)
+    rank[by_first] = np.arange(len(counts))
+    offsets = np.concatenate([[0], np.cumsum(counts[by_first])[:-1]])
+    groups = np.repeat(rank, counts)
+    slots = (
+        offsets[groups]
+        + np.arange(len(rows))
+        - np.repeat(np.cumsum(counts) - counts, counts)
+    )
+    grouped_rows = np.empty_like(rows)
+    grouped_rows[slots] = rows
+    grouped = np.empty_like(groups)
+    grouped[slots] = groups
+    return grouped_rows, grouped, counts[by_first]
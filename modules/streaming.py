@@ -0,0 +1,293 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from modules.ingest import iter_chunks
+from modules.sketches import HyperLogLog, KLLSketch, TopK, hash_values
+from modules.stats import APPROX_SUMMARY_ROWS, QUANTILES
+
+# Rows kept as a uniform sample of the stream for charts.
+SAMPLE_ROWS = 100_000
+# Uploads larger than this are profiled chunk by chunk instead of loaded. Streamlit
+# holds the upload itself in memory; only the parsed frame is avoided. Uploads are
+# limited to server.maxUploadSize of .streamlit/config.toml (4 GB).
+STREAM_BYTES = int(os.environ.get("EDA_STREAM_BYTES", 1 << 30))
+
+
+class Moments:
+    """Count, mean, variance, min, max and nulls of columns, merged chunk by chunk.
+
+    Means and sums of squared deviations are combined with the pairwise update
+    of Chan et al., the batched form of Welford's algorithm.
+    """
+
+    def __init__(self, size):
+        self.count = np.zeros(size)
+        self.mean = np.zeros(size)
+        self.m2 = np.zeros(size)
+        self.min = np.full(size, np.nan)
+        self.max = np.full(size, np.nan)
+        self.nulls = np.zeros(size, dtype=np.int64)
+
+    def update(self, block) -> None:
+        """Add a (rows, columns) float64 block, nan where null."""
+        present = ~np.isnan(block)
+        count = present.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(present, block, 0).sum(axis=0) / count
+            m2 = np.where(present, block - mean, 0) ** 2
+        self._merge(count, np.nan_to_num(mean), m2.sum(axis=0))
+        self.nulls += len(block) - count
+        self.min = np.fmin(self.min, np.fmin.reduce(block, axis=0))
+        self.max = np.fmax(self.max, np.fmax.reduce(block, axis=0))
+
+    def merge(self, other) -> None:
+        self._merge(other.count, other.mean, other.m2)
+        self.nulls += other.nulls
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+
+    def _merge(self, count, mean, m2) -> None:
+        total = self.count + count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = mean - self.mean
+            self.mean = np.where(total > 0, self.mean + delta * count / total, 0)
+            self.m2 = np.where(
+                total > 0, self.m2 + m2 + delta**2 * self.count * count / total, 0
+            )
+        self.count = total
+
+    @property
+    def std(self) -> np.ndarray:
+        """Sample standard deviation (ddof=1), as in describe."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count > 1, np.sqrt(self.m2 / (self.count - 1)), np.nan)
+
+
+class CrossProducts:
+    """Pairwise complete cross products of columns for Pearson correlation.
+
+    Values are shifted by the means of the first block, before they are cast to
+    float32, so that float32 sums do not lose the variance to cancellation.
+    Cross products, and sums, squares and counts of column i over rows where
+    column j is present, are accumulated with float32 matrix products.
+    """
+
+    def __init__(self, size):
+        self.shift = None
+        self.cross = np.zeros((size, size))
+        self.counts = np.zeros((size, size))
+        self.sums = np.zeros((size, size))
+        self.squares = np.zeros((size, size))
+
+    def update(self, block) -> None:
+        """Add a (rows, columns) block, nan where null."""
+        block = np.asarray(block, dtype=np.float64)
+        if self.shift is None:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = np.nansum(block, axis=0) / (~np.isnan(block)).sum(axis=0)
+            self.shift = np.nan_to_num(mean)
+        block = (block - self.shift).astype(np.float32)
+        present = ~np.isnan(block)
+        if present.all():
+            self.counts += len(block)
+            self.sums += block.sum(axis=0, dtype=np.float64)[:, None]
+            self.squares += np.square(block).sum(axis=0, dtype=np.float64)[:, None]
+        else:
+            block[~present] = 0
+            mask = present.astype(np.float32)
+            self.counts += mask.T @ mask
+            self.sums += block.T @ mask
+            self.squares += np.square(block).T @ mask
+        self.cross += block.T @ block
+
+    def merge(self, other) -> None:
+        """Add the products of another accumulator; both must share the same shift."""
+        self.cross += other.cross
+        self.counts += other.counts
+        self.sums += other.sums
+        self.squares += other.squares
+
+    def correlation(self) -> np.ndarray:
+        counts = self.counts
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = self.cross - self.sums * self.sums.T / counts
+            var = self.squares - self.sums**2 / counts
+            corr = cov / np.sqrt(var * var.T)
+        corr[counts < 2] = np.nan
+        corr = np.clip(corr, -1, 1)
+        np.fill_diagonal(corr, np.where(np.isnan(np.diag(corr)), np.nan, 1.0))
+        return corr
+
+
+class StreamProfile:
+    """Statistics of data read chunk by chunk, without holding it in memory.
+
+    Numerical columns get exact moments, KLL quantiles and cross products for
+    correlation; datetime columns exact min and max; other columns HyperLogLog
+    distinct counts and Misra-Gries most frequent values. A uniform sample of
+    rows is kept for charts. Column kinds are taken from the first chunk.
+    """
+
+    def __init__(self, sample_rows=SAMPLE_ROWS, seed=0):
+        self.sample_rows = sample_rows
+        self.rng = np.random.default_rng(seed)
+        self.rows = 0
+        self.columns = None
+
+    def _start(self, chunk) -> None:
+        self.columns = list(chunk.columns)
+        self.dtypes = chunk.dtypes
+        kinds = {col: chunk[col].dtype.kind for col in self.columns}
+        self.numeric = [col for col in self.columns if kinds[col] in "iuf"]
+        self.dates = [col for col in self.columns if kinds[col] in "mM"]
+        self.others = [
+            col for col in self.columns if col not in self.numeric + self.dates
+        ]
+        self.moments = Moments(len(self.numeric))
+        self.cross = CrossProducts(len(self.numeric))
+        self.quantiles = {col: KLLSketch() for col in self.numeric}
+        # Count, min, max and mean (in ns since the epoch) of datetime columns.
+        self.date_stats = {col: [0, None, None, 0.0] for col in self.dates}
+        self.distinct = {col: HyperLogLog() for col in self.others}
+        self.frequent = {col: TopK() for col in self.others}
+        self.nulls = {col: 0 for col in self.dates + self.others}
+        self.sample = chunk.iloc[:0]
+        self.priorities = np.empty(0)
+
+    def update(self, chunk) -> None:
+        if self.columns is None:
+            self._start(chunk)
+        self.rows += len(chunk)
+        if self.numeric:
+            block = chunk[self.numeric].to_numpy(dtype=np.float64, na_value=np.nan)
+            self.moments.update(block)
+            self.cross.update(block)
+            for i, col in enumerate(self.numeric):
+                self.quantiles[col].update(block[:, i])
+        for col in self.dates:
+            values = chunk[col].dropna()
+            stats = self.date_stats[col]
+            self.nulls[col] += len(chunk) - len(values)
+            if len(values):
+                stats[0] += len(values)
+                mean = values.to_numpy(dtype="datetime64[ns]").astype(np.float64).mean()
+                stats[3] += (mean - stats[3]) * len(values) / stats[0]
+                low, high = values.min(), values.max()
+                stats[1] = low if stats[1] is None else min(stats[1], low)
+                stats[2] = high if stats[2] is None else max(stats[2], high)
+        for col in self.others:
+            hashes, values = hash_values(chunk[col])
+            self.nulls[col] += len(chunk) - len(hashes)
+            self.distinct[col].update_hashes(hashes)
+            self.frequent[col].update(hashes, values)
+        self._sample(chunk)
+
+    def _sample(self, chunk) -> None:
+        """Keep the rows with the lowest random priorities seen so far (bottom-k)."""
+        priorities = np.concatenate([self.priorities, self.rng.random(len(chunk))])
+        keep = np.sort(np.argsort(priorities)[: self.sample_rows])
+        rows = pd.concat([self.sample, chunk], ignore_index=True)
+        self.sample = rows.iloc[keep].reset_index(drop=True)
+        self.priorities = priorities[keep]
+
+    def summary(self) -> tuple:
+        """Table of summary(df, approx=True) and the error bound of each figure."""
+        stats, bounds = {}, {}
+        moments = self.moments
+        std = moments.std
+        for i, col in enumerate(self.numeric):
+            sketch = self.quantiles[col]
+            stats[col] = {
+                "count": int(moments.count[i]),
+                "mean": moments.mean[i] if moments.count[i] else np.nan,
+                "std": std[i],
+                "min": moments.min[i],
+                "max": moments.max[i],
+                "null (%)": moments.nulls[i] / max(self.rows, 1) * 100,
+            }
+            stats[col].update(zip(QUANTILES, sketch.quantile(list(QUANTILES.values()))))
+            bounds[col] = {row: "exact" for row in stats[col]}
+            bounds[col].update(
+                {row: f"±{sketch.rank_error:.2%} in rank (KLL)" for row in QUANTILES}
+            )
+        for col in self.dates:
+            count, low, high, mean = self.date_stats[col]
+            stats[col] = {"count": count, "min": low, "max": high}
+            if count:
+                stats[col]["mean"] = pd.Timestamp(
+                    int(mean), tz=getattr(low, "tz", None)
+                )
+            bounds[col] = {row: "exact" for row in stats[col]}
+        for col in self.others:
+            top = self.frequent[col].top()
+            error = self.frequent[col].error
+            stats[col] = {
+                "count": self.frequent[col].n,
+                "unique": round(self.distinct[col].estimate()),
+                "top": top[0][0] if top else np.nan,
+                "freq": top[0][1] if top else np.nan,
+            }
+            bounds[col] = {
+                "count": "exact",
+                "unique": f"±{self.distinct[col].relative_error:.2%} (HyperLogLog, 1 s.e.)",
+                "top": (
+                    "exact"
+                    if not top or top[0][1] > error
+                    else f"values seen at most {error:,} times may be missed"
+                ),
+                "freq": "exact" if error == 0 else f"lower bound, by at most {error:,}",
+            }
+        for col in self.dates + self.others:
+            stats[col]["null (%)"] = self.nulls[col] / max(self.rows, 1) * 100
+            bounds[col]["null (%)"] = "exact"
+        table = pd.DataFrame(
+            stats, index=APPROX_SUMMARY_ROWS, columns=self.columns, dtype="object"
+        )
+        table.loc["Datatype"] = self.dtypes
+        bounds = pd.DataFrame(
+            bounds, index=APPROX_SUMMARY_ROWS, columns=self.columns, dtype="object"
+        )
+        bounds.loc["Datatype"] = "exact"
+        return table, bounds
+
+    def correlation(self) -> pd.DataFrame:
+        """Pearson correlation matrix of the numerical columns."""
+        return pd.DataFrame(
+            self.cross.correlation(), index=self.numeric, columns=self.numeric
+        )
+
+
+def stream_note(stream) -> str:
+    return (
+        f"Statistics of all {stream.rows:,} rows, computed while streaming the file; "
+        f"other results use a uniform sample of {len(stream.sample):,} rows."
+    )
+
+
+def profile_chunks(chunks, progress=None, sample_rows=SAMPLE_ROWS) -> StreamProfile:
+    """Feed DataFrame chunks to a StreamProfile; progress(rows) is called after each."""
+    profile = StreamProfile(sample_rows=sample_rows)
+    for chunk in chunks:
+        profile.update(chunk)
+        if progress is not None:
+            progress(profile.rows)
+    return profile
+
+
+def profile_file(file, format, compression=None, progress=None) -> StreamProfile:
+    """StreamProfile of an uploaded file, read chunk by chunk.
+
+    As in read_csv, CSVs whose types change after the first block are profiled
+    again with pandas' parser.
+    """
+    try:
+        return profile_chunks(iter_chunks(file, format, compression), progress)
+    except pa.ArrowInvalid:
+        if format != "csv":
+            raise
+        return profile_chunks(
+            iter_chunks(file, format, compression, parser="pandas"), progress
+        )
@@ -0,0 +1,204 @@
+import numpy as np
+import pandas as pd
+from scipy import stats as distributions
+
+from modules.stats import memoize
+
+# Tests computed from per-group sufficient statistics of a numerical column.
+TESTS = ["z", "t", "welch", "anova"]
+# Values converted to float64 at once when screening many columns (128 MB).
+BLOCK_VALUES = 1 << 24
+# Cells of the largest contingency table of a chi-square test (8 MB of counts).
+MAX_CELLS = 1 << 20
+
+
+def _group_codes(df, by) -> tuple:
+    codes, labels = pd.factorize(df[by])
+    return codes, labels
+
+
+def group_codes(df, by) -> tuple:
+    """Integer group of each row of df by column by (-1 for nulls) and the group labels.
+
+    Groups are numbered in order of first appearance, as by unique(); they are
+    found once per frame fingerprint and shared by every test.
+    """
+    return memoize(df, "group_codes", _group_codes, by)
+
+
+def sufficient_stats(values, codes, groups) -> tuple:
+    """Count, mean and sum of squared deviations of each column of values per group.
+
+    values is a (rows,) or (rows, columns) float array, nan where null, and codes
+    the group of each row (-1 to leave it out). Sums are accumulated per column
+    with bincount in O(rows) whatever the number of groups, shifted by the mean
+    of the column to keep precision. Returns (groups,) or (groups, columns) arrays.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    single = values.ndim == 1
+    values = values.reshape(len(values), -1)
+    columns = values.shape[1]
+    n, sums, squares = (np.zeros((groups, columns)) for _ in range(3))
+    shift = np.zeros(columns)
+    grouped = np.asarray(codes) >= 0
+    for j in range(columns):
+        keep = grouped & ~np.isnan(values[:, j])
+        column, group = values[keep, j], codes[keep]
+        if len(column):
+            shift[j] = column.mean()
+        column = column - shift[j]
+        n[:, j] = np.bincount(group, minlength=groups)
+        sums[:, j] = np.bincount(group, weights=column, minlength=groups)
+        squares[:, j] = np.bincount(group, weights=column**2, minlength=groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = sums / n
+        m2 = np.maximum(squares - sums * mean, 0)
+    mean = mean + shift
+    if single:
+        return n[:, 0], mean[:, 0], m2[:, 0]
+    return n, mean, m2
+
+
+def column_stats(values) -> tuple:
+    """sufficient_stats of a single group holding every row of values."""
+    values = np.asarray(values, dtype=np.float64)
+    return sufficient_stats(values, np.zeros(len(values), dtype=np.intp), 1)
+
+
+def two_sample(n, mean, m2, test="t") -> tuple:
+    """Statistic, degrees of freedom and two-sided p value comparing the means of two groups.
+
+    Arrays hold the two groups along the first axis. z and t pool the variances
+    (as statsmodels ztest and scipy ttest_ind); welch does not.
+    """
+    n1, n2 = n[0], n[1]
+    diff = mean[0] - mean[1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if test == "welch":
+            v1, v2 = m2[0] / (n1 - 1) / n1, m2[1] / (n2 - 1) / n2
+            stat = diff / np.sqrt(v1 + v2)
+            dof = (v1 + v2) ** 2 / (v1**2 / (n1 - 1) + v2**2 / (n2 - 1))
+        else:
+            dof = n1 + n2 - 2
+            pooled = (m2[0] + m2[1]) / dof
+            stat = diff / np.sqrt(pooled * (1 / n1 + 1 / n2))
+    if test == "z":
+        return stat, dof, 2 * distributions.norm.sf(np.abs(stat))
+    if test not in ("t", "welch"):
+        raise ValueError(f"Unknown two sample test: {test}")
+    return stat, dof, 2 * distributions.t.sf(np.abs(stat), dof)
+
+
+def anova(n, mean, m2) -> tuple:
+    """F statistic, degrees of freedom and p value of a one-way ANOVA over groups.
+
+    Groups without values are left out.
+    """
+    n, mean, m2 = (np.asarray(a, dtype=np.float64) for a in (n, mean, m2))
+    filled = n > 0
+    k = filled.sum(axis=0)
+    total = n.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        grand = np.where(filled, n * np.nan_to_num(mean), 0).sum(axis=0) / total
+        between = np.where(filled, n * (np.nan_to_num(mean) - grand) ** 2, 0).sum(
+            axis=0
+        )
+        within = np.where(filled, m2, 0).sum(axis=0)
+        stat = (between / (k - 1)) / (within / (total - k))
+    dof = (k - 1, total - k)
+    return stat, dof, distributions.f.sf(stat, *dof)
+
+
+def chi_square(first, second) -> tuple:
+    """Chi-square test of independence of two columns, and their contingency table.
+
+    Returns the statistic, degrees of freedom, p value and the table, with
+    Yates' correction for 2 x 2 tables as in scipy's chi2_contingency. Raises
+    ValueError for continuous or ID-like columns, whose table would have more
+    than MAX_CELLS cells.
+    """
+    codes = [pd.factorize(values, sort=True) for values in (first, second)]
+    (a, rows), (b, columns) = codes
+    if len(rows) * len(columns) > MAX_CELLS:
+        raise ValueError(
+            f"The contingency table would have {len(rows):,} x {len(columns):,} cells; "
+            f"please select categorical columns with at most {MAX_CELLS:,} combinations of values."
+        )
+    present = (a >= 0) & (b >= 0)
+    counts = np.bincount(
+        a[present] * len(columns) + b[present], minlength=len(rows) * len(columns)
+    ).reshape(len(rows), len(columns))
+    table = pd.DataFrame(counts, index=rows, columns=columns)
+    if min(counts.shape) < 2:
+        return np.nan, 0, np.nan, table
+    stat, p, dof, _ = distributions.chi2_contingency(counts)
+    return stat, dof, p, table
+
+
+def _group_summary(df, column, by) -> tuple:
+    codes, labels = group_codes(df, by)
+    values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+    return sufficient_stats(values, codes, len(labels))
+
+
+def group_summary(df, column, by) -> tuple:
+    """sufficient_stats of column per group of by, computed once per frame fingerprint."""
+    return memoize(df, "group_summary", _group_summary, column, by)
+
+
+def screen(df, columns, by, test="welch") -> pd.DataFrame:
+    """Result of one test of every column against the groups of by, strongest first.
+
+    Columns are converted in blocks and their per-group statistics accumulated
+    together; two sample tests need exactly two groups.
+    """
+    codes, labels = group_codes(df, by)
+    if test not in TESTS:
+        raise ValueError(f"Unknown test: {test}")
+    if test != "anova" and len(labels) != 2:
+        raise ValueError(f"{test} tests need two groups; {by} has {len(labels)}.")
+    results = []
+    step = max(1, BLOCK_VALUES // max(len(df), 1))
+    for start in range(0, len(columns), step):
+        block = list(columns[start:][:step])
+        values = df[block].to_numpy(dtype=np.float64, na_value=np.nan)
+        n, mean, m2 = sufficient_stats(values, codes, len(labels))
+        if test == "anova":
+            stat, (between, within), p = anova(n, mean, m2)
+            dof = [f"{a:.0f}, {b:.0f}" for a, b in zip(between, within)]
+        else:
+            stat, dof, p = two_sample(n, mean, m2, test)
+        results.append(
+            pd.DataFrame(
+                {
+                    "Column": block,
+                    "Rows": n.sum(axis=0).astype(np.int64),
+                    "Statistic": stat,
+                    "Degrees of freedom": dof,
+                    "P value": p,
+                }
+            )
+        )
+    if not results:
+        return pd.DataFrame(
+            columns=[
+                "Column",
+                "Rows",
+                "Statistic",
+                "Degrees of freedom",
+                "P value",
+                "Adjusted P value",
+            ]
+        )
+    table = pd.concat(results, ignore_index=True)
+    table["Adjusted P value"] = adjusted_p_values(table["P value"].to_numpy())
+    return table.sort_values("P value", kind="stable", ignore_index=True)
+
+
+def adjusted_p_values(p) -> np.ndarray:
+    """Benjamini-Hochberg adjusted p values, controlling the false discovery rate."""
+    adjusted = np.full(len(p), np.nan)
+    valid = ~np.isnan(p)
+    if valid.any():
+        adjusted[valid] = distributions.false_discovery_control(p[valid])
+    return adjusted
@@ -1,165 +1,588 @@
-import datetime
-
 import folium
-from folium.plugins import HeatMap, MarkerCluster
+from folium.plugins import FastMarkerCluster, HeatMap
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import seaborn as sns
 import streamlit as st
 from matplotlib.ticker import MaxNLocator
-from scipy.stats import iqr, median_abs_deviation, ttest_ind, zscore
-from statsmodels.stats.weightstats import ztest
 from streamlit_folium import st_folium
 
+from modules import backend
+from modules.cache import FigureCache
+from modules.charts import (
+    TABLE_CATEGORIES,
+    TABLE_ROWS,
+    category_counts,
+    draw_corr,
+    draw_count,
+    draw_dist,
+    draw_pair_row,
+    figure_key,
+    hue_codes,
+    hue_legend,
+    pair_columns,
+    render,
+    render_charts,
+)
+from modules.correlation import (
+    HEATMAP_COLUMNS,
+    correlation_matrix,
+    sorted_pairs,
+    strongest_pairs,
+    top_pairs,
+)
+from modules.detection import (
+    LABELS,
+    frame_rolling_median_mad,
+    hampel_mask,
+    outlier_labels,
+    outlier_mask,
+    scan_outliers,
+)
+from modules.geo import (
+    CLUSTER_ICON,
+    MARKER_CALLBACK,
+    coordinates,
+    grid_points,
+    heatmap_points,
+    range_errors,
+)
+from modules.render import (
+    DATES,
+    LTTB_POINTS,
+    RASTER_HEIGHT,
+    RASTER_ROWS,
+    RASTER_WIDTH,
+    RENDER_ROWS,
+    axis_positions,
+    binned_histogram,
+    bucket_edges,
+    bucket_index,
+    bucket_stats,
+    draw_raster,
+    figure_png,
+    format_axis,
+    lttb,
+    raster,
+    raster_note,
+    reservoir_sample,
+    sampling_note,
+)
+from modules.resampling import bootstrap_ci, permutation_test
+from modules.sequential import (
+    EFFECT_SIZE,
+    add_chunk,
+    delete_experiment,
+    load_experiment,
+    new_experiment,
+    save_experiment,
+)
+from modules.stats import (
+    frame_fingerprint,
+    frame_tag,
+    memoize,
+    summary,
+    summary_bounds,
+    tag_frame,
+    use_approx,
+)
+from modules.streaming import stream_note
+from modules.testing import (
+    anova,
+    chi_square,
+    column_stats,
+    group_codes,
+    group_summary,
+    screen,
+    two_sample,
+)
+from modules.viewer import (
+    PAGE_ROWS,
+    column_values,
+    extra_names,
+    filter_mask,
+    page_bounds,
+    selection_key,
+    sort_order,
+)
 
-def dfprofiler(df) -> None:
-    with st.expander("DataFrame Description"):
-        profiled_df = df.describe(include="all").loc[
-            ["count", "unique", "top", "freq", "mean", "std", "min", "max"]
+
+def session_columns() -> list:
+    """Columns of the uploaded data, including columns not read yet."""
+    source = st.session_state.get("source")
+    if source is not None:
+        return list(source.columns)
+    return list(st.session_state.df.columns)
+
+
+def session_df(columns=None) -> pd.DataFrame:
+    """Uploaded data with at least the given columns read (all columns if None).
+
+    Columns of Parquet and Arrow uploads are read on first use and kept in the session,
+    so pages only materialise the columns they work on.
+    """
+    df = st.session_state.df
+    source = st.session_state.get("source")
+    if source is not None:
+        wanted = source.columns if columns is None else columns
+        missing = [
+            col for col in wanted if col in source.columns and col not in df.columns
         ]
-        profiled_df.loc["null (%)"] = df.isnull().sum() / len(df) * 100
-        profiled_df.loc["Datatype"] = df.dtypes
-        st.write(profiled_df)
+        if missing:
+            attrs, tag = df.attrs, frame_tag(df)
+            df = pd.concat([df, source.read(list(dict.fromkeys(missing)))], axis=1)
+            df = df[[col for col in source.columns if col in df.columns]]
+            df.attrs = attrs
+            if tag is not None:
+                tag_frame(df, tag)
+            st.session_state.df = df
+    return df
+
+
+def session_stream():
+    """StreamProfile of an upload too large to load, or None; see eda_app."""
+    return st.session_state.get("stream")
+
+
+def session_backend() -> str:
+    """Compute backend chosen in the sidebar; see modules.backend."""
+    return st.session_state.get("backend", "pandas")
+
+
+def profile_table(df, include=None, rows=None, approx=False, bounds=False):
+    """Summary table of the session data for the dtypes in include and the given rows.
+
+    Streamed uploads use their stream statistics, exact summaries the session backend.
+    """
+    stream = session_stream()
+    if stream is not None:
+        table, error_bounds = stream.summary()
+        table = error_bounds if bounds else table
+    elif approx or bounds:
+        table = summary_bounds(df) if bounds else summary(df, approx=True)
+    else:
+        table = backend.summary(df, session_backend())
+    if include is not None:
+        table = table[df.select_dtypes(include=include).columns]
+    if rows is not None:
+        table = table.loc[rows]
+    return table
+
+
+def _view_selection(df, rows, columns, sort, descending, column, low, high, text):
+    """Positions in rows (or df) left by a filter, in sort order."""
+    total = len(df) if rows is None else len(rows)
+
+    def values(name, positions):
+        if name in columns:
+            return column_values(columns[name], positions)
+        return column_values(df[name], positions if rows is None else rows[positions])
+
+    selection = np.arange(total)
+    if column is not None:
+        selection = selection[filter_mask(values(column, selection), low, high, text)]
+    if sort is not None:
+        selection = selection[sort_order(values(sort, selection), not descending)]
+    return selection
+
+
+def table_view(df, rows=None, key="table", **columns) -> None:
+    """Browse rows of df one page at a time, sorted and filtered on the server.
+
+    rows are positions in df (all rows when None) and columns extra arrays aligned
+    with them, e.g. a score per row; they are renamed where they clash with columns
+    of df. Sorting and filtering only reorder an index array, kept in the session
+    across reruns; only the page shown is sliced out of df.
+    """
+    total = len(df) if rows is None else len(rows)
+    columns = dict(zip(extra_names(columns, df.columns), columns.values()))
+    names = list(columns) + list(df.columns)
+    with st.expander("Sort and filter"):
+        left, middle, right = st.columns(3)
+        sort = left.selectbox(
+            "Sort by", [None] + names, format_func=str, key=f"{key}_sort"
+        )
+        descending = left.toggle("Descending", key=f"{key}_descending")
+        column = middle.selectbox(
+            "Filter by", [None] + names, format_func=str, key=f"{key}_filter"
+        )
+        low = high = text = None
+        if column is not None:
+            values = columns[column] if column in columns else df[column]
+            if values.dtype.kind in "iuf":
+                low = right.number_input("Min", value=None, key=f"{key}_low")
+                high = right.number_input("Max", value=None, key=f"{key}_high")
+            else:
+                text = right.text_input("Contains", key=f"{key}_text")
+
+    selection = None
+    if sort is not None or low is not None or high is not None or text:
+        arrays = [columns[name] for name in (sort, column) if name in columns]
+        signature = selection_key(
+            frame_fingerprint(df),
+            rows,
+            sort,
+            descending,
+            column,
+            low,
+            high,
+            text,
+            *arrays,
+        )
+        cached = st.session_state.get(f"{key}_selection")
+        if cached is not None and cached[0] == signature:
+            selection = cached[1]
+        else:
+            selection = _view_selection(
+                df, rows, columns, sort, descending, column, low, high, text
+            )
+            st.session_state[f"{key}_selection"] = (signature, selection)
+    shown = total if selection is None else len(selection)
+
+    pages = max(1, -(-shown // PAGE_ROWS))
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"Page (of {pages:,})", 1, pages, 1, key=f"{key}_page")
+    start, stop = page_bounds(shown, page)
+    positions = np.arange(start, stop) if selection is None else selection[start:stop]
+    table = df.iloc[positions if rows is None else rows[positions]]
+    for i, (name, values) in enumerate(columns.items()):
+        table.insert(i, name, np.asarray(values)[positions])
+    st.dataframe(table)
+    note = f"Rows {start + 1:,}-{stop:,} of {shown:,}" if shown else "No rows"
+    if shown < total:
+        note += f" (filtered from {total:,})"
+    st.caption(f"{note}.")
+
+
+def dfprofiler(df, approx=None) -> None:
+    stream = session_stream()
+    if approx is None:
+        approx = stream is not None or use_approx(df)
+    with st.expander("DataFrame Description"):
+        if stream is not None:
+            st.caption(stream_note(stream))
+        st.write(profile_table(df, approx=approx))
+        if approx:
+            st.text("Approximate statistics from sketches. Error bound of each figure:")
+            st.write(profile_table(df, bounds=True))
+
+
+def exact_render(rows) -> bool:
+    """Whether a chart of rows rows is drawn point by point rather than from samples."""
+    return rows <= RENDER_ROWS or st.session_state.get("exact_render", False)
+
+
+def raster_render(rows) -> bool:
+    """Whether a chart of rows points is drawn as an aggregated raster."""
+    return rows > RASTER_ROWS and not st.session_state.get("exact_render", False)
+
+
+@st.cache_resource
+def figure_cache() -> FigureCache:
+    """Rendered charts shared by all sessions of the server."""
+    return FigureCache()
+
+
+def show_chart(images, caption=None) -> None:
+    """Show the PNG images of a chart side by side, and its caption."""
+    if len(images) == 1:
+        st.image(images[0], use_container_width=True)
+    else:
+        columns = st.columns(len(images), vertical_alignment="center")
+        for column, image in zip(columns, images):
+            with column:
+                st.image(image, use_container_width=True)
+    if caption:
+        st.caption(caption)
+
+
+def chart_key(df, draw, *args) -> str:
+    """Figure cache key of the chart draw(df, *args) with the session's render settings."""
+    return figure_key(df, draw, args, st.session_state.get("exact_render", False))
+
+
+def cached_chart(df, draw, *args) -> None:
+    """Show the chart of draw(df, *args), drawn once per fingerprint of df and args.
+
+    draw returns a list of figures and a caption or None. The figures are
+    rendered to PNG and closed, and kept in the figure cache, so that reruns
+    with unchanged data, arguments and render settings skip matplotlib.
+    """
+    key = chart_key(df, draw, *args)
+    chart = figure_cache().get(key)
+    if chart is None:
+        chart = render(draw, df, args)
+        figure_cache().put(key, chart)
+    show_chart(*chart)
+
+
+def cached_charts(df, columns, draw, arg_list) -> None:
+    """cached_chart of draw(df, *args) for each args of arg_list, shown in order.
+
+    Charts missing from the figure cache are drawn in the chart worker pool from
+    columns of df, and each is shown in its place as soon as it is ready.
+    """
+    keys = [chart_key(df, draw, *args) for args in arg_list]
+    slots = [st.container() for _ in keys]
+    missing = []
+    for i, key in enumerate(keys):
+        chart = figure_cache().get(key)
+        if chart is None:
+            missing.append(i)
+        else:
+            with slots[i]:
+                show_chart(*chart)
+    charts = render_charts(df, columns, draw, [arg_list[i] for i in missing])
+    for i, chart in charts:
+        figure_cache().put(keys[missing[i]], chart)
+        with slots[missing[i]]:
+            show_chart(*chart)
+
+
+def _draw_raster_scatter(df, x, y, hue) -> tuple:
+    """Scatter and joint plots of x and y aggregated into rasters."""
+    xs, x_labels = axis_positions(df[x])
+    ys, y_labels = axis_positions(df[y])
+    codes, colors, labels = hue_codes(df, hue)
+    grid, extent = raster(xs, ys, codes=codes, layers=len(colors))
+    f1, ax = plt.subplots(figsize=(5, 5))
+    draw_raster(ax, grid, extent, colors)
+    # Least squares line of each group, as lmplot draws.
+    line_x = np.linspace(extent[0], extent[1], 2)
+    for layer, color in enumerate(colors):
+        valid = np.isfinite(xs) & np.isfinite(ys)
+        if codes is not None:
+            valid &= codes == layer
+        if np.count_nonzero(valid) > 1:
+            slope, intercept = np.polyfit(xs[valid], ys[valid], 1)
+            ax.plot(line_x, slope * line_x + intercept, color=color)
+    ax.set_xlabel(x)
+    ax.set_ylabel(y)
+    format_axis(ax.xaxis, x_labels)
+    format_axis(ax.yaxis, y_labels)
+    hue_legend(ax, hue, colors, labels)
+    f1.tight_layout()
+
+    f2 = plt.figure(figsize=(6, 6))
+    grid_spec = f2.add_gridspec(2, 2, width_ratios=(5, 1), height_ratios=(1, 5))
+    ax = f2.add_subplot(grid_spec[1, 0])
+    top = f2.add_subplot(grid_spec[0, 0], sharex=ax)
+    right = f2.add_subplot(grid_spec[1, 1], sharey=ax)
+    draw_raster(ax, grid, extent, colors)
+    # Marginal distributions are the sums of the raster along each axis.
+    x_edges = np.linspace(extent[0], extent[1], RASTER_WIDTH + 1)
+    y_edges = np.linspace(extent[2], extent[3], RASTER_HEIGHT + 1)
+    for layer, color in enumerate(colors):
+        top.stairs(grid[layer].sum(axis=0), x_edges, color=color, fill=True, alpha=0.5)
+        right.stairs(
+            grid[layer].sum(axis=1),
+            y_edges,
+            color=color,
+            fill=True,
+            alpha=0.5,
+            orientation="horizontal",
+        )
+    top.axis("off")
+    right.axis("off")
+    ax.set_xlabel(x)
+    ax.set_ylabel(y)
+    format_axis(ax.xaxis, x_labels)
+    format_axis(ax.yaxis, y_labels)
+    hue_legend(ax, hue, colors, labels)
+    f2.tight_layout()
+    return [f1, f2], raster_note(len(df))
 
 
 def dist_plot(df, column) -> None:
+    exact = st.session_state.get("exact_render", False)
     if column == "All":
-        for col in [x for x in df.select_dtypes(include="number").columns]:
-            f, ax = plt.subplots(1, 3, figsize=(12, 4))
-            sns.histplot(df, x=col, ax=ax[0], kde=True, bins=20, stat="percent")
-            sns.boxplot(df, x=col, ax=ax[1])
-            sns.violinplot(df, x=col, ax=ax[2], alpha=0.3, label=col)
-            plt.legend()
-            plt.tight_layout()
-            st.pyplot(f)
+        columns = list(df.select_dtypes(include="number").columns)
+        cached_charts(df, columns, draw_dist, [(col, True, exact) for col in columns])
     elif df[column].dtype in ["object", "category"]:
         st.error(
             "Selected column is a categorical column, please select a numerical column"
         )
     else:
-        f, ax = plt.subplots(1, 3, figsize=(12, 4))
-        sns.histplot(df, x=column, ax=ax[0], kde=True, bins=20, stat="percent")
-        sns.boxplot(df, x=column, ax=ax[1])
-        sns.violinplot(df, x=column, ax=ax[2], alpha=0.3)
-        plt.tight_layout()
-        st.pyplot(f)
+        cached_chart(df, draw_dist, column, False, exact)
+
+
+def _count_table(df, column, hue) -> None:
+    """Most frequent values of a column with too many distinct values to draw."""
+    counts, _, distinct = memoize(
+        df, "category_counts", category_counts, column, hue, TABLE_ROWS
+    )
+    st.text(
+        f"{column} has {distinct:,} distinct values; the {min(TABLE_ROWS, distinct)} most frequent:"
+    )
+    st.dataframe(counts)
 
 
 def count_plot(df, column, hue) -> None:
+    """Count and pie charts of the most frequent values; tables for columns of many values."""
     if column == "All":
-        for col in [
-            x for x in df.select_dtypes(include=["object", "category"]).columns
-        ]:
-            f, ax = plt.subplots(1, 2, figsize=(12, 4))
-            sns.countplot(data=df, x=col, ax=ax[0], hue=hue)
-            x_labels_1 = [label.get_text() for label in ax[0].get_xticklabels()]
-            ax[0].set_xticklabels(x_labels_1, rotation=90)
-            tgt_counts = df[col].value_counts()
-            ax[1].pie(
-                tgt_counts,
-                labels=tgt_counts.index,
-                autopct="%1.1f%%",
-                colors=sns.color_palette("Set2"),
-            )
-            plt.tight_layout()
-            st.pyplot(f)
+        columns = list(df.select_dtypes(include=["object", "category"]).columns)
+    elif pd.api.types.is_numeric_dtype(df[column]) and df[column].dtype.kind != "b":
+        st.error("Selected column is a numerical column. Chart would be messy in case")
+        return
     else:
-        if df[column].dtype not in ["object", "category"]:
-            st.error(
-                "Selected column is a numerical column. Chart would be messy in case"
+        columns = [column]
+    distinct = {
+        col: memoize(df, "category_counts", category_counts, col, hue, TABLE_ROWS)[2]
+        for col in columns
+    }
+    drawn = [col for col in columns if distinct[col] <= TABLE_CATEGORIES]
+    if drawn:
+        shared = drawn + [hue] if hue is not None and hue not in drawn else drawn
+        cached_charts(df, shared, draw_count, [(col, hue) for col in drawn])
+    for col in columns:
+        if distinct[col] > TABLE_CATEGORIES:
+            _count_table(df, col, hue)
+
+
+def _draw_scatter(df, x, y, hue) -> tuple:
+    """Regression and joint plots of x and y, of a sample of rows of large frames."""
+    if raster_render(len(df)):
+        return _draw_raster_scatter(df, x, y, hue)
+    caption = None
+    if not exact_render(len(df)):
+        # Points outside the IQR fences of either axis are always drawn.
+        keep = np.zeros(len(df), dtype=bool)
+        for col in [x, y]:
+            values = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            keep |= outlier_mask(
+                values,
+                "iqr",
+                1.5,
+                stats=backend.column_stats(df, col, session_backend()),
             )
-        f, ax = plt.subplots(1, 2, figsize=(12, 4))
-        sns.countplot(data=df, x=column, ax=ax[0], hue=hue)
-        x_labels_1 = [label.get_text() for label in ax[0].get_xticklabels()]
-        ax[0].set_xticklabels(x_labels_1, rotation=90)
-        tgt_counts = df[column].value_counts()
-        ax[1].pie(
-            tgt_counts,
-            labels=tgt_counts.index,
-            autopct="%1.1f%%",
-            colors=sns.color_palette("Set2"),
-        )
-        plt.tight_layout()
-        st.pyplot(f)
+        index = reservoir_sample(len(df), RENDER_ROWS, keep=keep)
+        caption = f"{sampling_note(len(index), len(df))} Outliers of {x} and {y} are always kept."
+        df = df.iloc[index]
+    f1 = sns.lmplot(data=df, x=x, y=y, hue=hue, fit_reg=True)
+    f1.figure.tight_layout()
+    f2 = sns.jointplot(data=df, x=x, y=y, hue=hue)
+    f2.figure.tight_layout()
+    return [f1, f2], caption
 
 
 def scatter_plot(df, x, y, hue) -> None:
     """Scatter plot"""
-    if (
-        df[x].dtype in ["datetime64[ns]"]
-        or isinstance(df[x].dtype, datetime.date)
-        or df[y].dtype in ["datetime64[ns]"]
-        or isinstance(df[y].dtype, datetime.date)
-    ):
+    if df[x].dtype.kind == "M" or df[y].dtype.kind == "M":
         st.error("Chosen datetime or date column. Please select other columns.")
     else:
-        col1, col2 = st.columns([1, 1], vertical_alignment="center")
-        with col1:
-            f1 = plt.figure()
-            f1 = sns.lmplot(data=df, x=x, y=y, hue=hue, fit_reg=True)
-            plt.tight_layout()
-            st.pyplot(f1)
-        with col2:
-            f2 = plt.figure()
-            f2 = sns.jointplot(data=df, x=x, y=y, hue=hue)
-            plt.tight_layout()
-            st.pyplot(f2)
+        cached_chart(df, _draw_scatter, x, y, hue)
 
 
 def pair_plot(df, hue) -> None:
-    """Pair plot"""
-    f = sns.pairplot(df, hue=hue)
-    plt.tight_layout()
-    st.pyplot(f)
+    """Pair plot, drawn row by row"""
+    columns = pair_columns(df, hue)
+    exact = st.session_state.get("exact_render", False)
+    cached_charts(
+        df,
+        columns + ([hue] if hue is not None else []),
+        draw_pair_row,
+        [(row, hue, exact) for row in range(len(columns))],
+    )
 
 
-def corr_plot(df, threshold) -> None:
-    """Calculate Pearson correlation among numerical columns and plot it."""
-    df_corr = df.corr(numeric_only=True)
-    mask = np.tril(np.ones(df_corr.shape), k=-1).astype(bool)
-    df_corr_fil = df_corr.where(mask)
+def corr_plot(df, threshold, method="pearson", top=50) -> None:
+    """Correlation among numerical columns: heatmaps and the most correlated pairs."""
+    stream = session_stream()
+    if stream is not None and method == "pearson":
+        st.caption(stream_note(stream))
+        df_corr = stream.correlation()
+        pairs = strongest_pairs(sorted_pairs(df_corr), threshold, k=top)
+    else:
+        df_corr = correlation_matrix(df, method)
+        pairs = top_pairs(df, threshold, k=top, method=method)
+    size = len(df_corr)
+    if 1 < size <= HEATMAP_COLUMNS:
+        # The matrix is small enough to be fingerprinted by content.
+        cached_chart(df_corr, draw_corr, threshold)
+    elif size > HEATMAP_COLUMNS:
+        st.caption(f"Heatmaps are drawn for up to {HEATMAP_COLUMNS} numerical columns.")
 
-    f, ax = plt.subplots(1, 2, figsize=(12, 6))
-    sns.heatmap(
-        df_corr_fil, annot=True, cmap="crest", fmt=".2f", linewidths=0.01, ax=ax[0]
-    )
-    mask = df_corr_fil.where(abs(df_corr_fil) > threshold).isna()
-    sns.heatmap(
-        df_corr_fil,
-        annot=True,
-        cmap="crest",
-        fmt=".2f",
-        linewidths=0.01,
-        mask=mask,
-        ax=ax[1],
-    )
-    plt.tight_layout()
-    st.pyplot(f)
+    st.text(f"Top {len(pairs)} pairs with |correlation| >= {threshold}")
+    st.dataframe(pairs, hide_index=True)
 
 
-def line_plot(df, x, y, hue) -> None:
-    """Line plot"""
-    x_nunique = df[x].nunique()
-    col1, col2 = st.columns([1, 1], vertical_alignment="center")
-    with col1:
-        f1, ax1 = plt.subplots()
-        sns.lineplot(data=df, x=x, y=y, ax=ax1)
-        ax1.set_xlim(xmin=df[x].min(), xmax=df[x].max())
-        if x_nunique > 100:
-            ax1.xaxis.set_major_locator(MaxNLocator(nbins=10))
-        plt.xticks(rotation=90)
-        plt.tight_layout()
-        st.pyplot(f1)
-    with col2:
-        f2, ax2 = plt.subplots()
-        sns.lineplot(data=df, x=x, y=y, hue=hue, ax=ax2)
-        ax2.set_xlim(xmin=df[x].min(), xmax=df[x].max())
-        if x_nunique > 100:
-            ax2.xaxis.set_major_locator(MaxNLocator(nbins=10))
+def _draw_line(df, x, y, hue, mode="min-max") -> tuple:
+    """Lines of y by x, and per group of hue; large data is summarised per bucket of x.
+
+    The buckets of x are found once and shared by both panels. mode is one of
+    LINE_MODES.
+    """
+    if exact_render(len(df)):
+        x_nunique = df[x].nunique()
+        figures = []
+        for group in [None, hue]:
+            f, ax = plt.subplots()
+            sns.lineplot(data=df, x=x, y=y, hue=group, ax=ax)
+            ax.set_xlim(xmin=df[x].min(), xmax=df[x].max())
+            if x_nunique > 100:
+                ax.xaxis.set_major_locator(MaxNLocator(nbins=10))
+            plt.xticks(rotation=90)
+            f.tight_layout()
+            figures.append(f)
+        return figures, None
+    xs, x_labels = axis_positions(df[x])
+    ys = df[y].to_numpy(dtype=np.float64, na_value=np.nan)
+    # Limits of the x axis, as bucket_edges spans the finite values of x.
+    finite = xs[np.isfinite(xs)]
+    if mode == "lttb":
+        order = np.argsort(xs, kind="stable")
+        order = order[np.isfinite(xs[order]) & np.isfinite(ys[order])]
+    else:
+        edges = bucket_edges(xs, dates=x_labels is DATES)
+        index = bucket_index(xs, edges)
+    figures = []
+    for group in [None, hue]:
+        codes, colors, labels = hue_codes(df, group)
+        f, ax = plt.subplots()
+        if mode == "lttb":
+            for layer, color in enumerate(colors):
+                rows = order if codes is None else order[codes[order] == layer]
+                kept = rows[lttb(xs[rows], ys[rows])]
+                ax.plot(xs[kept], ys[kept], color=color)
+        else:
+            stats = bucket_stats(
+                index, len(edges) - 1, xs, ys, codes, len(colors), band=mode
+            )
+            for layer, color in enumerate(colors):
+                filled = stats["count"][layer] > 0
+                centers = stats["x"][layer][filled]
+                ax.plot(centers, stats["mean"][layer][filled], color=color)
+                ax.fill_between(
+                    centers,
+                    stats["low"][layer][filled],
+                    stats["high"][layer][filled],
+                    color=color,
+                    alpha=0.2,
+                )
+        if len(finite):
+            ax.set_xlim(finite.min(), finite.max())
+        ax.set_xlabel(x)
+        ax.set_ylabel(y)
+        format_axis(ax.xaxis, x_labels)
+        hue_legend(ax, group, colors, labels)
         plt.xticks(rotation=90)
-        plt.tight_layout()
-        st.pyplot(f2)
+        f.tight_layout()
+        figures.append(f)
+    if mode == "lttb":
+        caption = f"Downsampled {len(df):,} rows to at most {LTTB_POINTS:,} points per line with LTTB."
+    else:
+        caption = (
+            f"Averaged {len(df):,} rows in {len(edges) - 1:,} buckets of {x}; "
+            f"bands show the {'minimum and maximum' if mode == 'min-max' else 'quartiles'} of each bucket."
+        )
+    return figures, caption
+
+
+def line_plot(df, x, y, hue, mode="min-max") -> None:
+    """Line plot"""
+    cached_chart(df, _draw_line, x, y, hue, mode)
 
 
 def geo_plot(df, lat, lon, type) -> None:
@@ -178,145 +601,185 @@ def geo_plot(df, lat, lon, type) -> None:
             "Longitude & Latitude columns should be numerical columns. Check columns again"
         )
     else:
-        if len(df[(df[lat] < -90) | (df[lat] > 90)]) > 0:
-            st.error("Latitude is not in a range of -90~+90")
-        elif len(df[(df[lon] < -180) | (df[lon] > 180)]) > 0:
-            st.error("Longitude is not in a range of -180~+180")
+        lats, lons = coordinates(df, lat, lon)
+        errors = range_errors(lats, lons)
+        if errors:
+            st.error(errors[0])
+        elif len(lats) == 0:
+            st.error("There is no row with both latitude and longitude")
         else:
             base_map = folium.Map(
-                location=[df[lat].mean(), df[lon].mean()],
+                location=[lats.mean(), lons.mean()],
                 control_scale=True,
                 zoom_start=10,
             )
+            points = grid_points(lats, lons)
 
             if type == "Marker":
-                marker_cluster = MarkerCluster().add_to(base_map)
-                for i in range(len(df)):
-                    # for i in range(100):
-                    folium.Marker(location=[df.iloc[i][lat], df.iloc[i][lon]]).add_to(
-                        marker_cluster
-                    )
-                st_folium(base_map, width=1000)
+                FastMarkerCluster(
+                    points.tolist(),
+                    callback=MARKER_CALLBACK,
+                    icon_create_function=CLUSTER_ICON,
+                ).add_to(base_map)
             elif type == "HeatMap":
-                data_list = [[df.iloc[i][lat], df.iloc[i][lon]] for i in range(100)]
-                HeatMap(data_list).add_to(base_map)
-                st_folium(base_map, width=1000)
+                HeatMap(heatmap_points(points)).add_to(base_map)
             else:
                 st.error("Not implemented yet")
+                return
+            # The map does not send its state back, so panning does not rerun the page.
+            st_folium(base_map, width=1000, returned_objects=[])
+            if len(points) < len(lats):
+                st.caption(
+                    f"Aggregated {len(lats):,} locations into {len(points):,} grid cells."
+                )
 
 
-def outlier_zscore(df, column, threshold) -> None:
-    """Z score method for outlier detection."""
-    input_cols = df.columns
-    df["zscore"] = abs(zscore(df[column]))
-    df["outlier"] = df["zscore"].apply(
-        lambda x: "outlier" if x > threshold else "nonoutlier"
-    )
-
+def _draw_outliers(df, column, mask) -> tuple:
+    """Histogram and strip plot of a column split by an outlier mask."""
+    values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+    plot_df = pd.DataFrame({column: values, "outlier": outlier_labels(mask)})
     f, ax = plt.subplots(1, 2, figsize=(12, 4))
-    sns.histplot(data=df, x=column, hue="outlier", ax=ax[0])
-    sns.stripplot(data=df, x=column, y="outlier", ax=ax[1])
-    plt.tight_layout()
-    st.pyplot(f)
+    if exact_render(len(df)):
+        sns.histplot(data=plot_df, x=column, hue="outlier", ax=ax[0])
+        sns.stripplot(data=plot_df, x=column, y="outlier", ax=ax[1])
+        caption = None
+    else:
+        # Histograms of every row by label; the strip plot keeps all outliers.
+        _, edges = binned_histogram(values, bins="auto")
+        centers = (edges[:-1] + edges[1:]) / 2
+        counts = [np.histogram(values[label], bins=edges)[0] for label in [~mask, mask]]
+        sns.histplot(
+            x=np.tile(centers, 2),
+            weights=np.concatenate(counts),
+            hue=np.repeat(LABELS, len(centers)),
+            hue_order=LABELS,
+            bins=list(edges),
+            ax=ax[0],
+        )
+        ax[0].set_xlabel(column)
+        index = reservoir_sample(len(df), RENDER_ROWS, keep=mask)
+        sns.stripplot(data=plot_df.iloc[index], x=column, y="outlier", ax=ax[1])
+        caption = f"{sampling_note(len(index), len(df))} Every outlier is kept in the strip plot."
+    f.tight_layout()
+    return [f], caption
 
+
+def _outlier_plot(df, column, mask, **scores) -> None:
+    """Plot a column split by an outlier mask and list the outlying rows.
+
+    scores are extra columns of the list, aligned with the outlying rows.
+    """
+    cached_chart(df, _draw_outliers, column, mask)
     st.text("Outliers")
-    st.write(df[df["outlier"] == "outlier"])
-    st.session_state.df = df[input_cols]
+    table_view(df, np.flatnonzero(mask), key="outliers", **scores)
+
+
+def outlier_zscore(df, column, threshold) -> None:
+    """Z score method for outlier detection."""
+    stats = backend.column_stats(df, column, session_backend())
+    values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+    mask = outlier_mask(values, "zscore", threshold, stats=stats)
+    zscore = np.abs(values[mask] - stats["mean"]) / stats["std"]
+    _outlier_plot(df, column, mask, zscore=zscore)
 
 
 def outlier_iqr(df, column, threshold) -> None:
     """Interquartile range method for outlier detection."""
-    input_cols = df.columns
-    q1 = df[column].quantile(0.25)
-    q3 = df[column].quantile(0.75)
-    iqr_df = iqr(df[column])
-    lower_bound = q1 - (threshold * iqr_df)
-    upper_bound = q3 + (threshold * iqr_df)
-
-    df["outlier"] = df[column].apply(
-        lambda x: "outlier" if x < lower_bound or x > upper_bound else "nonoutlier"
-    )
+    stats = backend.column_stats(df, column, session_backend())
+    values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+    mask = outlier_mask(values, "iqr", threshold, stats=stats)
+    _outlier_plot(df, column, mask)
 
-    f, ax = plt.subplots(1, 2, figsize=(12, 4))
-    sns.histplot(data=df, x=column, hue="outlier", ax=ax[0])
-    sns.stripplot(data=df, x=column, y="outlier", ax=ax[1])
-    plt.tight_layout()
-    st.pyplot(f)
 
-    st.text("Outliers")
-    st.write(df[df["outlier"] == "outlier"])
-    st.session_state.df = df[input_cols]
+def outlier_hampel(df, column, threshold, window=0) -> None:
+    """Hempler filter method for outlier detection.
 
+    With a window, each value is compared with the median and MAD of the window
+    centred on it, in row order; otherwise with those of the whole column.
+    """
+    values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+    if window:
+        median, mad = frame_rolling_median_mad(df, column, window)
+        mask = hampel_mask(values, median, mad, threshold)
+        _outlier_plot(df, column, mask, median=median[mask], mad=mad[mask])
+    else:
+        stats = backend.column_stats(df, column, session_backend())
+        mask = outlier_mask(values, "hampel", threshold, stats=stats)
+        _outlier_plot(df, column, mask)
 
-def outlier_hampel(df, column, threshold) -> None:
-    """Hempler filter method for outlier detection."""
-    input_cols = df.columns
-    median = df[column].median()
-    mad = median_abs_deviation(df[column])
-    lower_bound = median - (threshold * mad)
-    upper_bound = median + (threshold * mad)
 
-    df["outlier"] = df[column].apply(
-        lambda x: "outlier" if x < lower_bound or x > upper_bound else "nonoutlier"
+def outlier_scan(df, thresholds) -> None:
+    """Outlier counts and bounds of every numeric column for every method."""
+    table = scan_outliers(df, thresholds)
+    if table.empty:
+        st.error("There is no numerical column in the dataset.")
+        return
+    counts = table.pivot(index="Column", columns="Method", values="Outliers")
+    st.text("Outliers per column")
+    st.dataframe(
+        counts[list(thresholds)].sort_values(list(thresholds), ascending=False)
     )
+    st.text("Bounds per column and method")
+    st.dataframe(table, hide_index=True)
 
-    f, ax = plt.subplots(1, 2, figsize=(12, 4))
-    sns.histplot(data=df, x=column, hue="outlier", ax=ax[0])
-    sns.stripplot(data=df, x=column, y="outlier", ax=ax[1])
-    plt.tight_layout()
-    st.pyplot(f)
 
-    st.text("Outliers")
-    st.write(df[df["outlier"] == "outlier"])
-    st.session_state.df = df[input_cols]
-
-
-def data_split(df, col1, col2=None, hue=None) -> pd.DataFrame:
-    """Split data by column."""
+def _draw_kde(df, col1, col2=None, hue=None) -> tuple:
+    f, ax = plt.subplots(1, 2, figsize=(12, 4))
     if hue is not None:
-        return (
-            df[df[hue] == df[hue].unique()[0]][col1],
-            df[df[hue] == df[hue].unique()[1]][col1],
-        )
+        codes, _ = group_codes(df, hue)
+        sns.kdeplot(df[codes == 0], x=col1, hue=hue, fill=True, ax=ax[0])
+        sns.kdeplot(df[codes == 1], x=col1, hue=hue, fill=True, ax=ax[1])
     elif col2 is not None:
-        return df[col1], df[col2]
+        sns.kdeplot(df, x=col1, fill=True, ax=ax[0])
+        sns.kdeplot(df, x=col2, fill=True, ax=ax[1])
+    f.tight_layout()
+    return [f], None
 
 
 def hypo_kde_plot(df, col1, col2=None, hue=None) -> None:
     """KDE plot for hypothesis testing."""
-    f, ax = plt.subplots(1, 2, figsize=(12, 4))
+    cached_chart(df, _draw_kde, col1, col2, hue)
+
+
+def _numeric(df, col) -> bool:
+    return df[col].dtype.kind in "iufb"
+
+
+def _decision(p_val, conf, tail=None) -> str:
+    """Decision at significance 1 - conf / 100, halved when tail is "two-tailed".
+
+    Omnibus (ANOVA, chi-square) and two-sided (permutation) p values pass no tail.
+    """
+    threshold = 1 - (conf / 100)
+    if tail == "two-tailed":
+        threshold = threshold / 2
+    return "Reject null hypothesis" if p_val < threshold else "Accept null hypothesis"
+
+
+def _two_samples(df, col1, col2=None, hue=None) -> tuple:
+    """Count, mean and sum of squared deviations of the two samples of a test."""
     if hue is not None:
-        sns.kdeplot(
-            df[df[hue] == df[hue].unique()[0]], x=col1, hue=hue, fill=True, ax=ax[0]
-        )
-        sns.kdeplot(
-            df[df[hue] == df[hue].unique()[1]], x=col1, hue=hue, fill=True, ax=ax[1]
-        )
-    elif col2 is not None:
-        sns.kdeplot(df, x=col1, fill=True, ax=ax[0])
-        sns.kdeplot(df, x=col2, fill=True, ax=ax[1])
-    plt.tight_layout()
-    st.pyplot(f)
+        return group_summary(df, col1, hue)
+    samples = [
+        column_stats(df[col].to_numpy(dtype=np.float64, na_value=np.nan))
+        for col in (col1, col2)
+    ]
+    return tuple(np.concatenate(parts) for parts in zip(*samples))
 
 
-def hypo_ztest(df, col1, col2=None, hue=None, conf=95, tail="one-tailed") -> None:
-    """Z test for hypothesis testing."""
-    if df[col1].dtype in ["object", "category", "datetime64[ns]"] or isinstance(
-        df[col1].dtype, datetime.datetime
-    ):
+def _hypo_two_sample(df, col1, col2, hue, conf, tail, test, label) -> None:
+    """Compare the means of two samples, from columns or from groups of hue."""
+    if not _numeric(df, col1):
         st.error(f"Please select a numerical column for the 1st column; {col1}.")
-    elif col2 is not None and (
-        df[col2].dtype in ["object", "category", "datetime64[ns]"]
-        or isinstance(df[col2].dtype, datetime.datetime)
-    ):
+    elif col2 is not None and not _numeric(df, col2):
         st.error(f"Please select a numerical column for the 2nd column; {col2}.")
-    elif hue is not None and len(df[hue].unique()) > 2:
+    elif hue is not None and len(group_codes(df, hue)[1]) != 2:
         st.error(
-            "Grouping column has groups more than 2 which we cannot proceed hypothesis test; Please select another column."
+            "Grouping column does not have exactly 2 groups which we need for this hypothesis test; Please select another column."
         )
     else:
-        df1, df2 = data_split(df=df, col1=col1, col2=col2, hue=hue)
-        z_stat, p_val = ztest(df1, df2)
+        n, mean, m2 = _two_samples(df, col1, col2, hue)
+        stat, _, p_val = two_sample(n, mean, m2, test)
         if hue is not None:
             st.text(
                 f"Null hypothesis: two groups by {hue} of {col1} have same means (averages)"
@@ -326,53 +789,260 @@ def hypo_ztest(df, col1, col2=None, hue=None, conf=95, tail="one-tailed") -> Non
                 f"Null hypothesis: two groups by {col2} of {col1} have same means (averages)"
             )
 
-        st.text(f"Z score: {z_stat}")
+        st.text(f"{label}: {stat}")
         st.text(f"P value: {p_val}")
+        st.text(_decision(p_val, conf, tail))
 
-        threshold = 1 - (conf / 100)
-        if tail == "two-tailed":
-            threshold = threshold / 2
+        hypo_kde_plot(df=df, col1=col1, col2=col2, hue=hue)
 
-        if p_val < threshold:
-            st.text("Reject null hypothesis")
-        else:
-            st.text("Accept null hypothesis")
 
-        hypo_kde_plot(df=df, col1=col1, col2=col2, hue=hue)
+def hypo_ztest(df, col1, col2=None, hue=None, conf=95, tail="one-tailed") -> None:
+    """Z test for hypothesis testing."""
+    _hypo_two_sample(df, col1, col2, hue, conf, tail, "z", "Z score")
 
 
 def hypo_ttest(df, col1, col2=None, hue=None, conf=95, tail="one-tailed") -> None:
     """T test for hypothesis testing."""
-    if df[col1].dtype in ["object", "category"]:
+    _hypo_two_sample(df, col1, col2, hue, conf, tail, "t", "T score")
+
+
+def hypo_welch(df, col1, col2=None, hue=None, conf=95, tail="one-tailed") -> None:
+    """Welch's t test, which does not assume equal variances."""
+    _hypo_two_sample(df, col1, col2, hue, conf, tail, "welch", "T score")
+
+
+def hypo_anova(df, col1, hue, conf=95) -> None:
+    """One-way ANOVA of a numerical column over the groups of hue."""
+    if not _numeric(df, col1):
         st.error(f"Please select a numerical column for the 1st column; {col1}.")
-    elif col2 is not None and df[col2].dtype in ["object", "category"]:
-        st.error(f"Please select a numerical column for the 2nd column; {col2}.")
-    elif hue is not None and len(df[hue].unique()) > 2:
+        return
+    n, mean, m2 = group_summary(df, col1, hue)
+    stat, (between, within), p_val = anova(n, mean, m2)
+    st.text(f"Null hypothesis: all groups by {hue} of {col1} have same means")
+    st.text(f"F statistic: {stat} (degrees of freedom {between:.0f}, {within:.0f})")
+    st.text(f"P value: {p_val}")
+    st.text(_decision(p_val, conf))
+    _, labels = group_codes(df, hue)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        std = np.sqrt(m2 / (n - 1))
+    st.dataframe(
+        pd.DataFrame(
+            {"Rows": n.astype(np.int64), "Mean": mean, "Std": std},
+            index=pd.Index(labels, name=hue),
+        )
+    )
+
+
+def hypo_chi_square(df, col1, col2, conf=95) -> None:
+    """Chi-square test of independence of two categorical columns."""
+    try:
+        stat, dof, p_val, table = chi_square(df[col1], df[col2])
+    except ValueError as e:
+        st.error(str(e))
+        return
+    st.text(f"Null hypothesis: {col1} and {col2} are independent")
+    st.text(f"Chi-square: {stat} (degrees of freedom {dof})")
+    st.text(f"P value: {p_val}")
+    st.text(_decision(p_val, conf))
+    st.text("Contingency table")
+    st.dataframe(table)
+
+
+def hypo_screen(df, hue, test="welch", conf=95) -> None:
+    """Test every numerical column against the groups of hue in one pass."""
+    columns = [col for col in df.columns if col != hue and _numeric(df, col)]
+    try:
+        table = screen(df, columns, hue, test)
+    except ValueError as e:
+        st.error(str(e))
+        return
+    threshold = 1 - (conf / 100)
+    table["Reject"] = table["P value"] < threshold
+    table["Reject (FDR)"] = table["Adjusted P value"] < threshold
+    st.text(
+        f"{table['Reject'].sum():,} of {len(table):,} columns differ between groups of {hue}; "
+        f"{table['Reject (FDR)'].sum():,} after controlling the false discovery rate."
+    )
+    st.dataframe(table, hide_index=True)
+
+
+def _samples(df, col1, col2=None, hue=None) -> list:
+    """Values of col1 in the two groups of hue, of col1 and col2, or of col1 alone."""
+    values = df[col1].to_numpy(dtype=np.float64, na_value=np.nan)
+    if hue is not None:
+        codes, _ = group_codes(df, hue)
+        return [values[codes == 0], values[codes == 1]]
+    if col2 is not None:
+        return [values, df[col2].to_numpy(dtype=np.float64, na_value=np.nan)]
+    return [values]
+
+
+def _resampling_run(df, name, func, *args, **kwargs):
+    """Result of func(*args, **kwargs), run on request with a progress bar.
+
+    The last result is kept in the session while its inputs do not change.
+    """
+    key = (frame_fingerprint(df), name, args, tuple(sorted(kwargs.items())))
+    last = st.session_state.get("resampling")
+    if last is not None and last[0] == key:
+        return last[1]
+    if not st.button("Run", key=f"{name}_run"):
+        return None
+    bar = st.progress(0.0, text="Resampling")
+
+    def progress(done, total):
+        bar.progress(done / total, text=f"Resampled {done:,} of {total:,}")
+
+    result = func(*args, progress=progress, **kwargs)
+    bar.empty()
+    st.session_state.resampling = (key, result)
+    return result
+
+
+def _resampling_plot(distribution, observed, bounds=()) -> None:
+    f, ax = plt.subplots(figsize=(12, 4))
+    ax.hist(distribution, bins=100, color="tab:blue", alpha=0.7)
+    ax.axvline(observed, color="tab:red", label="observed")
+    for bound in bounds:
+        ax.axvline(bound, color="tab:gray", linestyle="--")
+    ax.legend()
+    f.tight_layout()
+    show_chart([figure_png(f)])
+
+
+def hypo_permutation(df, col1, col2=None, hue=None, conf=95, resamples=10_000, seed=0):
+    """Permutation test of the difference in means of two samples."""
+    if not _numeric(df, col1) or (col2 is not None and not _numeric(df, col2)):
+        st.error("Please select numerical columns.")
+        return
+    if hue is not None and len(group_codes(df, hue)[1]) != 2:
         st.error(
-            "Grouping column has groups more than 2 which we cannot proceed hypothesis test; Please select another column."
+            "Grouping column does not have exactly 2 groups; Please select another column."
         )
-    else:
-        df1, df2 = data_split(df=df, col1=col1, col2=col2, hue=hue)
-        t_stat, p_val = ttest_ind(df1, df2)
-        if hue is not None:
-            st.text(
-                f"Null hypothesis: two groups by {hue} of {col1} have same means (averages)"
-            )
-        elif col2 is not None:
-            st.text(
-                f"Null hypothesis: two groups by {col2} of {col1} have same means (averages)"
-            )
+        return
+    x, y = _samples(df, col1, col2, hue)
+    result = _resampling_run(
+        df, "permutation", permutation_test, x, y, resamples=resamples, seed=seed
+    )
+    if result is None:
+        return
+    st.text("Null hypothesis: two samples have same means (averages)")
+    st.text(f"Difference in means: {result['statistic']}")
+    st.text(f"P value: {result['p_value']}")
+    st.text(_decision(result["p_value"], conf))
+    if not result["exact"]:
+        st.caption(
+            "Values were permuted in quantile bins, with a normal approximation within each bin."
+        )
+    _resampling_plot(result["distribution"], result["statistic"])
 
-        st.text(f"T score: {t_stat}")
-        st.text(f"P value: {p_val}")
 
-        threshold = 1 - (conf / 100)
-        if tail == "two-tailed":
-            threshold = threshold / 2
+def hypo_bootstrap(
+    df, col1, col2=None, hue=None, conf=95, statistic="mean", resamples=10_000, seed=0
+):
+    """Bootstrap confidence interval of a statistic of a sample, or of its difference between two."""
+    if not _numeric(df, col1) or (col2 is not None and not _numeric(df, col2)):
+        st.error("Please select numerical columns.")
+        return
+    if hue is not None and len(group_codes(df, hue)[1]) != 2:
+        st.error(
+            "Grouping column does not have exactly 2 groups; Please select another column."
+        )
+        return
+    samples = _samples(df, col1, col2, hue)
+    result = _resampling_run(
+        df,
+        "bootstrap",
+        bootstrap_ci,
+        *samples,
+        statistic=statistic,
+        confidence=conf / 100,
+        resamples=resamples,
+        seed=seed,
+    )
+    if result is None:
+        return
+    what = statistic if len(samples) == 1 else f"difference in {statistic}s"
+    st.text(f"{what.capitalize()}: {result['statistic']}")
+    st.text(f"{conf}% confidence interval: {result['low']} ~ {result['high']}")
+    if not result["exact"]:
+        st.caption(
+            "Values were resampled in quantile bins, with a normal approximation within each bin for means."
+        )
+    _resampling_plot(
+        result["distribution"], result["statistic"], (result["low"], result["high"])
+    )
 
-        if p_val < threshold:
-            st.text("Reject null hypothesis")
-        else:
-            st.text("Accept null hypothesis")
 
-        hypo_kde_plot(df=df, col1=col1, col2=col2, hue=hue)
+def hypo_sequential(df, col1, hue, conf=95) -> None:
+    """Sequential test of two groups of hue over uploads added to a stored experiment."""
+    if session_stream() is not None:
+        st.error(
+            "This upload was too large to load and only a sample of it is available; please split it into smaller uploads."
+        )
+        return
+    name = st.text_input(
+        "Experiment name",
+        value=f"{col1} by {hue}",
+        help="Experiments are stored on the server and shared by everyone using this app; "
+        "give yours a name others will not pick.",
+    )
+    state = load_experiment(name)
+    if state is None:
+        if not _numeric(df, col1):
+            st.error(f"Please select a numerical column for the 1st column; {col1}.")
+            return
+        _, labels = group_codes(df, hue)
+        if len(labels) < 2:
+            st.error("Grouping column needs at least 2 groups.")
+            return
+        control = st.selectbox("Control group", list(labels), index=0)
+        treatment = st.selectbox("Treatment group", list(labels), index=1)
+        effect = st.number_input(
+            "Expected effect (standard deviations)",
+            min_value=0.001,
+            value=EFFECT_SIZE,
+            format="%.3f",
+        )
+        if control == treatment:
+            st.error("Please select two different groups.")
+            return
+        state = new_experiment(
+            name, col1, hue, control, treatment, 1 - conf / 100, effect
+        )
+    else:
+        st.text(
+            f"Experiment on {state['metric']} between groups {state['control']} and "
+            f"{state['treatment']} of {state['by']}, alpha {state['alpha']}"
+        )
+    missing = [col for col in (state["metric"], state["by"]) if col not in df.columns]
+    chunk_id = frame_tag(df) or frame_fingerprint(df)
+    if missing:
+        st.error(f"This upload does not have the columns {missing} of the experiment.")
+    elif chunk_id in state["chunks"]:
+        st.info("This upload was already added to the experiment.")
+    elif st.button("Add this upload to the experiment"):
+        add_chunk(state, df, chunk_id)
+        save_experiment(state)
+    if st.button("Delete experiment"):
+        delete_experiment(name)
+        st.rerun()
+    if not state["looks"]:
+        return
+
+    looks = pd.DataFrame(state["looks"])
+    looks.index = pd.RangeIndex(1, len(looks) + 1, name="Look")
+    last = state["looks"][-1]
+    st.text(
+        f"Null hypothesis: groups {state['control']} and {state['treatment']} of {state['by']} have same means of {state['metric']}"
+    )
+    st.text(f"Difference in means: {last['difference']}")
+    st.text(f"Always-valid P value: {last['p_value']}")
+    if state["stopped"] is not None:
+        st.text(
+            f"Reject null hypothesis; the test could stop at look {state['stopped']}"
+        )
+    else:
+        st.text("Accept null hypothesis so far; add more data to continue")
+    st.line_chart(looks["p_value"])
+    st.dataframe(looks)
@@ -0,0 +1,77 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+# Rows of a table sent to the browser per page.
+PAGE_ROWS = 1_000
+
+
+def column_values(values, positions) -> pd.Series:
+    """Values at positions of a DataFrame column or of an array, as a Series."""
+    if isinstance(values, pd.Series):
+        return values.take(positions).reset_index(drop=True)
+    return pd.Series(np.asarray(values)[positions])
+
+
+def sort_order(values, ascending=True) -> np.ndarray:
+    """Positions which sort values, stable, with nulls last.
+
+    Columns mixing types that cannot be compared are sorted as text.
+    """
+    try:
+        ordered = values.sort_values(
+            ascending=ascending, kind="stable", na_position="last"
+        )
+    except TypeError:
+        ordered = values.where(values.isna(), values.astype(str)).sort_values(
+            ascending=ascending, kind="stable", na_position="last"
+        )
+    return ordered.index.to_numpy()
+
+
+def filter_mask(values, low=None, high=None, text=None) -> np.ndarray:
+    """Mask of values within [low, high], or whose text contains text (case-insensitive)."""
+    mask = np.ones(len(values), dtype=bool)
+    if low is not None:
+        mask &= (values >= low).to_numpy(dtype=bool, na_value=False)
+    if high is not None:
+        mask &= (values <= high).to_numpy(dtype=bool, na_value=False)
+    if text:
+        mask &= (
+            values.astype(str)
+            .str.contains(text, case=False, regex=False)
+            .to_numpy(dtype=bool, na_value=False)
+        )
+    return mask
+
+
+def page_bounds(rows, page, page_rows=PAGE_ROWS) -> tuple:
+    """Start and stop of a 1-based page of rows, clipped to the last page."""
+    pages = max(1, -(-rows // page_rows))
+    start = (min(max(page, 1), pages) - 1) * page_rows
+    return start, min(rows, start + page_rows)
+
+
+def selection_key(*parts) -> str:
+    """Digest identifying a view; arrays are hashed by content."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            digest.update(np.ascontiguousarray(part).tobytes())
+        else:
+            digest.update(repr(part).encode())
+    return digest.hexdigest()
+
+
+def extra_names(names, taken) -> list:
+    """names renamed with a numbered suffix where they clash with taken or each other."""
+    used = set(taken)
+    renamed = []
+    for name in names:
+        unique, suffix = name, 1
+        while unique in used:
+            unique, suffix = f"{name}_{suffix}", suffix + 1
+        used.add(unique)
+        renamed.append(unique)
+    return renamed
@@ -1,6 +1,14 @@
 import streamlit as st
 
-from modules.utils import dfprofiler, outlier_hampel, outlier_iqr, outlier_zscore
+from modules.utils import (
+    dfprofiler,
+    outlier_hampel,
+    outlier_iqr,
+    outlier_scan,
+    outlier_zscore,
+    session_columns,
+    session_df,
+)
 
 methods = ["Z score", "Interquartile range (IQR)", "Hampel filter"]
 
@@ -26,14 +34,26 @@ with st.expander("Concepts"):
         """
     )
 
-if "df" in st.session_state:
-    df = st.session_state.df
-    cols = list(df.columns)
+if "df" in st.session_state and st.toggle("Scan all numeric columns"):
+    df = session_df(session_columns())
+    thresholds = {}
+    for key, label, default in zip(
+        ["zscore", "iqr", "hampel"], methods, [3.0, 1.5, 3.0]
+    ):
+        thresholds[key] = st.slider(f"{label} threshold", 0.0, 5.0, default, 0.1)
+    outlier_scan(df, thresholds)
+
+    dfprofiler(df)
+
+elif "df" in st.session_state:
+    cols = session_columns()
     cols.insert(0, None)
 
     method = st.selectbox("Select a methonology", methods)
     column = st.selectbox("Select a column", cols)
 
+    df = session_df([column])
+
     if column is None:
         st.error(
             """
@@ -82,13 +102,22 @@ if "df" in st.session_state:
                 )
         elif method == "Hampel filter":
             threshold = st.slider("Select a threshold", 0.0, 5.0, 3.0, 0.1)
+            window = st.number_input(
+                "Select a window size (0 uses the whole column)",
+                min_value=0,
+                value=0,
+                step=1,
+                help="Rolling windows are centred on each row, in row order, with window // 2 rows on each side; "
+                "the threshold is then in sigmas (1.4826 x MAD).",
+            )
             if column is not None:
-                outlier_hampel(df, column, threshold)
+                outlier_hampel(df, column, threshold, window)
             with st.expander("Intention & How to fix"):
                 st.text(
                     """
                     1) Intention
                     - Define outliers based on the Hampel filter.
+                    - With a window, values are compared with their neighbours (time series).
                     2) How to fix
                     - Outliers: Remove or impute outliers (Please review it with experts).
                     """
@@ -1,6 +1,19 @@
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+from modules.backend import duplicate_groups, null_stats
+from modules.convert import DTYPES, conversion_plan, convert, dtype_name
+from modules.stats import QUANTILES, use_approx
+from modules.utils import (
+    profile_table,
+    session_backend,
+    session_df,
+    session_stream,
+    stream_note,
+    table_view,
+)
+
 # Description of app.
 st.title("Profile Data")
 
@@ -24,64 +37,83 @@ with st.expander("Concepts"):
     )
 
 if "df" in st.session_state:
-    df = st.session_state.df
+    df = session_df()
     st.subheader("Dataset samples")
     st.write(df.head())
 
     st.subheader("Datatype")
-    data_types_df = df.dtypes.to_frame().reset_index()
-    data_types_df.columns = ["Column", "Data Type"]
-    data_types_df["New Data Type"] = data_types_df["Data Type"].apply(lambda x: str(x))
+    data_types_df = pd.DataFrame(
+        {
+            "Column": df.columns,
+            "Data Type": df.dtypes.astype(str).to_numpy(),
+            "New Data Type": [dtype_name(df, col) for col in df.columns],
+            "Datetime format": None,
+        }
+    )
     data_types_df = st.data_editor(
         data_types_df,
         column_config={
             "New Data Type": st.column_config.SelectboxColumn(
                 help="Choose data type which you want to conver",
-                options=[
-                    "int64",
-                    "float64",
-                    "object",
-                    "category",
-                    "bool",
-                    "string",
-                    "datetime",
-                    "date",
-                ],
+                options=DTYPES,
                 required=True,
-            )
+            ),
+            "Datetime format": st.column_config.TextColumn(
+                help="strftime format of text converted to datetime or date, e.g. %Y-%m-%d; inferred if empty",
+            ),
         },
         disabled=["Column", "Data Type"],
         hide_index=True,
     )
 
-    for i, row in data_types_df.iterrows():
-        if row["Data Type"] != row["New Data Type"]:
-            if row["New Data Type"] == "datetime":
-                df[row["Column"]] = pd.to_datetime(df[row["Column"]], errors="coerce")
-            elif row["New Data Type"] == "date":
-                df[row["Column"]] = pd.to_datetime(
-                    df[row["Column"]], errors="coerce"
-                ).dt.date
-            else:
-                df[row["Column"]] = df[row["Column"]].astype(row["New Data Type"])
+    plan = conversion_plan(
+        df, dict(zip(data_types_df["Column"], data_types_df["New Data Type"]))
+    )
+    formats = dict(zip(data_types_df["Column"], data_types_df["Datetime format"]))
+    # A plan left after converting holds columns which failed; it is not retried.
+    if plan and (plan, formats) != st.session_state.get("conversion_request"):
+        st.session_state.conversion_request = (plan, formats)
+        df, st.session_state.conversion_report = convert(df, plan, formats)
+        st.session_state.df = df
+    if "conversion_report" in st.session_state:
+        st.text("Last data type conversion")
+        st.dataframe(st.session_state.conversion_report, hide_index=True)
     st.text("After changing data type")
-    st.write(df.head())
+    table_view(df, key="converted")
 
     st.subheader("Statistical values of the data")
+    stream = session_stream()
+    if stream is not None:
+        st.caption(stream_note(stream))
+        approx = True
+    else:
+        approx = st.toggle(
+            "Approximate statistics",
+            value=use_approx(df),
+            help="Use streaming sketches instead of exact scans; much faster on large data.",
+        )
     st.text("Numerical data")
-    profiled_df_num = df.describe(include="number").loc[
-        ["count", "mean", "std", "min", "max"]
-    ]
-    profiled_df_num.loc["null (%)"] = df.isnull().sum() / len(df) * 100
-    profiled_df_num.loc["Datatype"] = df.dtypes
+    num_rows = ["count", "mean", "std", "min", "max", "null (%)", "Datatype"]
+    if approx:
+        num_rows[4:4] = list(QUANTILES)
+    profiled_df_num = profile_table(df, include="number", rows=num_rows, approx=approx)
     st.write(profiled_df_num)
+    cat_rows = ["count", "unique", "top", "freq", "null (%)", "Datatype"]
+    if approx:
+        st.text("Error bounds of numerical data")
+        st.write(profile_table(df, include="number", rows=num_rows, bounds=True))
     st.text("Categorical data")
-    profiled_df_cat = df.describe(include=["object", "category"]).loc[
-        ["count", "unique", "top", "freq"]
-    ]
-    profiled_df_cat.loc["null (%)"] = df.isnull().sum() / len(df) * 100
-    profiled_df_cat.loc["Datatype"] = df.dtypes
+    profiled_df_cat = profile_table(
+        df, include=["object", "category"], rows=cat_rows, approx=approx
+    )
     st.write(profiled_df_cat)
+    if approx:
+        st.text("Error bounds of categorical data")
+        st.write(
+            profile_table(
+                df, include=["object", "category"], rows=cat_rows, bounds=True
+            )
+        )
     with st.expander("Intention & How to fix"):
         st.text(
             """
@@ -97,7 +129,19 @@ if "df" in st.session_state:
         )
 
     st.subheader("Missing values")
-    st.write(df[df.isnull().any(axis=1)])
+    null_counts, any_null = null_stats(df, session_backend())
+    null_rows = np.flatnonzero(any_null)
+    st.text(f"{len(null_rows):,} rows have missing values.")
+    if len(null_rows):
+        st.write(
+            pd.DataFrame(
+                {
+                    "Missing": null_counts,
+                    "Missing (%)": null_counts / max(len(df), 1) * 100,
+                }
+            )[null_counts > 0].T
+        )
+        table_view(df, null_rows, key="missing")
     with st.expander("Intention & How to fix"):
         st.text(
             """
@@ -110,7 +154,18 @@ if "df" in st.session_state:
         )
 
     st.subheader("Duplicated values")
-    st.write(df[df.duplicated(keep=False)])
+    dup_rows, dup_groups, group_rows = duplicate_groups(df, session_backend())
+    st.text(
+        f"{len(dup_rows):,} rows are duplicated, in {len(group_rows):,} groups of equal rows."
+    )
+    if len(dup_rows):
+        table_view(
+            df,
+            dup_rows,
+            key="duplicates",
+            group=dup_groups,
+            copies=group_rows[dup_groups],
+        )
     with st.expander("Intention & How to fix"):
         st.text(
             """
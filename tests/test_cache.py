@@ -0,0 +1,53 @@
+import os
+
+from modules.cache import PNG_SIGNATURE, FigureCache, FrameCache, prune, touch
+
+
+def _chart(i):
+    return [PNG_SIGNATURE + bytes([i]) * 100, PNG_SIGNATURE + b"x"], f"chart {i}"
+
+
+def test_figure_cache_spills_png_bytes(tmp_path):
+    cache = FigureCache(max_bytes=1, directory=str(tmp_path))
+    for i in range(3):
+        cache.put(f"key{i}", _chart(i))
+    cache.flush()
+    fresh = FigureCache(directory=str(tmp_path))
+    for i in range(3):
+        assert list(fresh.get(f"key{i}")[0]) == _chart(i)[0]
+        assert fresh.get(f"key{i}")[1] == f"chart {i}"
+    assert not any(name.endswith(".pickle") for name in os.listdir(cache.directory))
+
+
+def test_figure_cache_ignores_malformed_files(tmp_path):
+    cache = FigureCache(directory=str(tmp_path))
+    os.makedirs(cache.directory)
+    for i, content in enumerate(
+        [
+            b"\x80\x04K\x01.",
+            b'{"sizes": [5], "caption": null}\nabcde',
+            b'{"sizes": [9]}\n',
+        ]
+    ):
+        with open(os.path.join(cache.directory, f"bad{i}.chart"), "wb") as file:
+            file.write(content)
+        assert cache.get(f"bad{i}") is None
+
+
+def test_vanished_files_are_skipped(tmp_path, monkeypatch):
+    for i in range(4):
+        (tmp_path / f"{i}.chart").write_bytes(b"x" * 100)
+    remove = os.remove
+
+    def racing_remove(path):
+        remove(path)
+        remove(path)
+
+    monkeypatch.setattr(os, "remove", racing_remove)
+    prune(str(tmp_path), ".chart", 150)
+    assert os.listdir(tmp_path) == ["3.chart"]
+    touch(str(tmp_path / "0.chart"))
+
+
+def test_frame_cache_miss(tmp_path):
+    assert FrameCache(directory=str(tmp_path)).get("missing") is None
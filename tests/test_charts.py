@@ -0,0 +1,27 @@
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import pytest  # noqa: E402
+
+from modules import utils  # noqa: E402
+
+
+@pytest.mark.parametrize("mode", ["min-max", "quartiles", "lttb"])
+def test_line_of_large_frame_without_finite_x(monkeypatch, mode):
+    monkeypatch.setattr(utils, "RENDER_ROWS", 100)
+    rows = 1_000
+    df = pd.DataFrame(
+        {
+            "x": np.full(rows, np.nan),
+            "y": np.arange(rows, dtype=np.float64),
+            "group": np.repeat(["a", "b"], rows // 2),
+        }
+    )
+    figures, _ = utils._draw_line(df, "x", "y", "group", mode)
+    assert len(figures) == 2
+    df["x"] = np.where(np.arange(rows) % 2, np.inf, np.arange(rows))
+    figures, _ = utils._draw_line(df, "x", "y", "group", mode)
+    assert figures[0].axes[0].get_xlim() == (0, rows - 2)
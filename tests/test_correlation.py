@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+from modules.correlation import average_ranks, correlation_matrix
+
+
+def _frame(rows=50_000, seed=0):
+    rng = np.random.default_rng(seed)
+    a = rng.normal(1e6, 1, rows)
+    df = pd.DataFrame({"a": a, "b": a + rng.normal(0, 0.5, rows)})
+    df.loc[rng.random(rows) < 0.1, "b"] = np.nan
+    df["i"] = rng.integers(10**12, 10**12 + 1000, rows)
+    return df
+
+
+def test_correlation_matrix_matches_pandas():
+    df = _frame()
+    for method in ["pearson", "spearman"]:
+        assert np.allclose(correlation_matrix(df, method), df.corr(method), atol=1e-5)
+
+
+def test_average_ranks_keep_distinct_values():
+    values = np.array([1e6 + 1e-4, 1e6, np.nan, 1e6 + 2e-4, 1e6])
+    assert np.allclose(average_ranks(values), pd.Series(values).rank(), equal_nan=True)
+    large = np.arange(20_000_000, dtype=np.int64)[::-1]
+    assert np.array_equal(average_ranks(large), 20_000_000 - np.arange(20_000_000))
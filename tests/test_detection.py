@@ -0,0 +1,46 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from modules.detection import SORTED_WIDTH, _rolling_median_mad, rolling_median_mad
+
+
+def _reference(values, width, start, stop):
+    half = width // 2
+    median, mad = [], []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        for i in range(start, stop):
+            begin, end = max(0, i - half), i + half + 1
+            window = values[begin:end]
+            median.append(np.nanmedian(window))
+            mad.append(np.nanmedian(np.abs(window - median[-1])))
+    return np.array(median), np.array(mad)
+
+
+def _values(rows=3_000, seed=0):
+    values = np.random.default_rng(seed).standard_t(3, rows)
+    values[::17] = np.nan
+    values[1_000:1_500] = np.nan
+    return values
+
+
+@pytest.mark.parametrize("window", [11, 100, SORTED_WIDTH + 1, 1_001])
+def test_rolling_median_mad_matches_reference(window):
+    values = _values()
+    median, mad = rolling_median_mad(values, window, chunk_rows=700)
+    width = 2 * (window // 2) + 1
+    expected = _reference(values, width, 0, len(values))
+    assert np.allclose(median, expected[0], equal_nan=True)
+    assert np.allclose(mad, expected[1], equal_nan=True)
+
+
+@pytest.mark.parametrize("width", [11, SORTED_WIDTH + 1])
+def test_windows_starting_inside_data(width):
+    values = _values()
+    start, stop = 2 * width, 2 * width + 500
+    median, mad = _rolling_median_mad(values, width, start, stop)
+    expected = _reference(values, width, start, stop)
+    assert np.allclose(median, expected[0], equal_nan=True)
+    assert np.allclose(mad, expected[1], equal_nan=True)
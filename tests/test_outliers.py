@@ -0,0 +1,33 @@
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import pytest  # noqa: E402
+
+from modules import utils  # noqa: E402
+from modules.render import MAX_BINS, auto_bins, binned_histogram  # noqa: E402
+
+
+def test_auto_bins_match_numpy_and_are_bounded():
+    values = np.random.default_rng(0).normal(size=10_000)
+    assert auto_bins(values) == len(np.histogram_bin_edges(values, "auto")) - 1
+    assert auto_bins(np.append(values, 1e12)) == MAX_BINS
+    counts, edges = binned_histogram(np.full(10, np.nan), "auto")
+    assert counts.sum() == 0 and len(edges) == len(counts) + 1
+
+
+@pytest.mark.parametrize("far", [False, True])
+def test_large_outlier_histogram(monkeypatch, far):
+    monkeypatch.setattr(utils, "RENDER_ROWS", 100)
+    values = np.random.default_rng(1).normal(size=5_000)
+    if far:
+        values[:3] = 1e12
+    else:
+        values[:] = np.nan
+    df = pd.DataFrame({"x": values})
+    mask = np.abs(values) > 3
+    figures, caption = utils._draw_outliers(df, "x", mask)
+    assert len(figures[0].axes[0].patches) <= 2 * MAX_BINS
+    assert caption
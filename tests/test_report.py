@@ -0,0 +1,37 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from modules.report import DEFAULT_CONFIG, report_names, run_reports
+
+
+def test_report_names_are_unique():
+    assert report_names(["d/a b.csv", "e/a_b.csv", "A_B.csv", "c.csv"]) == [
+        "a_b.csv",
+        "a_b.csv-1",
+        "A_B.csv-2",
+        "c.csv",
+    ]
+
+
+def test_clashing_files_get_their_own_reports(tmp_path, monkeypatch):
+    # Parsed files and charts are cached in .eda_cache of the working directory.
+    monkeypatch.chdir(tmp_path)
+    data = tmp_path / "data"
+    data.mkdir()
+    rng = np.random.default_rng(0)
+    paths = []
+    for name, rows in [("a b.csv", 30), ("a_b.csv", 40)]:
+        pd.DataFrame(
+            {"x": rng.normal(size=rows), "y": rng.integers(0, 3, rows)}
+        ).to_csv(data / name, index=False)
+        paths.append(str(data / name))
+    output = tmp_path / "reports"
+    entries = run_reports(paths, json.loads(json.dumps(DEFAULT_CONFIG)), str(output), 1)
+    assert [entry["error"] for entry in entries] == [None, None]
+    assert [entry["rows"] for entry in entries] == [30, 40]
+    reports = {entry["report"] for entry in entries}
+    assert len(reports) == 2
+    assert all(os.path.exists(output / report) for report in reports)
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from scipy import stats
+
+from modules.resampling import bootstrap_ci, permutation_test, resample
+
+
+def _difference(x, y, axis=-1):
+    return np.mean(x, axis=axis) - np.mean(y, axis=axis)
+
+
+def test_permutation_test_matches_scipy():
+    rng = np.random.default_rng(0)
+    x, y = rng.normal(0.3, 1, 60), rng.normal(0, 1, 80)
+    result = permutation_test(x, y, resamples=20_000, exact=True)
+    expected = stats.permutation_test(
+        (x, y), _difference, n_resamples=20_000, random_state=1, vectorized=True
+    )
+    assert result["exact"]
+    assert result["statistic"] == pytest.approx(expected.statistic)
+    assert result["p_value"] == pytest.approx(expected.pvalue, abs=0.01)
+
+
+def test_permutation_levels_match_rows():
+    rng = np.random.default_rng(1)
+    x, y = rng.integers(0, 5, 3_000), rng.integers(0, 5, 2_000) + 0.1
+    levels = permutation_test(x, y, resamples=20_000, exact=False)
+    rows = permutation_test(x, y, resamples=20_000, exact=True)
+    assert levels["exact"] and rows["exact"]
+    assert levels["p_value"] == pytest.approx(rows["p_value"], abs=0.01)
+    assert np.std(levels["distribution"]) == pytest.approx(
+        np.std(rows["distribution"]), rel=0.03
+    )
+
+
+@pytest.mark.parametrize("statistic", ["mean", "median"])
+def test_bootstrap_matches_scipy(statistic):
+    rng = np.random.default_rng(2)
+    x = rng.lognormal(size=301)
+    result = bootstrap_ci(x, statistic=statistic, resamples=20_000, exact=True)
+    expected = stats.bootstrap(
+        (x,),
+        getattr(np, statistic),
+        n_resamples=20_000,
+        method="percentile",
+        random_state=3,
+    ).confidence_interval
+    width = expected.high - expected.low
+    assert result["low"] == pytest.approx(expected.low, abs=0.05 * width)
+    assert result["high"] == pytest.approx(expected.high, abs=0.05 * width)
+
+
+@pytest.mark.parametrize("statistic", ["mean", "median"])
+def test_bootstrap_coverage(statistic):
+    rng = np.random.default_rng(4)
+    covered = 0
+    for seed in range(200):
+        x, y = rng.normal(size=150), rng.normal(size=120)
+        result = bootstrap_ci(x, y, statistic, resamples=1_000, seed=seed)
+        covered += result["low"] <= 0 <= result["high"]
+    assert covered / 200 >= 0.9
+
+
+def test_bootstrap_levels_of_mean():
+    rng = np.random.default_rng(5)
+    x = rng.exponential(size=200_000)
+    binned = bootstrap_ci(x, resamples=2_000, exact=False)
+    rows = bootstrap_ci(x, resamples=2_000, exact=True)
+    assert not binned["exact"] and rows["exact"]
+    width = rows["high"] - rows["low"]
+    assert binned["low"] == pytest.approx(rows["low"], abs=0.1 * width)
+    assert binned["high"] == pytest.approx(rows["high"], abs=0.1 * width)
+
+
+def test_bootstrap_median_of_many_rows():
+    x = np.random.default_rng(6).lognormal(size=1_000_000)
+    result = bootstrap_ci(x, statistic="median", resamples=20_000)
+    assert result["exact"]
+    assert result["low"] < result["statistic"] < result["high"]
+    assert len(np.unique(result["distribution"])) > 1_000
+
+
+def test_pool_matches_serial():
+    x = np.random.default_rng(7).normal(size=500)
+    data = [np.sort(x)]
+    serial = resample("bootstrap_median", data, 3_000, seed=8, workers=1)
+    pooled = resample("bootstrap_median", data, 3_000, seed=8, workers=2)
+    assert np.array_equal(serial, pooled)
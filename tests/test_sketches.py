@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+from modules.sketches import HyperLogLog, KLLSketch, TopK, hash_values
+
+
+def test_hyperloglog_within_error_bound():
+    rng = np.random.default_rng(0)
+    for distinct in [1_000, 100_000, 1_000_000]:
+        values = pd.Series(rng.permutation(distinct * 3)[:distinct]).repeat(2)
+        sketch = HyperLogLog()
+        sketch.update_hashes(hash_values(values)[0])
+        error = abs(sketch.estimate() / distinct - 1)
+        assert error < 4 * sketch.relative_error
+
+
+def test_hyperloglog_merge_is_union():
+    first, second, both = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    a = hash_values(pd.Series(np.arange(0, 60_000)))[0]
+    b = hash_values(pd.Series(np.arange(40_000, 100_000)))[0]
+    first.update_hashes(a)
+    second.update_hashes(b)
+    both.update_hashes(np.concatenate([a, b]))
+    first.merge(second)
+    assert first.estimate() == both.estimate()
+
+
+def test_categorical_hashes_match_values():
+    values = pd.Series(["a", "b", None, "a", "c"])
+    hashes, kept = hash_values(values)
+    category_hashes, category_kept = hash_values(values.astype("category"))
+    assert np.array_equal(hashes, category_hashes)
+    assert list(kept) == list(category_kept)
+
+
+def test_kll_quantiles_within_rank_error():
+    rng = np.random.default_rng(1)
+    values = rng.lognormal(size=1_000_000)
+    sketch, other = KLLSketch(seed=0), KLLSketch(seed=1)
+    sketch.update(values[:600_000])
+    other.update(values[600_000:])
+    sketch.merge(other)
+    q = np.linspace(0.01, 0.99, 99)
+    ranks = np.searchsorted(np.sort(values), sketch.quantile(q)) / len(values)
+    assert np.abs(ranks - q).max() < sketch.rank_error
+    assert sketch.quantile(0) == values.min()
+    assert sketch.quantile(1) == values.max()
+
+
+def test_topk_counts_are_bounded_lower_bounds():
+    rng = np.random.default_rng(2)
+    values = pd.Series(rng.zipf(1.3, 500_000) % 10_000)
+    sketch = TopK(k=100)
+    for start in range(0, len(values), 70_000):
+        hashes, kept = hash_values(values[start:][:70_000])
+        sketch.update(hashes, kept)
+    truth = values.value_counts()
+    assert sketch.error <= sketch.n / (sketch.k + 1)
+    estimated = dict(sketch.top(sketch.k))
+    for value, count in estimated.items():
+        assert 0 <= truth[value] - count <= sketch.error
+    # Every value more frequent than the error bound is tracked.
+    assert set(truth[truth > sketch.error].index) <= set(estimated)
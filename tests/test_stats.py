@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from modules.convert import convert
+from modules.stats import frame_fingerprint, frame_tag, tag_frame
+
+
+def _uploaded():
+    df = pd.DataFrame({"a": np.arange(10.0)[::-1], "b": list("abcdeabcde")})
+    tag_frame(df, "csv-None-1234")
+    return df
+
+
+def test_tagged_frame_is_not_hashed():
+    df = _uploaded()
+    assert frame_tag(df) == "csv-None-1234"
+    assert frame_fingerprint(df) == frame_fingerprint(_uploaded())
+
+
+def test_derived_frames_are_hashed():
+    df = _uploaded()
+    derived = [
+        df.sort_values("b", kind="stable"),
+        df.fillna(0).assign(a=df["a"] * 2),
+        df.iloc[::-1],
+        df.copy(),
+    ]
+    for frame in derived:
+        assert frame.attrs == df.attrs
+        assert frame_tag(frame) is None
+        assert frame_fingerprint(frame) == frame_fingerprint(frame.copy())
+    assert len({frame_fingerprint(frame) for frame in [df] + derived[:3]}) == 4
+
+
+def test_converted_frame_keeps_a_tag():
+    df = _uploaded()
+    result, _ = convert(df, {"b": "category"})
+    assert frame_tag(result) not in (None, frame_tag(df))
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from modules.streaming import CrossProducts, Moments
+
+
+def _frame(rows=50_000, seed=0):
+    rng = np.random.default_rng(seed)
+    a = rng.normal(1e6, 1, rows)
+    df = pd.DataFrame(
+        {"a": a, "b": a + rng.normal(0, 0.5, rows), "c": rng.exponential(size=rows)}
+    )
+    df.loc[rng.random(rows) < 0.1, "b"] = np.nan
+    df.loc[:99, "c"] = np.nan
+    return df
+
+
+def test_moments_match_describe():
+    df = _frame()
+    moments, other = Moments(3), Moments(3)
+    for chunk in np.array_split(df.to_numpy(), 6)[:4]:
+        moments.update(chunk)
+    for chunk in np.array_split(df.to_numpy(), 6)[4:]:
+        other.update(chunk)
+    moments.merge(other)
+    described = df.describe()
+    assert np.allclose(moments.count, described.loc["count"])
+    assert np.allclose(moments.mean, described.loc["mean"], rtol=1e-12)
+    assert np.allclose(moments.std, described.loc["std"], rtol=1e-9)
+    assert np.allclose(moments.min, described.loc["min"])
+    assert np.allclose(moments.max, described.loc["max"])
+    assert list(moments.nulls) == list(df.isna().sum())
+
+
+def test_cross_products_match_corr():
+    df = _frame()
+    cross = CrossProducts(3)
+    for chunk in np.array_split(df.to_numpy(), 5):
+        cross.update(chunk)
+    assert np.allclose(cross.correlation(), df.corr(), atol=1e-5)
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from modules.testing import (
+    MAX_CELLS,
+    adjusted_p_values,
+    anova,
+    chi_square,
+    column_stats,
+    screen,
+    sufficient_stats,
+    two_sample,
+)
+from modules.utils import _decision
+
+
+def _samples(seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.normal(1e4 + i * 0.2, 1 + i, 200 + 50 * i) for i in range(4)]
+
+
+def _stats(samples):
+    parts = [column_stats(values) for values in samples]
+    return tuple(np.array([part[i][0] for part in parts]) for i in range(3))
+
+
+@pytest.mark.parametrize("test", ["t", "welch"])
+def test_two_sample_matches_ttest_ind(test):
+    first, second = _samples()[:2]
+    stat, dof, p = two_sample(*_stats([first, second]), test)
+    expected = stats.ttest_ind(first, second, equal_var=test == "t")
+    assert stat == pytest.approx(expected.statistic, rel=1e-9)
+    assert dof == pytest.approx(expected.df, rel=1e-9)
+    assert p == pytest.approx(expected.pvalue, rel=1e-6)
+
+
+def test_z_test_uses_normal_distribution():
+    first, second = _samples()[:2]
+    stat, _, p = two_sample(*_stats([first, second]), "z")
+    expected = stats.ttest_ind(first, second)
+    assert stat == pytest.approx(expected.statistic, rel=1e-9)
+    assert p == pytest.approx(2 * stats.norm.sf(abs(expected.statistic)), rel=1e-9)
+
+
+def test_anova_matches_f_oneway():
+    samples = _samples()
+    stat, dof, p = anova(*_stats(samples))
+    expected = stats.f_oneway(*samples)
+    assert stat == pytest.approx(expected.statistic, rel=1e-9)
+    assert dof == (3, sum(len(values) for values in samples) - 4)
+    assert p == pytest.approx(expected.pvalue, rel=1e-6)
+
+
+@pytest.mark.parametrize("levels", [(2, 2), (3, 4)])
+def test_chi_square_matches_chi2_contingency(levels):
+    rng = np.random.default_rng(1)
+    first = pd.Series(rng.integers(0, levels[0], 500)).astype(str)
+    second = pd.Series(rng.integers(0, levels[1], 500) + (first == "1"))
+    first[::50] = None
+    stat, dof, p, table = chi_square(first, second)
+    present = first.notna()
+    expected = stats.chi2_contingency(pd.crosstab(first[present], second[present]))
+    assert table.to_numpy().sum() == present.sum()
+    assert stat == pytest.approx(expected.statistic, rel=1e-9)
+    assert dof == expected.dof
+    assert p == pytest.approx(expected.pvalue, rel=1e-6)
+
+
+def test_chi_square_rejects_id_columns():
+    ids = pd.Series(np.arange(2 * int(MAX_CELLS**0.5)))
+    with pytest.raises(ValueError, match="categorical"):
+        chi_square(ids, ids + 0.5)
+
+
+def test_sufficient_stats_match_groupby():
+    rng = np.random.default_rng(2)
+    values = rng.normal(1e6, 1, (10_000, 2))
+    values[rng.random(values.shape) < 0.1] = np.nan
+    codes = rng.integers(-1, 50, len(values))
+    n, mean, m2 = sufficient_stats(values, codes, 50)
+    df = pd.DataFrame(values).assign(group=codes).query("group >= 0")
+    grouped = df.groupby("group")
+    assert np.array_equal(n, grouped.count())
+    assert np.allclose(mean, grouped.mean(), rtol=1e-12)
+    assert np.allclose(m2 / (n - 1), grouped.var(), rtol=1e-8)
+
+
+def test_screen_adjusts_p_values():
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame(rng.normal(size=(400, 20)), columns=[f"x{i}" for i in range(20)])
+    df["group"] = np.repeat(["a", "b"], 200)
+    df.loc[df["group"] == "a", "x0"] += 1
+    table = screen(df, [f"x{i}" for i in range(20)], "group")
+    assert table["Column"][0] == "x0"
+    assert np.allclose(
+        table["Adjusted P value"], stats.false_discovery_control(table["P value"])
+    )
+    assert np.isnan(adjusted_p_values(np.array([np.nan, 0.01]))[0])
+
+
+def test_decision_level():
+    assert _decision(0.03, 95) == "Reject null hypothesis"
+    assert _decision(0.03, 95, "two-tailed") == "Accept null hypothesis"
+    assert _decision(0.07, 95) == "Accept null hypothesis"
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+from modules.utils import table_view
+from modules.viewer import extra_names, filter_mask, page_bounds, sort_order
+
+
+def test_extra_names_do_not_clash():
+    assert extra_names(["group", "copies", "zscore"], ["group", "group_1", "x"]) == [
+        "group_2",
+        "copies",
+        "zscore",
+    ]
+    assert extra_names(["a", "a"], []) == ["a", "a_1"]
+
+
+def test_table_view_with_clashing_column():
+    df = pd.DataFrame({"group": [1, 2, 1, 2], "copies": list("abab")})
+    rows = np.array([0, 2, 1, 3])
+    table_view(df, rows, key="duplicates", group=[0, 0, 1, 1], copies=[2, 2, 2, 2])
+
+
+def test_sort_and_filter_positions():
+    values = pd.Series([3.0, None, 1.0, 2.0])
+    assert list(sort_order(values)) == [2, 3, 0, 1]
+    assert list(filter_mask(values, low=2)) == [True, False, False, True]
+    assert page_bounds(2_500, 3, 1_000) == (2_000, 2_500)